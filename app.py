@@ -1,12 +1,34 @@
 import streamlit as st
 import os
 import cv2
+import sys
 import time
-import subprocess
-import numpy as np
-import open3d as o3d
 import plotly.graph_objects as go
-from PIL import Image
+
+from jobs import Job, list_jobs, submit
+from preview_run import NO_GO_EXIT, read_health
+from previews import MANIFEST_NAME, PreviewCache, build_previews, overlay_mask, read_manifest
+from view3d import PALETTE_LEVELS, load_cloud_view, load_mesh_view, palette, resolve_level, view_sources
+
+# Frame Inspector: decoded previews kept in memory, and frames decoded ahead on each side
+PREVIEW_CACHE_SIZE = 256
+PREFETCH = 8
+
+# Pipeline runs are background jobs recorded here, so they outlive the browser session
+JOBS_DIR = "project_output/jobs"
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+LOG_REFRESH_SECONDS = 2
+
+# Progress lines the pipeline prints, and the counter each stage is measured by
+STAGE_LABELS = {
+    "frames": ("Frames processed", "processed"),
+    "masks": ("Masks", "done"),
+    "features": ("Features extracted", "extracted"),
+    "sparse": ("Images registered", "registered"),
+    "depth_maps": ("Depth maps", "done"),
+    "dense": ("Points fused", "points_fused"),
+    "mesh": ("Mesh triangles", "triangles"),
+}
 
 # --- PAGE CONFIG ---
 st.set_page_config(page_title="AutoScanner 3D | UVeye PoC", layout="wide", page_icon="🚗")
@@ -20,36 +42,96 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # --- HELPER FUNCTIONS ---
-def run_command(cmd):
-    """Runs shell commands and logs to Streamlit."""
-    try:
-        result = subprocess.run(
-            cmd, shell=True, check=True, capture_output=True, text=True
-        )
-        return result.stdout
-    except subprocess.CalledProcessError as e:
-        st.error(f"Command failed: {cmd}\n\nError:\n{e.stderr}")
+def latest_job():
+    """Most recent pipeline job (running or finished), or None."""
+    jobs = list_jobs(JOBS_DIR)
+    if not jobs:
         return None
+    jobs[0].refresh()
+    return jobs[0]
+
+def show_progress(progress):
+    """One bar (or counter) per stage that has reported progress."""
+    for stage, values in progress.items():
+        label, key = STAGE_LABELS.get(stage, (stage, "done"))
+        done, total = values.get(key), values.get("total")
+        if done is not None and values.get("approximate"):
+            label += " (approx.)"
+        if done is not None and total:
+            st.progress(min(done / total, 1.0), text=f"{label}: {done} / {total}")
+        elif done is not None:
+            st.caption(f"{label}: {done}")
+
+def job_panel(job_dir):
+    """Status, live progress, log tail and cancel button of one job."""
+    job = Job(job_dir)
+    job.refresh()
+    running = job.status in ("queued", "running")
+
+    col_status, col_cancel = st.columns([3, 1])
+    step = job.record.get("current_step")
+    step_text = f" (step {step + 1}/{len(job.record['steps'])})" if running and step is not None else ""
+    col_status.markdown(f"**Job** `{job.id}` — **{job.status}**{step_text}")
+    if running and col_cancel.button("⏹ Cancel", key=f"cancel_{job.id}"):
+        job.cancel()
+        st.rerun()
+
+    show_progress(job.progress())
+    st.code(job.tail() or "(waiting for output)", language="bash")
+
+    if not running and st.session_state.get("watching_job") == job.id:
+        # The job just finished: rerun the whole page so the other tabs pick up its output
+        del st.session_state["watching_job"]
+        st.rerun(scope="app")
+    elif running:
+        st.session_state["watching_job"] = job.id
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def load_view(view, path, mtime, budget, levels=PALETTE_LEVELS):
+    """Loads one 3D view. Cached by path + mtime, so reruns and view switches skip the parse."""
+    if view == "mesh":
+        return load_mesh_view(path)
+    return load_cloud_view(path, budget, levels)
 
-def load_ply_as_plotly(ply_path, sample_rate=10):
-    """Loads a PLY file and converts to Plotly 3D Scatter (Subsampled for speed)."""
-    if not os.path.exists(ply_path):
+@st.cache_data(show_spinner=False)
+def read_manifest_cached(data_dir, mtime):
+    """Frame manifest written by preprocess.py, re-read only when it changes."""
+    return read_manifest(data_dir)
+
+def load_manifest(data_dir):
+    path = os.path.join(data_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
         return None
-    
-    pcd = o3d.io.read_point_cloud(ply_path)
-    points = np.asarray(pcd.points)
-    colors = np.asarray(pcd.colors)
-    
-    # Subsample for web performance
-    points = points[::sample_rate]
-    colors = colors[::sample_rate]
-    
-    trace = go.Scatter3d(
-        x=points[:,0], y=points[:,1], z=points[:,2],
-        mode='markers',
-        marker=dict(size=2, color=colors, opacity=0.8)
-    )
-    return trace
+    return read_manifest_cached(data_dir, os.path.getmtime(path))
+
+@st.cache_resource
+def preview_cache():
+    """Decoded previews shared across reruns and sessions."""
+    return PreviewCache(max_items=PREVIEW_CACHE_SIZE)
+
+def load_preview(cache, data_dir, entry, preview_key, full_key):
+    """Decoded preview of a manifest entry, else the full-size file, else None when both are gone."""
+    for key in (preview_key, full_key):
+        if entry[key]:
+            image = cache.get(os.path.join(data_dir, entry[key]))
+            if image is not None:
+                return image
+    return None
+
+def build_trace(view, data):
+    """Plotly trace from compact arrays (float32 positions; palette indices for points, uint8 RGB for meshes)."""
+    if view == "mesh":
+        v, f = data["vertices"], data["faces"]
+        # Per-vertex RGB: intensities would be interpolated through the colorscale across faces
+        shading = dict(vertexcolor=[f"rgb({r},{g},{b})" for r, g, b in data["colors"]]) if "colors" in data else dict(color="lightgray")
+        return go.Mesh3d(x=v[:, 0], y=v[:, 1], z=v[:, 2], i=f[:, 0], j=f[:, 1], k=f[:, 2], **shading)
+
+    points = data["points"]
+    marker = dict(size=2, opacity=0.8)
+    if "colors" in data:
+        colorscale = palette(data.get("levels", PALETTE_LEVELS))
+        marker.update(color=data["colors"], colorscale=colorscale, cmin=0, cmax=len(colorscale) - 1)
+    return go.Scatter3d(x=points[:, 0], y=points[:, 1], z=points[:, 2], mode='markers', marker=marker)
 
 # --- SIDEBAR: CONTROLS ---
 with st.sidebar:
@@ -78,7 +160,15 @@ with st.sidebar:
     st.subheader("2. Pipeline Config")
     sample_rate = st.slider("Frame Sample Rate", 5, 60, 10, help="Process every Nth frame")
     blur_threshold = st.slider("Blur Threshold", 0.0, 500.0, 0.0, help="Lower = Keep more blurry frames") # Default 0 to ensure we get frames
+    select = st.radio("Frame Selection", ["overlap", "fixed"], horizontal=True, help="overlap: sampled frames are candidates, the sharpest is kept each time the camera has moved enough. fixed: keep every sampled frame above the blur threshold")
+    target_overlap = st.slider("Target Overlap", 0.5, 0.95, 0.85, step=0.05, disabled=select != "overlap", help="Image overlap kept between keyframes in overlap mode")
+    point_budget = st.slider("3D Point Budget", 20000, 500000, 150000, step=10000, help="Max points (or triangles) sent to the 3D view")
+    color_levels = st.select_slider("3D Color Levels", options=[6, 8, 12, 16], value=PALETTE_LEVELS, help="Steps per color channel for point clouds in the 3D view; 6 is smallest to send but bands smooth shading (meshes keep exact colors)")
+    preview_btn = st.button("🔎 QUICK PREVIEW", help="Low-resolution run on ~40 frames with go/no-go health metrics")
     run_btn = st.button("🚀 START PIPELINE")
+    current_job = latest_job()
+    if current_job is not None:
+        st.caption(f"Last job: {current_job.status} ({current_job.id})")
 
     st.markdown("---")
     st.caption("Powered by COLMAP & Open3D")
@@ -102,118 +192,139 @@ with tab_data:
     with col_frames:
         st.subheader("Frame Inspector")
         
-        # Check if processing is done
-        # Check if processing is done
-        image_dir = "project_output/data/images"
-        mask_dir = "project_output/data/masks"
+        data_dir = "project_output/data"
+        image_dir = os.path.join(data_dir, "images")
+        manifest = load_manifest(data_dir)
         
-        if os.path.exists(image_dir) and len(os.listdir(image_dir)) > 0:
-            frames = sorted([f for f in os.listdir(image_dir) if f.endswith(".jpg")])
+        if manifest and manifest["frames"]:
+            frames = manifest["frames"]
+            cache = preview_cache()
             
             # Interactive Controls
             selected_idx = st.slider("Select Frame Index", 0, len(frames)-1, 0)
             show_mask = st.toggle("🛡️ Overlay Segmentation Mask", value=False)
             
-            # Load Images
-            frame_name = frames[selected_idx]
-            img_path = os.path.join(image_dir, frame_name)
-            mask_path = os.path.join(mask_dir, frame_name + ".png")
-            
-            img = Image.open(img_path)
-            
-            if show_mask and os.path.exists(mask_path):
-                # Overlay Logic
-                mask = Image.open(mask_path).convert("L")
-                # Create red overlay
-                overlay = Image.new("RGB", img.size, (255, 0, 0))
-                # Composite
-                img = Image.composite(overlay, img, mask)
+            # Load Images (downscaled previews, decoded once and kept in an LRU)
+            entry = frames[selected_idx]
+            frame_name = entry["name"]
+            img = load_preview(cache, data_dir, entry, "preview", "image")
+            mask = load_preview(cache, data_dir, entry, "mask_preview", "mask") if show_mask else None
+
+            if img is None:
+                st.warning(f"Frame {frame_name} is missing from {data_dir}; re-run preprocessing to restore it.")
+            elif mask is not None:
+                # Overlay at preview resolution
+                img = overlay_mask(img, mask)
                 st.caption(f"Viewing: {frame_name} | **Mask Applied**")
             else:
-                st.caption(f"Viewing: {frame_name} | **Raw RGB**")
+                missing = " | Mask missing" if show_mask else ""
+                st.caption(f"Viewing: {frame_name} | **Raw RGB**{missing}")
+
+            if img is not None:
+                st.image(img, use_container_width=True)
 
-            st.image(img, use_container_width=True)
+            # Decode the neighbours in the background so scrubbing stays smooth
+            nearby = frames[max(0, selected_idx - PREFETCH):selected_idx + PREFETCH + 1]
+            keys = ("preview", "mask_preview") if show_mask else ("preview",)
+            cache.prefetch([os.path.join(data_dir, e[k]) for e in nearby for k in keys if e[k]])
             
+        elif os.path.exists(image_dir) and len(os.listdir(image_dir)) > 0:
+            # Frames from before previews existed: build them once
+            with st.spinner("Building frame previews..."):
+                build_previews(data_dir)
+            st.rerun()
         else:
             st.warning("No processed frames found. Run the pipeline first.")
 
 # --- PIPELINE RUNNER ---
-if run_btn:
-    with tab_logs:
-        st.subheader("Execution Logs")
-        
-        # Step 1: Preprocess
-        st.info(f"[*] Starting Preprocessing on {video_path}...")
-        os.makedirs("project_output/data", exist_ok=True)
-        cmd_1 = f"python preprocess.py --video {video_path} --out project_output/data --sample_rate {sample_rate} --blur_threshold {blur_threshold}"
-        log_1 = run_command(cmd_1)
-        if log_1:
-            st.code(log_1, language="bash")
-            st.toast("Preprocessing Complete!", icon="✅")
-        else:
-            st.error("Preprocessing Failed! Check logs above.")
-            st.stop()
-        
-        # Step 2: Reconstruct
-        st.info(f"[*] Starting Reconstruction (this may take a while)...")
-        os.makedirs("project_output/reconstruction", exist_ok=True)
-        cmd_2 = f"python reconstruct.py --data project_output/data --out project_output/reconstruction"
-        log_2 = run_command(cmd_2)
-        if log_2:
-            st.code(log_2, language="bash")
-            st.toast("Reconstruction Complete!", icon="🎉")
-        else:
-            st.error("Reconstruction Failed! Check logs above.")
-            st.stop()
-        
-        # Trigger Reload (with delay to let user see status)
-        time.sleep(2)
-        st.rerun()
+if run_btn or preview_btn:
+    if current_job is not None and current_job.status in ("queued", "running"):
+        st.warning(f"Job {current_job.id} is still running. Cancel it first.")
+    elif preview_btn:
+        steps = [
+            [sys.executable, os.path.join(SCRIPT_DIR, "main.py"), "--video", video_path, "--project", "project_output",
+             "--preview", "--blur_threshold", str(blur_threshold)],
+        ]
+        # A no-go verdict is a finished preview, not a failed job; the verdict is read from health.json
+        current_job = submit(JOBS_DIR, steps, name=f"preview {os.path.basename(video_path)}", ok_codes=(0, NO_GO_EXIT))
+        st.toast(f"Preview started (job {current_job.id})", icon="🔎")
+    else:
+        # Runs detached: the page stays responsive and the job survives closing it
+        # One pipeline.py process: heavy modules load once and stages share the model in memory
+        steps = [
+            [sys.executable, os.path.join(SCRIPT_DIR, "pipeline.py"), "--video", video_path, "--project", "project_output",
+             "--sample_rate", str(sample_rate), "--blur_threshold", str(blur_threshold),
+             "--select", select, "--target_overlap", str(target_overlap)],
+        ]
+        current_job = submit(JOBS_DIR, steps, name=os.path.basename(video_path))
+        st.toast(f"Pipeline started (job {current_job.id})", icon="🚀")
+
+with tab_logs:
+    st.subheader("Execution Logs")
+    if current_job is None:
+        st.info("No pipeline runs yet.")
+    else:
+        # Only the panel re-runs while the job is active, the rest of the page stays put
+        refresh = LOG_REFRESH_SECONDS if current_job.status in ("queued", "running") else None
+        st.fragment(run_every=refresh)(job_panel)(current_job.dir)
 
 # --- TAB 2: 3D RECONSTRUCTION ---
 with tab_3d:
+    report = read_health("project_output")
+    if report:
+        st.subheader("Capture Health (Preview)")
+        health = report["health"]
+        if report["status"] == "go":
+            st.success(f"GO: preview of {os.path.basename(report['video'])} in {report['seconds']}s")
+        else:
+            st.error(f"NO-GO: {'; '.join(report['problems'])}")
+        h1, h2, h3, h4 = st.columns(4)
+        h1.metric("Registered", f"{health['registered_ratio']:.0%}", help=f"{health['registered']} of {health['images']} frames")
+        h2.metric("Reprojection Error", f"{health['reprojection_error']} px")
+        h3.metric("Mean Track Length", health["track_length"])
+        h4.metric("3D Points", health["points"])
+
     st.subheader("Interactive 3D View")
     
-    # Priority: Mesh -> Dense -> Sparse
-    # We prefer the mesh if available, but Plotly is better at points. 
-    # Let's stick to Dense Point Cloud for the "Interactive View" as requested, 
-    # but check project_output folder.
-    
     base_dir = "project_output/reconstruction"
-    ply_file = os.path.join(base_dir, "dense", "fused.ply") 
-    
-    # Fallback to sparse if dense missing
-    if not os.path.exists(ply_file):
-        # Depending on colmap version/output
-        candidates = [
-            os.path.join(base_dir, "sparse", "0", "points3D.ply"),
-            os.path.join(base_dir, "fused.ply")
-        ]
-        for c in candidates:
-            if os.path.exists(c):
-                ply_file = c
-                break
+    sources = view_sources(base_dir)
 
-    if os.path.exists(ply_file):
+    if sources:
+        # Dense first: Plotly is better at points than at big meshes
+        view = st.radio("View", list(sources), horizontal=True)
+        ply_file = resolve_level(base_dir, view, sources[view], point_budget)
         st.success(f"loaded model: {ply_file}")
-        
+
         # Metric Cards
-        col1, col2 = st.columns(2)
+        col1, col2, col3 = st.columns(3)
         col1.metric("File Size", f"{os.path.getsize(ply_file)/1024/1024:.2f} MB")
-        col2.metric("Pipeline Status", "Ready for Inspection")
+        running = current_job is not None and current_job.status in ("queued", "running")
+        col2.metric("Pipeline Status", "Job running" if running else "Ready for Inspection")
 
         # Load & Visualize
-        with st.spinner("Rendering 3D Point Cloud..."):
-            trace = load_ply_as_plotly(ply_file)
-            if trace:
+        started = time.perf_counter()
+        with st.spinner("Rendering 3D View..."):
+            try:
+                data = load_view(view, ply_file, os.path.getmtime(ply_file), point_budget, color_levels)
+            except (OSError, ValueError) as e:
+                data = None
+                st.error(f"Failed to parse {ply_file}: {e}")
+            if data:
                 layout = go.Layout(
                     scene=dict(aspectmode='data'),
                     margin=dict(l=0, r=0, b=0, t=0),
                     height=600
                 )
-                fig = go.Figure(data=[trace], layout=layout)
+                fig = go.Figure(data=[build_trace(view, data)], layout=layout)
                 st.plotly_chart(fig, use_container_width=True)
+
+        if data:
+            elapsed = (time.perf_counter() - started) * 1000
+            st.session_state.setdefault("first_render_ms", elapsed)
+            col3.metric("Render Time", f"{elapsed:.0f} ms", help=f"First render this session: {st.session_state['first_render_ms']:.0f} ms")
+            if view == "mesh":
+                st.caption(f"{len(data['faces'])} triangles")
             else:
-                st.error("Failed to parse PLY file.")
+                st.caption(f"Showing {len(data['points'])} of {data['total']} points (voxel subsample)")
     else:
         st.info("No 3D model found yet. Run the pipeline to generate.")
@@ -0,0 +1,322 @@
+import argparse
+import json
+import os
+import subprocess
+import time
+
+from cache import STAGES, StageCache, evict_lru
+from jobs import parse_progress
+from main import plan_stages, stage_command
+from profiling import rusage_peak, total_memory
+
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".avi", ".mkv")
+
+# Scheduling units: consecutive pipeline stages run as one command, and the
+# resource class that limits how many of them run at once
+TASKS = [
+    ("preprocess", ["frames", "masks"], "cpu"),
+    ("mapping", ["features", "matches", "sparse"], "mapping"),
+    ("dense", ["dense"], "memory"),
+    ("mesh", ["mesh"], "memory"),
+]
+
+SUMMARY_NAME = "summary.json"
+BATCH_SUMMARY_NAME = "batch_summary.json"
+
+def read_video_list(source):
+    """
+    Videos to process: every video file in a directory, or the entries of a
+    manifest (JSON list of paths or {"video": ..., "project": ...} objects,
+    or a text file with one path per line). Returns (video, project name or None)
+    pairs; relative manifest paths are resolved against the manifest's folder.
+    """
+    if os.path.isdir(source):
+        names = sorted(f for f in os.listdir(source) if f.lower().endswith(VIDEO_EXTENSIONS))
+        return [(os.path.join(source, f), None) for f in names]
+
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source) as f:
+        if source.endswith(".json"):
+            items = json.load(f)
+        else:
+            items = [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+    entries = []
+    for item in items:
+        if isinstance(item, dict):
+            video, project = item["video"], item.get("project")
+        else:
+            video, project = item, None
+        entries.append((os.path.join(base, video), project))
+    return entries
+
+def project_names(entries):
+    """
+    One project folder name per video: the manifest's, else the file stem,
+    suffixed when two videos share a stem.
+    """
+    names, seen = [], {}
+    for video, project in entries:
+        name = project or os.path.splitext(os.path.basename(video))[0]
+        seen[name] = seen.get(name, 0) + 1
+        names.append(name if seen[name] == 1 else f"{name}_{seen[name]}")
+    return names
+
+def _reap(proc):
+    """
+    (returncode, peak RSS in bytes or None) once proc has exited, else None.
+    """
+    if hasattr(os, "wait4"):
+        pid, status, usage = os.wait4(proc.pid, os.WNOHANG)
+        if pid == 0:
+            return None
+        # Max RSS over the command and the children it waited for
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        return proc.returncode, rusage_peak(usage)
+    returncode = proc.poll()
+    return None if returncode is None else (returncode, None)
+
+class VideoRun:
+    """
+    One video's pipeline as a queue of tasks, resumed from its stage cache
+    exactly like main.py does for a single video.
+    """
+
+    def __init__(self, video, project, args):
+        self.video = video
+        self.project = project
+        self.args = argparse.Namespace(**{**vars(args), "video": video, "project": project})
+        self.data_dir = os.path.join(project, "data")
+        self.recon_dir = os.path.join(project, "reconstruction")
+        self.log_dir = os.path.join(project, "logs")
+        self.status = "pending"
+        self.records = {}
+        self.started = None
+        self.finished = None
+        self.queue = []
+
+    def plan(self):
+        self.cache = StageCache(self.project)
+        if self.args.force_from:
+            self.cache.invalidate_from(self.args.force_from)
+        self.keys = {stage: (key, outputs) for stage, key, outputs in plan_stages(self.args, self.cache, self.data_dir, self.recon_dir)}
+        first = next((i for i, stage in enumerate(STAGES) if not self.cache.is_valid(stage, self.keys[stage][0])), len(STAGES))
+        todo = STAGES[first:]
+        for task, stages, kind in TASKS:
+            remaining = [s for s in stages if s in todo]
+            if remaining:
+                self.queue.append((task, remaining, kind))
+            else:
+                self.records[task] = {"status": "cached"}
+        self.cache.save()
+
+    def command(self, stages):
+        return stage_command(stages, self.args)
+
+    def record_stages(self, stages, seconds):
+        for stage in stages:
+            key, outputs = self.keys[stage]
+            self.cache.record(stage, key, outputs, seconds)
+        self.cache.save()
+
+    def summary(self):
+        """
+        Stage timings plus throughput derived from the outputs and the
+        [progress] lines in the stage logs. A video that was entirely cached
+        keeps the summary of the run that produced it.
+        """
+        path = os.path.join(self.project, SUMMARY_NAME)
+        if self.started is None and self.status == "done" and os.path.exists(path):
+            with open(path) as f:
+                return {**json.load(f), "cached": True}
+
+        progress = {}
+        for task, _, _ in TASKS:
+            log = os.path.join(self.log_dir, f"{task}.log")
+            if os.path.exists(log):
+                with open(log, encoding="utf-8", errors="replace") as f:
+                    progress.update(parse_progress(f))
+
+        images_dir = os.path.join(self.data_dir, "images")
+        frames = len([f for f in os.listdir(images_dir) if f.endswith(".jpg")]) if os.path.isdir(images_dir) else 0
+        throughput = {"frames": frames}
+        rates = [
+            ("preprocess", "frames_per_s", frames),
+            ("mapping", "images_registered_per_s", progress.get("sparse", {}).get("registered")),
+            ("dense", "points_fused_per_s", progress.get("dense", {}).get("points_fused")),
+        ]
+        throughput["images_registered"] = progress.get("sparse", {}).get("registered")
+        throughput["points_fused"] = progress.get("dense", {}).get("points_fused")
+        throughput["mesh_triangles"] = progress.get("mesh", {}).get("triangles")
+        for task, name, count in rates:
+            seconds = self.records.get(task, {}).get("seconds")
+            if count and seconds:
+                throughput[name] = round(count / seconds, 2)
+
+        total = (self.finished or time.time()) - self.started if self.started else 0.0
+        return {
+            "video": self.video, "project": self.project, "status": self.status,
+            "total_seconds": round(total, 2), "stages": self.records, "throughput": throughput,
+        }
+
+    def write_summary(self):
+        path = os.path.join(self.project, SUMMARY_NAME)
+        with open(path, "w") as f:
+            json.dump(self.summary(), f, indent=2)
+        return path
+
+class BatchScheduler:
+    """
+    Runs the tasks of many VideoRuns as subprocesses.
+
+    Tasks of one video run in order; tasks of different videos run side by
+    side, limited per resource class: `slots` caps the cpu (frames + masks)
+    and mapping tasks, and memory tasks (MVS, Poisson) only start while
+    their estimated peak RSS fits in the RAM budget together with the ones
+    already running (a lone memory task always may). Estimates start from
+    `ram_estimates` and grow to the largest peak measured so far.
+    Failed tasks are retried up to `retries` times before the video is given up.
+    """
+
+    def __init__(self, runs, slots=None, ram_budget=None, ram_estimates=None, retries=1, retry_delay=5.0, poll=0.5):
+        self.runs = runs
+        self.slots = {"cpu": 1, "mapping": 1, **(slots or {})}
+        self.ram_budget = ram_budget
+        self.estimates = dict(ram_estimates or {})
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.poll = poll
+        self.running = {}  # VideoRun -> (task, stages, kind, Popen, started, log file)
+        self.not_before = {}  # VideoRun -> time a retry may start
+
+    def _fits(self, task, kind):
+        if kind == "memory":
+            if self.ram_budget is None:
+                return True
+            in_use = [self.estimates.get(t, 0) for t, _, k, *_ in self.running.values() if k == "memory"]
+            return not in_use or sum(in_use) + self.estimates.get(task, 0) <= self.ram_budget
+        busy = sum(1 for _, _, k, *_ in self.running.values() if k == kind)
+        return busy < self.slots.get(kind, 1)
+
+    def _start(self, run, task, stages, kind):
+        os.makedirs(run.log_dir, exist_ok=True)
+        record = run.records.setdefault(task, {"attempts": 0})
+        record["attempts"] += 1
+        record["status"] = "running"
+        if run.started is None:
+            run.started = time.time()
+            run.status = "running"
+
+        command = run.command(stages)
+        log = open(os.path.join(run.log_dir, f"{task}.log"), "a")
+        log.write(f"\n[pipeline] Running (attempt {record['attempts']}): {' '.join(command)}\n")
+        log.flush()
+        env = dict(os.environ, PYTHONUNBUFFERED="1")
+        proc = subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT, env=env)
+        print(f"[*] {os.path.basename(run.project)}: {task} started (attempt {record['attempts']})")
+        self.running[run] = (task, stages, kind, proc, time.time(), log)
+
+    def _finish(self, run, returncode, peak):
+        task, stages, kind, _, started, log = self.running.pop(run)
+        log.close()
+        seconds = time.time() - started
+        record = run.records[task]
+        record["seconds"] = round(seconds, 2)
+        record["log"] = os.path.join(run.log_dir, f"{task}.log")
+        if peak is not None:
+            record["peak_rss_mb"] = round(peak / 1024 ** 2, 1)
+            self.estimates[task] = max(self.estimates.get(task, 0), peak)
+
+        name = os.path.basename(run.project)
+        if returncode == 0:
+            record["status"] = "done"
+            run.record_stages(stages, seconds)
+            run.queue.pop(0)
+            print(f"[*] {name}: {task} finished in {seconds:.1f}s")
+            if not run.queue:
+                self._close(run, "done")
+        elif record["attempts"] <= self.retries:
+            record["status"] = "retrying"
+            self.not_before[run] = time.time() + self.retry_delay
+            print(f"[!] {name}: {task} failed (exit {returncode}), retrying")
+        else:
+            record["status"] = "failed"
+            print(f"[!] {name}: {task} failed (exit {returncode}), giving up on this video")
+            self._close(run, "failed")
+
+    def _close(self, run, status):
+        run.status = status
+        run.finished = time.time()
+        run.write_summary()
+
+    def run(self):
+        for run in self.runs:
+            run.plan()
+            if not run.queue:
+                print(f"[cache] {os.path.basename(run.project)}: up to date, skipping")
+                run.status = "done"
+                if not os.path.exists(os.path.join(run.project, SUMMARY_NAME)):
+                    run.write_summary()
+
+        try:
+            while any(r.queue and r.status not in ("done", "failed") for r in self.runs):
+                for run in list(self.running):
+                    result = _reap(self.running[run][3])
+                    if result is not None:
+                        self._finish(run, *result)
+
+                # Earlier videos first, so one video's masking overlaps the previous one's mapping
+                for run in self.runs:
+                    if run in self.running or not run.queue or run.status in ("done", "failed"):
+                        continue
+                    if time.time() < self.not_before.get(run, 0):
+                        continue
+                    task, stages, kind = run.queue[0]
+                    if self._fits(task, kind):
+                        self._start(run, task, stages, kind)
+                time.sleep(self.poll)
+        finally:
+            for run, (_, _, _, proc, _, log) in list(self.running.items()):
+                proc.terminate()
+                proc.wait()
+                log.close()
+        return [run.summary() for run in self.runs]
+
+def print_summary(summaries):
+    print("\n[*] Batch summary:")
+    for s in summaries:
+        stages = ", ".join(f"{task} {r['seconds']:.0f}s" for task, r in s["stages"].items() if "seconds" in r)
+        fps = s["throughput"].get("frames_per_s")
+        rate = f", {fps:.1f} frames/s" if fps else ""
+        status = "cached" if s.get("cached") else s["status"]
+        print(f"    {os.path.basename(s['project']):<24} {status:<7} {s['total_seconds']:8.1f}s  ({stages or 'cached'}{rate})")
+
+def run_batch(args):
+    """
+    main.py --batch: every video of a folder or manifest into its own
+    project under --project.
+    """
+    entries = read_video_list(args.batch)
+    if not entries:
+        print(f"[!] No videos found in {args.batch}")
+        return []
+
+    ram_budget = args.ram_budget_gb * 1024 ** 3 if args.ram_budget_gb else None
+    if ram_budget is None and total_memory():
+        ram_budget = 0.75 * total_memory()
+    estimates = {"dense": args.dense_ram_gb * 1024 ** 3, "mesh": args.mesh_ram_gb * 1024 ** 3}
+
+    runs = [VideoRun(video, os.path.join(args.project, name), args) for (video, _), name in zip(entries, project_names(entries))]
+    budget = f"{ram_budget / 1024 ** 3:.1f} GB" if ram_budget else "unlimited"
+    print(f"[*] Batch: {len(runs)} videos, {args.cpu_slots} preprocess / {args.mapping_slots} mapping slots, RAM budget {budget}")
+
+    scheduler = BatchScheduler(runs, {"cpu": args.cpu_slots, "mapping": args.mapping_slots}, ram_budget, estimates, args.retries)
+    summaries = scheduler.run()
+    with open(os.path.join(args.project, BATCH_SUMMARY_NAME), "w") as f:
+        json.dump(summaries, f, indent=2)
+    print_summary(summaries)
+
+    if args.cache_limit_gb is not None:
+        # Projects of earlier batches in the same folder go first
+        evict_lru(args.project, args.cache_limit_gb * 1024 ** 3, keep=[run.project for run in runs])
+    return summaries
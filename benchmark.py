@@ -0,0 +1,281 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import time
+
+import numpy as np
+
+from pipeline import Pipeline
+from profiling import Profiler, total_memory
+
+RESULTS_FILE = "benchmark_results.json"
+# FRAMESxWIDTHxHEIGHT of each synthetic video (frames per revolution; sampled every
+# --sample_rate, 120 frames keep 6 degree steps that sequential matching registers)
+DEFAULT_SCENARIOS = "120x640x480,240x640x480,120x1280x720"
+
+# How each metric is compared with the baseline: direction, and an absolute
+# tolerance for quality metrics (throughput and times use --tolerance, relative)
+METRICS = {
+    "frames_per_s": ("higher", None),
+    "masks_per_s": ("higher", None),
+    "mask_load_seconds": ("lower", None),
+    "features_per_s": ("higher", None),
+    "registration_ratio": ("higher", 0.05),
+    "rotation_error_deg": ("lower", 0.5),
+    "position_error_pct": ("lower", 1.0),
+    "mesh_seconds": ("lower", None),
+    "total_seconds": ("lower", None),
+}
+
+def parse_scenarios(spec):
+    """
+    [(frames, width, height)] from "120x640x480,60x1280x720".
+    """
+    scenarios = []
+    for item in spec.split(","):
+        item = item.strip()
+        if item:
+            frames, width, height = (int(v) for v in item.lower().split("x"))
+            scenarios.append((frames, width, height))
+    return scenarios
+
+def similarity_transform(src, dst):
+    """
+    Scale s, rotation R and translation t minimizing |s R src + t - dst|
+    over corresponding rows (Umeyama).
+    """
+    src, dst = np.asarray(src, dtype=float), np.asarray(dst, dtype=float)
+    mu_src, mu_dst = src.mean(axis=0), dst.mean(axis=0)
+    xs, xd = src - mu_src, dst - mu_dst
+    U, S, Vt = np.linalg.svd(xd.T @ xs / len(src))
+    D = np.eye(3)
+    if np.linalg.det(U) * np.linalg.det(Vt) < 0:
+        D[2, 2] = -1
+    R = U @ D @ Vt
+    s = np.trace(np.diag(S) @ D) / ((xs ** 2).sum() / len(src))
+    return s, R, mu_dst - s * R @ mu_src
+
+def pose_errors(est, gt):
+    """
+    Median rotation error (degrees) and camera position error (% of the
+    ground-truth trajectory extent) after aligning the estimated camera
+    centers to the ground truth. est and gt are (N, 3, 4) [R | t] arrays
+    of the same frames, world-to-camera.
+    """
+    est, gt = np.asarray(est, dtype=float), np.asarray(gt, dtype=float)
+    centers_est = -np.einsum("nji,nj->ni", est[:, :, :3], est[:, :, 3])
+    centers_gt = -np.einsum("nji,nj->ni", gt[:, :, :3], gt[:, :, 3])
+    s, R, t = similarity_transform(centers_est, centers_gt)
+
+    aligned = s * centers_est @ R.T + t
+    extent = np.linalg.norm(centers_gt.max(axis=0) - centers_gt.min(axis=0))
+    position = np.linalg.norm(aligned - centers_gt, axis=1) / max(extent, 1e-9) * 100
+
+    # Camera rotation relative to the ground-truth world frame is R_est R^T
+    relative = np.einsum("nij,kj,nlk->nil", est[:, :, :3], R, gt[:, :, :3])
+    cos = np.clip((np.trace(relative, axis1=1, axis2=2) - 1) / 2, -1.0, 1.0)
+    rotation = np.degrees(np.arccos(cos))
+    return float(np.median(rotation)), float(np.median(position))
+
+def model_poses(model, sources):
+    """
+    Estimated [R | t] of registered images and the video frame each came
+    from, via the frame manifest (output name -> source frame).
+    """
+    poses, frames = [], []
+    for image in sorted(model.images.values(), key=lambda image: image.name):
+        if not image.has_pose or image.name not in sources or sources[image.name] is None:
+            continue
+        pose = image.cam_from_world()
+        poses.append(np.hstack([pose.rotation.matrix(), np.asarray(pose.translation)[:, None]]))
+        frames.append(sources[image.name])
+    return np.array(poses), frames
+
+def write_gt_masks(scene, data_dir, sources):
+    """
+    Ground-truth silhouettes for the extracted frames, named like the
+    masking stage names them.
+    """
+    import cv2
+
+    from masking import save_mask
+
+    mask_dir = os.path.join(data_dir, "masks")
+    os.makedirs(mask_dir, exist_ok=True)
+    for name, frame in sources.items():
+        image = cv2.imread(os.path.join(data_dir, "images", name))
+        mask = cv2.resize(scene.mask(frame), (image.shape[1], image.shape[0]), interpolation=cv2.INTER_NEAREST)
+        save_mask(mask, os.path.join(mask_dir, name + ".png"))
+
+def run_scenario(frames, width, height, out_dir, sample_rate=2, masks="u2net", dense=True):
+    """
+    Renders (or reuses) one synthetic video and runs the pipeline on it
+    from scratch under a Profiler. Returns the scenario's result entry.
+    """
+    from previews import read_manifest
+    from synthetic import TurntableScene
+
+    name = f"{frames}x{width}x{height}"
+    scene = TurntableScene(frames, width, height)
+    video = os.path.join(out_dir, "videos", f"turntable_{name}.mp4")
+    if not os.path.exists(video):
+        print(f"[*] Rendering synthetic video {name}...")
+        os.makedirs(os.path.dirname(video), exist_ok=True)
+        scene.write_video(video)
+
+    # Always from scratch: the stage and feature caches would skip the work being measured
+    project = os.path.join(out_dir, name)
+    shutil.rmtree(project, ignore_errors=True)
+    profiler = Profiler()
+    pipe = Pipeline(project, video, profiler=profiler)
+    started = time.perf_counter()
+
+    pipe.preprocess(masks=False, sample_rate=sample_rate, blur_threshold=0.0)
+    sources = {e["name"]: e["source_frame"] for e in read_manifest(str(pipe.data_dir))["frames"]}
+    mask_load = None
+    if masks == "gt":
+        write_gt_masks(scene, str(pipe.data_dir), sources)
+    else:
+        from masking import MaskingEngine
+
+        # Load the rembg session outside the timed masks step (the engine reuses it), so
+        # masks/s is steady-state throughput rather than mostly model load on short videos
+        load_started = time.perf_counter()
+        MaskingEngine(masks).warmup()
+        mask_load = round(time.perf_counter() - load_started, 2)
+        pipe.masks(mask_model=masks)
+
+    stages = ["features", "matches", "sparse"] + (["dense"] if dense else [])
+    pipe.reconstruct(stages)
+    if pipe.model is not None and dense:
+        pipe.mesh(lod=False)
+    elif pipe.model is not None:
+        from preview_run import sparse_cloud
+        from reconstruct import create_mesh_from_dense_pcd
+
+        with profiler.step("mesh"):
+            create_mesh_from_dense_pcd(None, pipe.mesh_path, cloud=sparse_cloud(pipe.model), model=pipe.model,
+                                       masks_dir=pipe.data_dir / "masks")
+    total = time.perf_counter() - started
+
+    from colmap_db import FeatureDatabase
+
+    with FeatureDatabase(pipe.recon_dir / "database.db") as db:
+        keypoints = db.num_keypoints()
+    seconds = pipe.timings
+    images = len(sources)
+    metrics = {
+        "frames_per_s": round(images / seconds["preprocess"], 2),
+        "masks_per_s": round(images / seconds["masks"], 2) if "masks" in seconds else None,
+        "mask_load_seconds": mask_load,
+        "features_per_s": round(keypoints / seconds["features"], 1),
+        "registration_ratio": 0.0,
+        "rotation_error_deg": None,
+        "position_error_pct": None,
+        "mesh_seconds": seconds.get("mesh"),
+        "total_seconds": round(total, 2),
+    }
+    if pipe.model is not None:
+        metrics["registration_ratio"] = round(pipe.model.num_reg_images() / max(images, 1), 3)
+        est, matched = model_poses(pipe.model, sources)
+        if len(matched) >= 3:
+            rotation, position = pose_errors(est, scene.poses()[matched])
+            metrics["rotation_error_deg"] = round(rotation, 3)
+            metrics["position_error_pct"] = round(position, 3)
+
+    return {
+        "name": name, "frames": frames, "width": width, "height": height, "sample_rate": sample_rate,
+        "images": images, "keypoints": keypoints, "masks": masks, "dense": dense,
+        "metrics": metrics, "steps": profiler.records,
+    }
+
+def compare(results, baseline, tolerance=0.25):
+    """
+    Regressions of results against a baseline, as readable strings.
+    Throughput and times may be `tolerance` (relative) worse, quality
+    metrics the absolute tolerance in METRICS.
+    """
+    previous = {s["name"]: s["metrics"] for s in baseline.get("scenarios", [])}
+    regressions = []
+    for scenario in results["scenarios"]:
+        base = previous.get(scenario["name"])
+        if base is None:
+            continue
+        for metric, (direction, absolute) in METRICS.items():
+            old, new = base.get(metric), scenario["metrics"].get(metric)
+            if old is None:
+                continue
+            if new is None:
+                regressions.append(f"{scenario['name']} {metric}: {old} -> none")
+                continue
+            if absolute is not None:
+                worse = new < old - absolute if direction == "higher" else new > old + absolute
+            else:
+                worse = new < old * (1 - tolerance) if direction == "higher" else new > old * (1 + tolerance)
+            if worse:
+                regressions.append(f"{scenario['name']} {metric}: {old} -> {new}")
+    return regressions
+
+def machine_info():
+    import cv2
+
+    memory = total_memory()
+    return {
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "memory_gb": round(memory / 1024 ** 3, 1) if memory else None,
+        "opencv": cv2.__version__,
+    }
+
+def print_results(results):
+    print("\n[*] Benchmark results:")
+    header = f"    {'scenario':<14}" + "".join(f"{m:>20}" for m in METRICS)
+    print(header)
+    for s in results["scenarios"]:
+        row = "".join(f"{'-' if s['metrics'][m] is None else s['metrics'][m]:>20}" for m in METRICS)
+        print(f"    {s['name']:<14}{row}")
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end benchmark on synthetic turntable videos")
+    parser.add_argument("--out", default="./benchmark_output", help="Working folder for videos, projects and results (default: ./benchmark_output)")
+    parser.add_argument("--scenarios", default=DEFAULT_SCENARIOS, help=f"Comma separated FRAMESxWIDTHxHEIGHT videos (default: {DEFAULT_SCENARIOS})")
+    parser.add_argument("--sample_rate", type=int, default=2, help="Frame sampling rate (default: 2)")
+    parser.add_argument("--masks", default="u2net", help="rembg model to time, or gt to use the rendered silhouettes (default: u2net)")
+    parser.add_argument("--no_dense", action="store_true", help="Skip dense stereo and mesh the sparse points")
+    parser.add_argument("--baseline", help="Results JSON to compare against; exits 1 on a regression")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative slowdown against the baseline (default: 0.25)")
+    parser.add_argument("--save_baseline", help="Also write the results to this path as the new baseline")
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    results = {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "machine": machine_info(), "scenarios": []}
+    for frames, width, height in parse_scenarios(args.scenarios):
+        print(f"\n[bench] Scenario {frames}x{width}x{height}")
+        results["scenarios"].append(run_scenario(frames, width, height, args.out, args.sample_rate,
+                                                 args.masks, not args.no_dense))
+
+    path = os.path.join(args.out, RESULTS_FILE)
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+    print_results(results)
+    print(f"[*] Results written to {path}")
+    if args.save_baseline:
+        shutil.copyfile(path, args.save_baseline)
+        print(f"[*] Baseline saved to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("[!] Regressions against the baseline:")
+            for r in regressions:
+                print(f"    {r}")
+            sys.exit(1)
+        print("[*] No regressions against the baseline.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+
+# Pipeline stages in execution order. Each stage's key folds in the key of the
+# stage before it, so changing anything upstream invalidates everything below.
+STAGES = ["frames", "masks", "features", "matches", "sparse", "dense", "mesh"]
+
+MANIFEST_NAME = "stage_manifest.json"
+
+def dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for f in files:
+            try:
+                total += os.path.getsize(os.path.join(root, f))
+            except OSError:
+                pass
+    return total
+
+class StageCache:
+    """
+    Per-project manifest of stage keys and outputs.
+
+    A stage key is a SHA-256 over its parameters, the content hashes of its
+    input files and the key of the previous stage. A stage is up to date when
+    its recorded key matches and all its outputs still exist.
+    File hashes are memoized by (size, mtime) so large videos are read once.
+    """
+
+    def __init__(self, project_dir):
+        self.project_dir = Path(project_dir)
+        self.path = self.project_dir / MANIFEST_NAME
+        self.manifest = {"stages": {}, "file_hashes": {}, "last_used": None}
+        if self.path.exists():
+            with open(self.path) as f:
+                self.manifest.update(json.load(f))
+
+    def save(self):
+        self.project_dir.mkdir(parents=True, exist_ok=True)
+        self.manifest["last_used"] = time.time()
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp, self.path)
+
+    def hash_file(self, path):
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        memo = self.manifest["file_hashes"].get(path)
+        if memo and memo["size"] == st.st_size and memo["mtime_ns"] == st.st_mtime_ns:
+            return memo["sha256"]
+
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        self.manifest["file_hashes"][path] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": digest}
+        return digest
+
+    def key(self, stage, params, inputs=(), upstream=None):
+        h = hashlib.sha256()
+        h.update(stage.encode())
+        h.update(json.dumps(params, sort_keys=True, default=str).encode())
+        for path in inputs:
+            h.update(self.hash_file(path).encode())
+        if upstream:
+            h.update(upstream.encode())
+        return h.hexdigest()
+
+    def is_valid(self, stage, key):
+        entry = self.manifest["stages"].get(stage)
+        if not entry or entry["key"] != key:
+            return False
+        return all(os.path.exists(p) for p in entry["outputs"])
+
+    def record(self, stage, key, outputs, seconds):
+        self.manifest["stages"][stage] = {
+            "key": key,
+            "outputs": [str(p) for p in outputs],
+            "seconds": round(seconds, 3),
+            "finished_at": time.time(),
+        }
+
+    def invalidate_from(self, stage):
+        for s in STAGES[STAGES.index(stage):]:
+            self.manifest["stages"].pop(s, None)
+
+def evict_lru(cache_root, limit_bytes, keep=()):
+    """
+    Deletes the least recently used project outputs under cache_root until
+    the projects there fit in limit_bytes. Only directories holding a stage
+    manifest are considered; projects in keep are never evicted.
+    """
+    root = Path(cache_root)
+    if not root.is_dir():
+        return []
+
+    keep = {Path(k).resolve() for k in keep}
+    projects = []
+    for d in root.iterdir():
+        manifest = d / MANIFEST_NAME
+        if not manifest.is_file():
+            continue
+        try:
+            with open(manifest) as f:
+                last_used = json.load(f).get("last_used") or 0
+        except (OSError, ValueError):
+            last_used = 0
+        projects.append((last_used, d, dir_size(d)))
+
+    total = sum(size for _, _, size in projects)
+    evicted = []
+    for _, d, size in sorted(projects, key=lambda p: p[0]):
+        if total <= limit_bytes:
+            break
+        if d.resolve() in keep:
+            continue
+        print(f"[cache] Evicting {d} ({size / 1024 / 1024:.1f} MB, least recently used)")
+        shutil.rmtree(d, ignore_errors=True)
+        total -= size
+        evicted.append(d)
+    return evicted
@@ -0,0 +1,138 @@
+import sqlite3
+
+import numpy as np
+
+# COLMAP encodes an image pair (id1 < id2) as id1 * MAX_IMAGE_ID + id2
+MAX_IMAGE_ID = 2147483647
+
+def pair_id(image_id1, image_id2):
+    if image_id1 > image_id2:
+        image_id1, image_id2 = image_id2, image_id1
+    return image_id1 * MAX_IMAGE_ID + image_id2
+
+def pair_id_to_image_ids(pid):
+    image_id2 = pid % MAX_IMAGE_ID
+    image_id1 = (pid - image_id2) // MAX_IMAGE_ID
+    return image_id1, image_id2
+
+class FeatureDatabase:
+    """
+    Thin sqlite3 view over a COLMAP database for bookkeeping that pycolmap
+    does not expose: per-image content hashes (kept in an extra table COLMAP
+    ignores), and deleting features, images and pairs.
+    """
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(str(path))
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS image_hashes (name TEXT PRIMARY KEY NOT NULL, sha256 TEXT NOT NULL)"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS feature_params (id INTEGER PRIMARY KEY CHECK (id = 0), params TEXT NOT NULL)"
+        )
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def image_ids(self):
+        return {name: image_id for image_id, name in self.conn.execute("SELECT image_id, name FROM images")}
+
+    def image_ids_with_features(self):
+        return {row[0] for row in self.conn.execute("SELECT image_id FROM descriptors")}
+
+    def hashes(self):
+        return dict(self.conn.execute("SELECT name, sha256 FROM image_hashes"))
+
+    def write_hashes(self, hashes):
+        self.conn.execute("DELETE FROM image_hashes")
+        self.conn.executemany("INSERT INTO image_hashes (name, sha256) VALUES (?, ?)", hashes.items())
+        self.conn.commit()
+
+    def feature_params(self):
+        row = self.conn.execute("SELECT params FROM feature_params WHERE id = 0").fetchone()
+        return row[0] if row else None
+
+    def write_feature_params(self, params):
+        self.conn.execute("INSERT OR REPLACE INTO feature_params (id, params) VALUES (0, ?)", (params,))
+        self.conn.commit()
+
+    def _pairs_involving(self, table, image_ids):
+        ids = set(image_ids)
+        return [
+            pid for (pid,) in self.conn.execute(f"SELECT pair_id FROM {table}")
+            if any(i in ids for i in pair_id_to_image_ids(pid))
+        ]
+
+    def delete_pairs(self, image_ids):
+        """
+        Drops raw and verified matches of every pair touching image_ids.
+        """
+        deleted = 0
+        for table in ("matches", "two_view_geometries"):
+            pids = self._pairs_involving(table, image_ids)
+            self.conn.executemany(f"DELETE FROM {table} WHERE pair_id = ?", [(p,) for p in pids])
+            deleted = max(deleted, len(pids))
+        self.conn.commit()
+        return deleted
+
+    def stored_pairs(self):
+        """
+        Pair ids with raw or verified matches.
+        """
+        pids = set()
+        for table in ("matches", "two_view_geometries"):
+            pids.update(row[0] for row in self.conn.execute(f"SELECT pair_id FROM {table}"))
+        return pids
+
+    def delete_pair_ids(self, pids):
+        """
+        Drops raw and verified matches of exactly these pairs.
+        """
+        rows = [(p,) for p in pids]
+        for table in ("matches", "two_view_geometries"):
+            self.conn.executemany(f"DELETE FROM {table} WHERE pair_id = ?", rows)
+        self.conn.commit()
+        return len(rows)
+
+    def delete_features(self, image_ids):
+        """
+        Drops keypoints and descriptors; COLMAP re-extracts images that have none.
+        """
+        rows = [(i,) for i in image_ids]
+        self.conn.executemany("DELETE FROM keypoints WHERE image_id = ?", rows)
+        self.conn.executemany("DELETE FROM descriptors WHERE image_id = ?", rows)
+        self.conn.commit()
+
+    def delete_images(self, image_ids):
+        """
+        Removes images entirely, including their frame entries and pairs.
+        """
+        self.delete_pairs(image_ids)
+        self.delete_features(image_ids)
+        rows = [(i,) for i in image_ids]
+        self.conn.executemany("DELETE FROM pose_priors WHERE corr_data_id = ?", rows)
+        self.conn.executemany("DELETE FROM frame_data WHERE data_id = ?", rows)
+        self.conn.execute("DELETE FROM frames WHERE frame_id NOT IN (SELECT frame_id FROM frame_data)")
+        self.conn.executemany("DELETE FROM images WHERE image_id = ?", rows)
+        self.conn.commit()
+
+    def num_keypoints(self):
+        row = self.conn.execute("SELECT SUM(rows) FROM keypoints").fetchone()
+        return int(row[0] or 0)
+
+    def read_descriptors(self, image_id):
+        row = self.conn.execute("SELECT rows, cols, data FROM descriptors WHERE image_id = ?", (image_id,)).fetchone()
+        if row is None or row[2] is None:
+            return np.zeros((0, 128), dtype=np.uint8)
+        rows, cols, data = row
+        return np.frombuffer(data, dtype=np.uint8).reshape(rows, cols)
+
+    def matched_pairs(self):
+        return {row[0] for row in self.conn.execute("SELECT pair_id FROM matches")}
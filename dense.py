@@ -0,0 +1,325 @@
+import multiprocessing
+import os
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from jobs import emit_progress
+
+def camera_matrices(camera):
+    """
+    OpenCV intrinsics (K, distortion) for the COLMAP camera models the
+    pipeline produces.
+    """
+    model = camera.model.name
+    p = camera.params
+    if model in ("SIMPLE_PINHOLE", "SIMPLE_RADIAL", "RADIAL"):
+        fx = fy = p[0]
+        cx, cy = p[1], p[2]
+        k = list(p[3:5]) + [0.0] * (2 - len(p[3:5]))
+        dist = np.array([k[0], k[1], 0.0, 0.0], dtype=np.float64)
+    elif model in ("PINHOLE", "OPENCV"):
+        fx, fy, cx, cy = p[:4]
+        dist = np.zeros(4, dtype=np.float64)
+        dist[:len(p[4:8])] = p[4:8]
+    else:
+        raise ValueError(f"Unsupported camera model for CPU stereo: {model}")
+    K = np.array([[fx, 0, cx], [0, fy, cy], [0, 0, 1]], dtype=np.float64)
+    return K, dist
+
+def select_neighbors(model, num_sources=2, min_angle=3.0, max_angle=20.0):
+    """
+    Source views for every registered image: the ones sharing the most
+    sparse points at a usable triangulation angle.
+    Returns {image_id: [source image_id, ...]}.
+    """
+    ids = [i for i, im in model.images.items() if im.has_pose]
+    index = {image_id: k for k, image_id in enumerate(ids)}
+    centers = np.array([model.images[i].projection_center() for i in ids])
+
+    # Co-visibility counts from the sparse tracks
+    shared = np.zeros((len(ids), len(ids)), dtype=np.int32)
+    for point in model.points3D.values():
+        seen = sorted({index[el.image_id] for el in point.track.elements if el.image_id in index})
+        if len(seen) > 1:
+            seen = np.array(seen)
+            shared[np.ix_(seen, seen)] += 1
+    np.fill_diagonal(shared, 0)
+
+    # Triangulation angle at the scene center between each pair of cameras
+    scene = np.median(np.array([p.xyz for p in model.points3D.values()]), axis=0) if model.num_points3D() else centers.mean(axis=0)
+    rays = scene - centers
+    rays /= np.linalg.norm(rays, axis=1, keepdims=True)
+    angles = np.degrees(np.arccos(np.clip(rays @ rays.T, -1.0, 1.0)))
+    usable = (angles >= min_angle) & (angles <= max_angle)
+
+    neighbors = {}
+    for k, image_id in enumerate(ids):
+        score = np.where(usable[k], shared[k], 0)
+        order = [j for j in np.argsort(-score) if score[j] > 0][:num_sources]
+        neighbors[image_id] = [ids[j] for j in order]
+    return neighbors
+
+def _load(path, scale, grayscale=False):
+    img = cv2.imread(str(path), cv2.IMREAD_GRAYSCALE if grayscale else cv2.IMREAD_COLOR)
+    if img is None:
+        return None
+    if scale != 1.0:
+        img = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return img
+
+def _to_canonical(img, transpose, flip):
+    # Rectified pair -> horizontal epipolar lines with the reference on the left
+    if transpose:
+        img = img.T if img.ndim == 2 else img.transpose(1, 0, 2)
+    if flip:
+        img = img[:, ::-1]
+    return np.ascontiguousarray(img)
+
+def _from_canonical(img, transpose, flip):
+    if flip:
+        img = img[:, ::-1]
+    if transpose:
+        img = img.T
+    return np.ascontiguousarray(img)
+
+def stereo_depth(ref, src, max_disparity=128, block_size=5):
+    """
+    Depth of ref in its own undistorted pinhole frame, from one source view.
+    ref/src are dicts with gray, K, dist, R, t (cam_from_world); K already
+    matches the (possibly downscaled) image size. Returns a float32 depth
+    map with 0 where no disparity was found.
+    """
+    h, w = ref["gray"].shape
+    R = src["R"] @ ref["R"].T
+    T = (src["t"] - R @ ref["t"]).reshape(3, 1)
+    R1, R2, P1, P2, _, _, _ = cv2.stereoRectify(ref["K"], ref["dist"], src["K"], src["dist"], (w, h), R, T, alpha=0)
+
+    map_ref = cv2.initUndistortRectifyMap(ref["K"], ref["dist"], R1, P1, (w, h), cv2.CV_32FC1)
+    map_src = cv2.initUndistortRectifyMap(src["K"], src["dist"], R2, P2, (w, h), cv2.CV_32FC1)
+    rect_ref = cv2.remap(ref["gray"], *map_ref, cv2.INTER_LINEAR)
+    rect_src = cv2.remap(src["gray"], *map_src, cv2.INTER_LINEAR)
+
+    # stereoRectify picks vertical rectification for mostly vertical baselines
+    transpose = abs(P2[1, 3]) > abs(P2[0, 3])
+    shift = P2[1, 3] if transpose else P2[0, 3]
+    flip = shift > 0  # the source camera lies left of (or above) the reference
+    left = _to_canonical(rect_ref, transpose, flip)
+    right = _to_canonical(rect_src, transpose, flip)
+
+    num_disp = max(16, int(np.ceil(max_disparity / 16.0)) * 16)
+    sgbm = cv2.StereoSGBM_create(
+        minDisparity=0, numDisparities=num_disp, blockSize=block_size,
+        P1=8 * block_size ** 2, P2=32 * block_size ** 2,
+        uniquenessRatio=10, speckleWindowSize=100, speckleRange=2,
+        mode=cv2.STEREO_SGBM_MODE_SGBM_3WAY,
+    )
+    disparity = sgbm.compute(left, right).astype(np.float32) / 16.0
+    disparity = _from_canonical(disparity, transpose, flip)
+
+    # Back-project from the rectified frame into the reference camera
+    f = P1[0, 0]
+    baseline = abs(shift) / P2[0, 0]
+    v, u = np.nonzero(disparity > 0.5)
+    z = f * baseline / disparity[v, u]
+    rect_pts = np.stack([(u - P1[0, 2]) * z / f, (v - P1[1, 2]) * z / f, z], axis=1)
+    cam_pts = rect_pts @ R1  # R1.T applied to row vectors
+
+    # Splat into the undistorted reference grid, keeping the nearest surface
+    depth = np.full(h * w, np.inf, dtype=np.float32)
+    zc = cam_pts[:, 2]
+    front = zc > 1e-6
+    cam_pts, zc = cam_pts[front], zc[front]
+    K = ref["K"]
+    pu = np.round(K[0, 0] * cam_pts[:, 0] / zc + K[0, 2]).astype(np.int64)
+    pv = np.round(K[1, 1] * cam_pts[:, 1] / zc + K[1, 2]).astype(np.int64)
+    inside = (pu >= 0) & (pu < w) & (pv >= 0) & (pv < h)
+    np.minimum.at(depth, pv[inside] * w + pu[inside], zc[inside].astype(np.float32))
+    depth[~np.isfinite(depth)] = 0.0
+    return depth.reshape(h, w)
+
+def _depth_worker(job):
+    # Runs in a worker process; depth maps are exchanged through disk
+    started = time.time()
+    scale = job["scale"]
+    ref = dict(job["ref"], gray=_load(job["ref"]["path"], scale, grayscale=True))
+    depths = []
+    for src in job["sources"]:
+        src = dict(src, gray=_load(src["path"], scale, grayscale=True))
+        d = stereo_depth(ref, src, job["max_disparity"])
+        depths.append(np.where(d > 0, d, np.nan))
+
+    if depths:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN pixels
+            depth = np.nan_to_num(np.nanmedian(np.stack(depths), axis=0), nan=0.0).astype(np.float32)
+    else:
+        depth = np.zeros(ref["gray"].shape, dtype=np.float32)
+
+    # Restrict to the object mask (undistorted like the depth map)
+    color = cv2.undistort(_load(job["ref"]["path"], scale), ref["K"], ref["dist"])
+    mask = _load(job["mask_path"], scale, grayscale=True) if job["mask_path"] else None
+    if mask is not None:
+        mask = cv2.undistort(mask, ref["K"], ref["dist"])
+        depth[mask < 128] = 0.0
+
+    np.savez(job["out"], depth=depth, color=color[:, :, ::-1])
+    return job["name"], time.time() - started, float((depth > 0).mean())
+
+def compute_depth_maps(model, images_path, masks_path, depth_path, num_sources=2, max_image_size=1000,
+                       max_disparity=128, workers=None):
+    """
+    Multi-process SGBM depth maps for every registered image.
+    Returns {image_id: npz path} and the per-view runtimes.
+    """
+    depth_path = Path(depth_path)
+    depth_path.mkdir(parents=True, exist_ok=True)
+    neighbors = select_neighbors(model, num_sources)
+
+    views = {}
+    for image_id in neighbors:
+        image = model.images[image_id]
+        camera = model.cameras[image.camera_id]
+        scale = min(1.0, max_image_size / max(camera.width, camera.height))
+        K, dist = camera_matrices(camera)
+        K[:2] *= scale
+        pose = image.cam_from_world()
+        views[image_id] = {
+            "path": str(Path(images_path) / image.name),
+            "K": K, "dist": dist,
+            "R": pose.rotation.matrix(), "t": np.asarray(pose.translation, dtype=np.float64),
+            "scale": scale,
+        }
+
+    jobs = []
+    for image_id, sources in neighbors.items():
+        name = model.images[image_id].name
+        mask = Path(masks_path) / (name + ".png") if masks_path else None
+        jobs.append({
+            "name": name,
+            "ref": views[image_id],
+            "sources": [views[s] for s in sources],
+            "scale": views[image_id]["scale"],
+            "mask_path": str(mask) if mask is not None and mask.exists() else None,
+            "max_disparity": max_disparity,
+            "out": str(depth_path / f"{image_id}.npz"),
+        })
+
+    workers = max(1, min(workers or os.cpu_count() or 1, len(jobs)))
+    print(f"[*] CPU stereo (SGBM) on {len(jobs)} views, {num_sources} sources each, {workers} workers...")
+    timings = {}
+    # Spawned, not forked: this process already runs cv2/pycolmap threads
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        for name, seconds, valid in pool.map(_depth_worker, jobs):
+            timings[name] = seconds
+            print(f"[*] Depth {name}: {seconds:.2f}s, {valid:.0%} pixels with depth")
+            emit_progress("depth_maps", done=len(timings), total=len(jobs))
+
+    paths = {image_id: job["out"] for image_id, job in zip(neighbors, jobs)}
+    return paths, neighbors, views, timings
+
+def _world_points(depth, K, R, t):
+    v, u = np.nonzero(depth > 0)
+    z = depth[v, u]
+    cam = np.stack([(u - K[0, 2]) * z / K[0, 0], (v - K[1, 2]) * z / K[1, 1], z], axis=1)
+    return (cam - t) @ R, v, u  # R.T @ (x - t) for row vectors
+
+def _read_npz(path, key):
+    """
+    One array of an .npz file, closing the file (np.load keeps it open).
+    """
+    with np.load(path) as data:
+        return data[key]
+
+def fuse_depth_maps(paths, neighbors, views, min_consistent=1, depth_tolerance=0.01):
+    """
+    Keeps depth pixels that at least min_consistent source views agree with
+    (relative depth difference below depth_tolerance), then merges points
+    that fall into the same pixel-footprint voxel. Returns points and colors.
+    """
+    depths = {i: _read_npz(p, "depth") for i, p in paths.items()}
+    points, colors = [], []
+
+    for image_id, depth in depths.items():
+        view = views[image_id]
+        world, v, u = _world_points(depth, view["K"], view["R"], view["t"])
+        if not len(world):
+            continue
+        votes = np.zeros(len(world), dtype=np.int32)
+        for src_id in neighbors[image_id]:
+            src, src_depth = views[src_id], depths[src_id]
+            cam = world @ src["R"].T + src["t"]
+            z = cam[:, 2]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                pu = np.round(src["K"][0, 0] * cam[:, 0] / z + src["K"][0, 2])
+                pv = np.round(src["K"][1, 1] * cam[:, 1] / z + src["K"][1, 2])
+            h, w = src_depth.shape
+            inside = (z > 0) & (pu >= 0) & (pu < w) & (pv >= 0) & (pv < h)
+            observed = np.zeros(len(world), dtype=np.float32)
+            observed[inside] = src_depth[pv[inside].astype(np.int64), pu[inside].astype(np.int64)]
+            votes += (observed > 0) & (np.abs(observed - z) < depth_tolerance * z)
+        keep = votes >= min_consistent
+        points.append(world[keep].astype(np.float32))
+        colors.append(_read_npz(paths[image_id], "color")[v[keep], u[keep]])
+
+    if not points:
+        return np.zeros((0, 3), np.float32), np.zeros((0, 3), np.uint8)
+    points, colors = np.concatenate(points), np.concatenate(colors)
+
+    # Overlapping views see the same surface; keep one point per pixel-sized voxel
+    footprints = [np.median(d[d > 0]) / views[i]["K"][0, 0] for i, d in depths.items() if (d > 0).any()]
+    voxel = float(np.median(footprints))
+    keys = np.floor(points / voxel).astype(np.int64)
+    keys -= keys.min(axis=0)
+    dims = keys.max(axis=0) + 1
+    _, first = np.unique((keys[:, 0] * dims[1] + keys[:, 1]) * dims[2] + keys[:, 2], return_index=True)
+    return points[first], colors[first]
+
+def write_ply(path, points, colors=None, normals=None):
+    """
+    Binary little-endian PLY with float32 positions (and normals) and uint8 colors.
+    """
+    fields = [("x", "<f4"), ("y", "<f4"), ("z", "<f4")]
+    if normals is not None:
+        fields += [("nx", "<f4"), ("ny", "<f4"), ("nz", "<f4")]
+    if colors is not None:
+        fields += [("red", "u1"), ("green", "u1"), ("blue", "u1")]
+    data = np.empty(len(points), dtype=fields)
+    data["x"], data["y"], data["z"] = points.T
+    if normals is not None:
+        data["nx"], data["ny"], data["nz"] = normals.T
+    if colors is not None:
+        data["red"], data["green"], data["blue"] = colors.T
+
+    types = {"<f4": "float", "u1": "uchar"}
+    header = ["ply", "format binary_little_endian 1.0", f"element vertex {len(points)}"]
+    header += [f"property {types[t]} {name}" for name, t in fields]
+    header.append("end_header")
+    with open(path, "wb") as f:
+        f.write(("\n".join(header) + "\n").encode("ascii"))
+        f.write(data.tobytes())
+
+def cpu_dense(model, images_path, masks_path, dense_path, num_sources=2, max_image_size=1000, workers=None):
+    """
+    CUDA-free MVS: SGBM depth maps from rectified neighbouring views,
+    restricted by the masks, fused by a multi-view depth consistency check.
+    Writes dense_path/fused.ply and returns the fused points and colors
+    with the per-view runtimes.
+    """
+    dense_path = Path(dense_path)
+    started = time.time()
+    paths, neighbors, views, timings = compute_depth_maps(
+        model, images_path, masks_path, dense_path / "depth_maps", num_sources, max_image_size, workers=workers)
+
+    print("[*] Fusing depth maps...")
+    points, colors = fuse_depth_maps(paths, neighbors, views)
+    write_ply(dense_path / "fused.ply", points, colors)
+    if timings:
+        per_view = np.array(list(timings.values()))
+        print(f"[*] CPU dense: {len(points)} points from {len(timings)} views in {time.time() - started:.1f}s "
+              f"(per view: mean {per_view.mean():.2f}s, max {per_view.max():.2f}s)")
+    return points, colors, timings
@@ -0,0 +1,274 @@
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import uuid
+
+JOB_FILE = "job.json"
+LOG_FILE = "output.log"
+PROGRESS_PREFIX = "[progress] "
+# A queued job whose runner has not started within this many seconds is considered lost
+START_TIMEOUT = 30
+
+def emit_progress(stage, **values):
+    """
+    Prints one structured progress line (stage plus counters) that job
+    runners and the dashboard pick out of the log.
+    """
+    print(PROGRESS_PREFIX + json.dumps({"stage": stage, **values}), flush=True)
+
+class Progress:
+    """
+    emit_progress for one stage, rate-limited so tight loops can call it
+    every iteration.
+    """
+
+    def __init__(self, stage, interval=1.0):
+        self.stage = stage
+        self.interval = interval
+        self.last = None
+
+    def __call__(self, force=False, **values):
+        now = time.monotonic()
+        if force or self.last is None or now - self.last >= self.interval:
+            self.last = now
+            emit_progress(self.stage, **values)
+
+def parse_progress(lines):
+    """
+    Latest progress values per stage from log lines, in first-seen order.
+    """
+    stages = {}
+    for line in lines:
+        if line.startswith(PROGRESS_PREFIX):
+            try:
+                values = json.loads(line[len(PROGRESS_PREFIX):])
+            except ValueError:
+                continue
+            stages.setdefault(values.pop("stage", "?"), {}).update(values)
+    return stages
+
+def _pid_alive(pid):
+    if not pid:
+        return False
+    if os.name == "nt":
+        out = subprocess.run(["tasklist", "/FI", f"PID eq {pid}"], capture_output=True, text=True).stdout
+        return str(pid) in out
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+class Job:
+    """
+    A pipeline run in the background, recorded in <jobs_dir>/<id>/job.json.
+
+    The record is the source of truth: a detached runner process
+    (python jobs.py run <dir>) executes the steps one after another,
+    appends their stdout/stderr to output.log and updates the record, so
+    the dashboard can be closed and reopened without losing the job.
+    """
+
+    def __init__(self, job_dir):
+        self.dir = os.path.abspath(job_dir)
+        self.path = os.path.join(self.dir, JOB_FILE)
+        self.log_path = os.path.join(self.dir, LOG_FILE)
+        self.record = {}
+        self.load()
+
+    def load(self):
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                self.record = json.load(f)
+        return self.record
+
+    def save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.record, f, indent=2)
+        os.replace(tmp, self.path)
+
+    def update(self, **fields):
+        self.load()
+        self.record.update(fields)
+        self.save()
+
+    @property
+    def id(self):
+        return self.record.get("id")
+
+    @property
+    def status(self):
+        return self.record.get("status")
+
+    def refresh(self):
+        """
+        Reloads the record and marks the job failed if its runner died
+        without saying so (machine restart, kill -9).
+        """
+        self.load()
+        if self.status == "queued":
+            lost = time.time() - self.record.get("created", 0) > START_TIMEOUT
+        else:
+            lost = self.status == "running" and not _pid_alive(self.record.get("pid"))
+        if lost:
+            self.update(status="failed", error="runner process disappeared", finished=time.time())
+        return self.record
+
+    def tail(self, max_bytes=64 * 1024):
+        """
+        The last max_bytes of the log, starting at a line boundary.
+        """
+        if not os.path.exists(self.log_path):
+            return ""
+        with open(self.log_path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            f.seek(max(0, size - max_bytes))
+            data = f.read()
+        if size > max_bytes and b"\n" in data:
+            data = data[data.index(b"\n") + 1:]
+        return data.decode("utf-8", "replace")
+
+    def progress(self):
+        """
+        Latest per-stage progress. Reads the whole log, which only holds
+        pipeline output and stays small.
+        """
+        if not os.path.exists(self.log_path):
+            return {}
+        with open(self.log_path, encoding="utf-8", errors="replace") as f:
+            return parse_progress(f)
+
+    def cancel(self):
+        """
+        Asks the runner to stop; it terminates the running step and
+        records the job as cancelled.
+        """
+        self.refresh()
+        if self.status not in ("queued", "running"):
+            return False
+        self.update(cancel_requested=True)
+        pid = self.record.get("pid")
+        if pid is None:
+            # Runner not started yet; it checks the flag before the first step
+            return True
+        if os.name == "nt":
+            subprocess.run(["taskkill", "/T", "/F", "/PID", str(pid)], capture_output=True)
+            self.update(status="cancelled", finished=time.time())
+        else:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                self.update(status="cancelled", finished=time.time())
+        return True
+
+def submit(jobs_dir, steps, name=None, cwd=None, ok_codes=(0,)):
+    """
+    Starts a detached runner for steps (a list of argv lists) and returns its Job.
+    Steps exiting with a code in ok_codes count as completed, e.g. a preview
+    that finishes with a no-go verdict.
+    """
+    job_id = time.strftime("%Y%m%d-%H%M%S") + "-" + uuid.uuid4().hex[:6]
+    job_dir = os.path.join(jobs_dir, job_id)
+    os.makedirs(job_dir, exist_ok=True)
+    job = Job(job_dir)
+    job.record = {
+        "id": job_id, "name": name or job_id, "status": "queued", "steps": steps,
+        "cwd": os.path.abspath(cwd or os.getcwd()), "created": time.time(),
+        "current_step": None, "returncode": None, "ok_codes": list(ok_codes),
+    }
+    job.save()
+
+    kwargs = {}
+    if os.name == "nt":
+        kwargs["creationflags"] = subprocess.CREATE_NEW_PROCESS_GROUP | subprocess.DETACHED_PROCESS
+    else:
+        # Own session: survives the dashboard and is not hit by its Ctrl+C
+        kwargs["start_new_session"] = True
+    # The runner records its own pid and status, so the record has a single writer
+    subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "run", job_dir],
+        cwd=job.record["cwd"], stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        **kwargs,
+    )
+    return job
+
+def list_jobs(jobs_dir):
+    """
+    Jobs under jobs_dir, newest first.
+    """
+    if not os.path.isdir(jobs_dir):
+        return []
+    jobs = [Job(os.path.join(jobs_dir, d)) for d in os.listdir(jobs_dir) if os.path.exists(os.path.join(jobs_dir, d, JOB_FILE))]
+    return sorted(jobs, key=lambda j: j.record.get("created", 0), reverse=True)
+
+def run_job(job_dir):
+    """
+    Runner entry point: executes the job's steps, streaming their output
+    into the log as it is produced.
+    """
+    job = Job(job_dir)
+    child = None
+
+    def on_term(signum, frame):
+        if child is not None and child.poll() is None:
+            # The whole group: steps run worker pools of their own
+            if os.name == "nt":
+                child.terminate()
+            else:
+                os.killpg(child.pid, signal.SIGTERM)
+        job.update(status="cancelled", finished=time.time())
+        sys.exit(1)
+
+    signal.signal(signal.SIGTERM, on_term)
+    job.update(status="running", started=time.time(), pid=os.getpid())
+    env = dict(os.environ, PYTHONUNBUFFERED="1")
+
+    ok_codes = job.record.get("ok_codes", [0])
+    last = 0
+    with open(job.log_path, "ab", buffering=0) as log:
+        for i, step in enumerate(job.record["steps"]):
+            if job.load().get("cancel_requested"):
+                job.update(status="cancelled", finished=time.time())
+                return 1
+            job.update(current_step=i)
+            log.write(f"\n[pipeline] Running: {' '.join(step)}\n".encode())
+            child = subprocess.Popen(step, stdout=log, stderr=subprocess.STDOUT, cwd=job.record["cwd"], env=env,
+                                     start_new_session=os.name != "nt")
+            returncode = child.wait()
+            if returncode not in ok_codes:
+                job.update(status="failed", returncode=returncode, finished=time.time())
+                log.write(f"[!] Step {i + 1} exited with code {returncode}\n".encode())
+                return returncode
+            if returncode != 0:
+                log.write(f"[*] Step {i + 1} completed with exit code {returncode}\n".encode())
+            last = returncode
+    job.update(status="done", returncode=last, finished=time.time())
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Background pipeline jobs")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("run", help="Run a job's steps (used by submit)")
+    p.add_argument("job_dir")
+    p = sub.add_parser("list", help="List jobs")
+    p.add_argument("--jobs", default="project_output/jobs", help="Jobs folder (default: project_output/jobs)")
+    p = sub.add_parser("cancel", help="Cancel a running job")
+    p.add_argument("job_dir")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        sys.exit(run_job(args.job_dir))
+    elif args.command == "list":
+        for job in list_jobs(args.jobs):
+            job.refresh()
+            print(f"{job.id}  {job.status:<10} {job.record.get('name')}")
+    elif args.command == "cancel":
+        print("[*] Cancel requested." if Job(args.job_dir).cancel() else "[!] Job is not running.")
@@ -0,0 +1,112 @@
+import cv2
+import numpy as np
+
+def small_gray(frame, width=320):
+    """
+    Downscaled grayscale copy of a BGR frame, used for cheap motion tracking.
+    """
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    h, w = gray.shape[:2]
+    if w > width:
+        gray = cv2.resize(gray, (width, int(h * width / w)), interpolation=cv2.INTER_AREA)
+    return gray
+
+def estimate_motion(prev_gray, gray, max_corners=200):
+    """
+    Median feature displacement between two frames, as a fraction of the image width.
+    Tracks Shi-Tomasi corners with pyramidal Lucas-Kanade.
+    Returns None when too few features could be tracked.
+    """
+    pts = cv2.goodFeaturesToTrack(prev_gray, max_corners, 0.01, 7)
+    if pts is None or len(pts) < 8:
+        return None
+    nxt, status, _ = cv2.calcOpticalFlowPyrLK(prev_gray, gray, pts, None, winSize=(21, 21), maxLevel=3)
+    ok = status.ravel() == 1
+    if ok.sum() < 8:
+        return None
+    disp = np.linalg.norm((nxt[ok] - pts[ok]).reshape(-1, 2), axis=1)
+    return float(np.median(disp)) / prev_gray.shape[1]
+
+class KeyframeSelector:
+    """
+    Picks keyframes so that camera motion between them stays roughly constant.
+
+    Candidate frames come in (in order) with their blur score and a small
+    grayscale copy. Motion between consecutive candidates is accumulated from
+    tracked features; once the camera has moved about `step` image widths
+    since the last keyframe (step = 1 - target_overlap), candidates whose
+    accumulated motion lies within +-window of the step form a window, and
+    the best one is kept. Candidates are ranked by sharpness relative to the
+    window's median, minus a penalty for straying from the target step, so no
+    absolute blur threshold is needed.
+    """
+
+    def __init__(self, target_overlap=0.85, window=0.3, max_window=12, motion_weight=0.5):
+        self.step = max(1e-3, 1.0 - target_overlap)
+        self.window = window
+        self.max_window = max_window
+        self.motion_weight = motion_weight
+
+        self.prev_gray = None
+        self.motion = 0.0       # accumulated motion since the last keyframe
+        self.candidates = []    # (motion, score, frame_idx, frame) inside the current window
+        self.seen = 0
+        self.selected = 0
+
+    def _pick(self):
+        scores = np.array([c[1] for c in self.candidates], dtype=np.float64)
+        motions = np.array([c[0] for c in self.candidates], dtype=np.float64)
+        rel = scores / max(np.median(scores), 1e-9)
+        rank = rel - self.motion_weight * np.abs(motions - self.step) / self.step
+        best = int(np.argmax(rank))
+
+        chosen = self.candidates[best]
+        # Motion already made past the chosen frame carries over to the next window
+        self.motion -= chosen[0]
+        rest = [(c[0] - chosen[0],) + tuple(c[1:]) for c in self.candidates[best + 1:]]
+        self.candidates = [c for c in rest if c[0] >= self.step * (1.0 - self.window)]
+        self.selected += 1
+        return chosen[2], chosen[3]
+
+    def push(self, frame_idx, frame, score, gray):
+        """
+        Feeds one candidate. Returns the (frame_idx, frame) keyframes decided so far.
+        """
+        self.seen += 1
+        out = []
+
+        if self.prev_gray is None:
+            # Always keep the first frame
+            self.prev_gray = gray
+            self.selected += 1
+            return [(frame_idx, frame)]
+
+        motion = estimate_motion(self.prev_gray, gray)
+        self.prev_gray = gray
+        if motion is None:
+            # Lost track: treat it as a full step so we do not leave a gap
+            motion = self.step
+        self.motion += motion
+
+        lower = self.step * (1.0 - self.window)
+        upper = self.step * (1.0 + self.window)
+
+        if self.motion > upper and self.candidates:
+            out.append(self._pick())
+
+        if self.motion >= lower:
+            self.candidates.append((self.motion, score, frame_idx, frame))
+            if len(self.candidates) >= self.max_window or self.motion > upper:
+                out.append(self._pick())
+        return out
+
+    def flush(self):
+        out = []
+        if self.candidates:
+            out.append(self._pick())
+        self.candidates = []
+        return out
+
+    def report(self):
+        print(f"[*] Keyframes: kept {self.selected}/{self.seen} candidates "
+              f"(target overlap {1.0 - self.step:.0%}).")
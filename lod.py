@@ -0,0 +1,127 @@
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+from meshing import auto_voxel_size
+from pointcache import load_point_cloud, to_open3d, write_sidecar
+
+LOD_DIR = "lod"
+INDEX_NAME = "index.json"
+
+# Target triangle counts for decimated meshes, finest first
+MESH_TARGETS = [500000, 100000, 20000]
+# Point-cloud voxel sizes as multiples of the automatic meshing voxel
+CLOUD_VOXEL_FACTORS = [1, 2, 4, 8]
+
+def _entry(kind, level, path, index_dir, **info):
+    return {"kind": kind, "level": level, "path": os.path.relpath(path, index_dir),
+            "bytes": os.path.getsize(path), **info}
+
+def build_mesh_lods(mesh_path, out_dir, targets=MESH_TARGETS, mesh=None):
+    """
+    Quadric-decimated copies of the mesh at each target triangle count
+    below its own. Level 0 is the full-resolution file itself; pass the
+    mesh it holds to skip reading it back.
+    """
+    import open3d as o3d
+    out_dir = Path(out_dir)
+    mesh = mesh if mesh is not None else o3d.io.read_triangle_mesh(str(mesh_path))
+    entries = [_entry("mesh", 0, mesh_path, out_dir, triangles=len(mesh.triangles), vertices=len(mesh.vertices))]
+
+    # Cascade: each level is decimated from the previous, smaller one
+    for target in sorted(targets, reverse=True):
+        if target >= len(mesh.triangles):
+            continue
+        mesh = mesh.simplify_quadric_decimation(target_number_of_triangles=target)
+        path = out_dir / f"mesh_lod{len(entries)}.ply"
+        o3d.io.write_triangle_mesh(str(path), mesh)
+        entries.append(_entry("mesh", len(entries), path, out_dir, triangles=len(mesh.triangles), vertices=len(mesh.vertices)))
+    return entries
+
+def build_cloud_lods(cloud_path, out_dir, factors=CLOUD_VOXEL_FACTORS, base_voxel=None, cloud=None):
+    """
+    Voxel-downsampled copies of the point cloud. Level 0 is the full file
+    (or the PointCloudArrays given as `cloud`).
+    """
+    import open3d as o3d
+    out_dir = Path(out_dir)
+    pcd = to_open3d(cloud if cloud is not None else load_point_cloud(cloud_path))
+    entries = [_entry("cloud", 0, cloud_path, out_dir, points=len(pcd.points), voxel_size=0.0)]
+    if not len(pcd.points):
+        return entries
+
+    base_voxel = base_voxel or auto_voxel_size(np.asarray(pcd.points))
+    count = len(pcd.points)
+    for factor in sorted(factors):
+        voxel = base_voxel * factor
+        level = pcd.voxel_down_sample(voxel)
+        if len(level.points) >= count:
+            continue
+        count = len(level.points)
+        path = out_dir / f"cloud_lod{len(entries)}.ply"
+        o3d.io.write_point_cloud(str(path), level)
+        write_sidecar(path)
+        entries.append(_entry("cloud", len(entries), path, out_dir, points=count, voxel_size=voxel))
+    return entries
+
+def write_lod_pyramid(output_dir, mesh_path=None, cloud_path=None, mesh=None, cloud=None):
+    """
+    Builds mesh and point-cloud levels under output_dir/lod and writes
+    lod/index.json describing each level (path, size, element count).
+    In-memory copies of the files can be passed as mesh and cloud.
+    """
+    lod_dir = Path(output_dir) / LOD_DIR
+    lod_dir.mkdir(parents=True, exist_ok=True)
+    levels = []
+    if mesh_path and Path(mesh_path).exists():
+        levels += build_mesh_lods(mesh_path, lod_dir, mesh=mesh)
+    if cloud_path and Path(cloud_path).exists():
+        levels += build_cloud_lods(cloud_path, lod_dir, cloud=cloud)
+
+    index_path = lod_dir / INDEX_NAME
+    with open(index_path, "w") as f:
+        json.dump({"levels": levels}, f, indent=2)
+
+    for e in levels:
+        count = f"{e['triangles']} triangles" if e["kind"] == "mesh" else f"{e['points']} points"
+        print(f"[*] LOD {e['kind']} {e['level']}: {count}, {e['bytes'] / 1024 / 1024:.1f} MB")
+    return index_path
+
+def load_index(output_dir):
+    """
+    The LOD index of output_dir, or None. Levels of a kind whose source
+    (level 0) is missing or newer than the index are left out: they were
+    built from an older cloud or mesh, e.g. before densify ran again.
+    """
+    index_path = Path(output_dir) / LOD_DIR / INDEX_NAME
+    if not index_path.exists():
+        return None
+    with open(index_path) as f:
+        index = json.load(f)
+    # Resolve paths so callers do not need to know where the index lives
+    for e in index["levels"]:
+        e["path"] = str((index_path.parent / e["path"]).resolve())
+
+    built = os.path.getmtime(index_path)
+    stale = {e["kind"] for e in index["levels"]
+             if e["level"] == 0 and (not os.path.exists(e["path"]) or os.path.getmtime(e["path"]) > built)}
+    if stale:
+        print(f"[!] Ignoring stale LOD levels ({', '.join(sorted(stale))}): source changed since they were built")
+        index["levels"] = [e for e in index["levels"] if e["kind"] not in stale]
+    return index
+
+def pick_level(index, kind, budget):
+    """
+    The most detailed level of `kind` ("mesh" or "cloud") whose element
+    count fits the budget (triangles or points), else the coarsest one.
+    Returns the level entry, or None if there are none.
+    """
+    if not index:
+        return None
+    key = "triangles" if kind == "mesh" else "points"
+    levels = sorted((e for e in index["levels"] if e["kind"] == kind), key=lambda e: e[key], reverse=True)
+    if not levels:
+        return None
+    return next((e for e in levels if e[key] <= budget), levels[-1])
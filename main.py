@@ -1,38 +1,159 @@
 import argparse
-import subprocess
 import os
 import sys
+import time
 
-def run_step(command):
-    print(f"\n[pipeline] Running: {command}")
-    result = subprocess.run(command, shell=True)
-    if result.returncode != 0:
-        print(f"[!] Error executing: {command}")
-        sys.exit(1)
+from cache import STAGES, StageCache, evict_lru
+from pipeline import Pipeline
+
+PIPELINE_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pipeline.py")
+
+def plan_stages(args, cache, data_dir, recon_dir):
+    """
+    Stage keys and outputs, in pipeline order.
+    Each key chains the previous one, so a change invalidates everything downstream.
+    """
+    frames_params = {"sample_rate": args.sample_rate, "blur_threshold": args.blur_threshold,
+                     "select": args.select, "target_overlap": args.target_overlap}
+    plan = []
+    key = cache.key("frames", frames_params, inputs=[args.video])
+    plan.append(("frames", key, [os.path.join(data_dir, "images")]))
+
+    key = cache.key("masks", {}, upstream=key)
+    plan.append(("masks", key, [os.path.join(data_dir, "masks")]))
+
+    key = cache.key("features", {}, upstream=key)
+    plan.append(("features", key, [os.path.join(recon_dir, "database.db")]))
+
+    key = cache.key("matches", {"pairing": args.pairing}, upstream=key)
+    plan.append(("matches", key, [os.path.join(recon_dir, "database.db")]))
+
+    key = cache.key("sparse", {}, upstream=key)
+    plan.append(("sparse", key, [os.path.join(recon_dir, "sparse")]))
+
+    key = cache.key("dense", {"backend": args.dense_backend}, upstream=key)
+    plan.append(("dense", key, [os.path.join(recon_dir, "dense", "fused.ply")]))
+
+    key = cache.key("mesh", {"depth": args.depth}, upstream=key)
+    plan.append(("mesh", key, [os.path.join(recon_dir, "final_mesh.ply")]))
+    return plan
+
+def pipeline_options(args):
+    """
+    Per-stage keyword options for Pipeline.run.
+    """
+    return {
+        "preprocess_options": {"sample_rate": args.sample_rate, "blur_threshold": args.blur_threshold,
+                               "select": args.select, "target_overlap": args.target_overlap},
+        "reconstruct_options": {"pairing": args.pairing, "dense_backend": args.dense_backend},
+        "mesh_options": {"depth": args.depth},
+    }
+
+def stage_command(stages, args):
+    """
+    argv running a consecutive run of stages in a separate pipeline.py
+    process (batch mode runs stages of several videos side by side).
+    """
+    command = [sys.executable, PIPELINE_SCRIPT, "--project", args.project, "--stages", ",".join(stages),
+               "--sample_rate", str(args.sample_rate), "--blur_threshold", str(args.blur_threshold),
+               "--select", args.select, "--target_overlap", str(args.target_overlap),
+               "--pairing", args.pairing, "--dense_backend", args.dense_backend, "--depth", str(args.depth)]
+    if args.video:
+        command += ["--video", args.video]
+    return command
 
 def main():
     parser = argparse.ArgumentParser()
-    parser.add_argument("--video", required=True, help="Input video path")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--video", help="Input video path")
+    source.add_argument("--batch", help="Folder of videos, or a manifest (.json or one path per line), each processed into its own project under --project")
     parser.add_argument("--project", default="./project_output", help="Project output folder")
+    parser.add_argument("--sample_rate", type=int, default=10, help="Frame sampling rate (default: 10)")
+    parser.add_argument("--blur_threshold", type=float, default=100.0, help="Blur threshold (default: 100.0)")
+    parser.add_argument("--select", choices=["fixed", "overlap"], default="fixed",
+                        help="fixed: keep every sampled frame above the blur threshold. overlap: keep the sharpest frame per constant-motion step (default: fixed)")
+    parser.add_argument("--target_overlap", type=float, default=0.85, help="Image overlap to keep between keyframes in overlap mode (default: 0.85)")
+    parser.add_argument("--depth", type=int, default=0, help="Poisson reconstruction depth, 0 for automatic (default: 0)")
+    parser.add_argument("--pairing", choices=["sequential", "retrieval"], default="sequential", help="Feature matching pair selection (default: sequential)")
+    parser.add_argument("--dense_backend", choices=["auto", "colmap", "cpu"], default="auto", help="Dense stereo backend; auto uses CPU stereo without CUDA (default: auto)")
+    parser.add_argument("--force-from", dest="force_from", choices=STAGES, default=None,
+                        help="Re-run this stage and everything after it, even if cached")
+    parser.add_argument("--cache_limit_gb", type=float, default=None,
+                        help="Evict least recently used projects next to --project above this total size")
+    parser.add_argument("--cpu_slots", type=int, default=1, help="Batch: videos preprocessed (frames + masks) at once (default: 1)")
+    parser.add_argument("--mapping_slots", type=int, default=1, help="Batch: videos in features/matching/mapping at once (default: 1)")
+    parser.add_argument("--ram_budget_gb", type=float, default=None,
+                        help="Batch: RAM shared by concurrent dense and mesh stages (default: 75%% of physical memory)")
+    parser.add_argument("--dense_ram_gb", type=float, default=4.0, help="Batch: initial peak RAM estimate of a dense stage (default: 4.0)")
+    parser.add_argument("--mesh_ram_gb", type=float, default=3.0, help="Batch: initial peak RAM estimate of a mesh stage (default: 3.0)")
+    parser.add_argument("--retries", type=int, default=1, help="Batch: retries of a failed stage before giving up on the video (default: 1)")
+    parser.add_argument("--preview", action="store_true",
+                        help="Quick low-resolution run on a few frames with health metrics; exits 3 if the capture should be rejected")
+    parser.add_argument("--preview_frames", type=int, default=40, help="Preview: frames spread over the video (default: 40)")
+    parser.add_argument("--preview_mask_model", default="u2netp", help="Preview: rembg model, or none to skip masking (default: u2netp)")
     args = parser.parse_args()
 
+    if args.preview:
+        if args.batch:
+            parser.error("--preview works on a single --video")
+        from preview_run import NO_GO_EXIT, run_preview
+        report = run_preview(args.video, args.project, frames=args.preview_frames,
+                             mask_model=args.preview_mask_model, blur_threshold=args.blur_threshold)
+        sys.exit(0 if report["status"] == "go" else NO_GO_EXIT)
+
+    if args.batch:
+        from batch import run_batch
+        summaries = run_batch(args)
+        sys.exit(0 if summaries and all(s["status"] == "done" for s in summaries) else 1)
+
     # Define paths
     data_dir = os.path.join(args.project, "data")
     recon_dir = os.path.join(args.project, "reconstruction")
-    
-    # 1. Preprocess
-    run_step(f"python preprocess.py --video {args.video} --out {data_dir}")
-    
-    # 2. Reconstruct (Sparse + Dense + Mesh)
-    run_step(f"python reconstruct.py --data {data_dir} --out {recon_dir}")
-    
-    # 3. Visualize (Dense Point Cloud)
-    # Note: We point to the DENSE ply now, not the sparse one
-    dense_ply = os.path.join(recon_dir, "dense", "fused.ply")
-    sparse_model = os.path.join(recon_dir, "sparse")
-    
+
+    cache = StageCache(args.project)
+    if args.force_from:
+        cache.invalidate_from(args.force_from)
+
+    # Resume from the first stage whose key changed or whose outputs are gone
+    plan = plan_stages(args, cache, data_dir, recon_dir)
+    first = next((i for i, (stage, key, _) in enumerate(plan) if not cache.is_valid(stage, key)), len(plan))
+    for stage, _, _ in plan[:first]:
+        print(f"[cache] {stage}: up to date, skipping")
+    todo = plan[first:]
+
+    # 1. Preprocess / 2. Reconstruct (Sparse + Dense + Mesh), all in this process:
+    # the model and dense cloud are handed from stage to stage in memory.
+    # Frames and masks come out of one streaming pass, every other stage runs alone.
+    groups = []
+    for stage, key, outputs in todo:
+        if groups and stage == "masks" and groups[-1][0][0] == "frames":
+            groups[-1].append((stage, key, outputs))
+        else:
+            groups.append([(stage, key, outputs)])
+
+    pipe = Pipeline(args.project, args.video)
+    options = pipeline_options(args)
+    for group in groups:
+        names = [stage for stage, _, _ in group]
+        print(f"\n[pipeline] Running: {', '.join(names)}")
+        started = time.time()
+        if not pipe.run(names, **options):
+            print(f"[!] Stage failed: {', '.join(names)}")
+            sys.exit(1)
+        # Stages sharing one pass all record its wall time
+        seconds = time.time() - started
+        for stage, key, outputs in group:
+            cache.record(stage, key, outputs, seconds)
+        cache.save()
+    cache.save()
+
+    if args.cache_limit_gb is not None:
+        cache_root = os.path.dirname(os.path.abspath(args.project))
+        evict_lru(cache_root, args.cache_limit_gb * 1024 ** 3, keep=[args.project])
+
+    # 3. Visualize (Dense Point Cloud), reusing whatever is still in memory
     print("\n[*] Pipeline Finished. Launching visualizer...")
-    run_step(f"python viz.py --model {sparse_model} --ply {dense_ply}")
+    pipe.visualize()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,178 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+import pycolmap
+
+from jobs import emit_progress
+
+def model_score(model):
+    """
+    Sort key for picking the best of several models: most registered images,
+    then most 3D points, then lowest mean reprojection error.
+    """
+    return (model.num_reg_images(), model.num_points3D(), -model.compute_mean_reprojection_error())
+
+def best_model(maps):
+    """
+    The best-registered model of an incremental_mapping result (dict or list).
+    """
+    models = list(maps.values()) if isinstance(maps, dict) else list(maps)
+    if not models:
+        return None
+    return max(models, key=model_score)
+
+def describe_model(model):
+    return (f"{model.num_reg_images()} images, {model.num_points3D()} points, "
+            f"reprojection error {model.compute_mean_reprojection_error():.3f}px")
+
+def split_chunks(names, chunk_size, overlap):
+    """
+    Overlapping windows over the frame sequence. A short tail is folded into
+    the last chunk so no chunk is too small to map on its own.
+    """
+    if len(names) <= chunk_size:
+        return [list(names)]
+    step = max(1, chunk_size - overlap)
+    chunks = []
+    start = 0
+    while start < len(names):
+        end = start + chunk_size
+        if len(names) - end < step // 2 + overlap:
+            chunks.append(list(names[start:]))
+            break
+        chunks.append(list(names[start:end]))
+        start += step
+    return chunks
+
+def _map_chunk(database_path, images_path, names, output_path, num_threads):
+    # Runs in a worker process; models are exchanged through disk.
+    options = pycolmap.IncrementalPipelineOptions()
+    options.image_names = names
+    options.num_threads = num_threads
+    Path(output_path).mkdir(parents=True, exist_ok=True)
+    maps = pycolmap.incremental_mapping(database_path, images_path, output_path, options)
+    model = best_model(maps)
+    if model is None:
+        return None
+    best_path = Path(output_path) / "best"
+    best_path.mkdir(exist_ok=True)
+    model.write(best_path)
+    return str(best_path)
+
+def _add_images(merged, chunk):
+    """
+    Copies cameras and poses of images registered in chunk but not in merged.
+    Keypoints are copied without 3D links; points are re-triangulated later.
+    """
+    added = 0
+    for image_id, image in chunk.images.items():
+        if not image.has_pose or (merged.exists_image(image_id) and merged.images[image_id].has_pose):
+            continue
+        if not merged.exists_camera(image.camera_id):
+            merged.add_camera_with_trivial_rig(chunk.cameras[image.camera_id])
+        keypoints = np.array([p.xy for p in image.points2D], dtype=np.float64).reshape(-1, 2)
+        new_image = pycolmap.Image(name=image.name, keypoints=keypoints, camera_id=image.camera_id, image_id=image_id)
+        merged.add_image_with_trivial_frame(new_image, image.cam_from_world())
+        added += 1
+    return added
+
+def _center_spread(model):
+    centers = np.array([im.projection_center() for im in model.images.values() if im.has_pose])
+    if len(centers) < 2:
+        return 1.0
+    return float(np.median(np.linalg.norm(centers - centers.mean(axis=0), axis=1)))
+
+def align_models(src, tgt):
+    """
+    tgt_from_src similarity from the images both models registered.
+    Reprojection-based alignment needs triangulated points in tgt's copy of
+    the shared images, which images merged from another chunk do not have
+    yet, so it falls back to matching their projection centers.
+    """
+    for min_inliers, max_error in ((0.3, 8.0), (0.1, 16.0)):
+        sim = pycolmap.align_reconstructions_via_reprojections(src, tgt, min_inliers, max_error)
+        if sim is not None:
+            return sim
+    return pycolmap.align_reconstructions_via_proj_centers(src, tgt, 0.05 * _center_spread(tgt))
+
+def merge_models(models, database_path, images_path, output_path):
+    """
+    Aligns chunk models into the frame of the first (largest) one using the
+    images they share, then re-triangulates all points and runs a global
+    bundle adjustment. Returns (merged model, models that could not be aligned).
+    """
+    models = sorted(models, key=model_score, reverse=True)
+    merged = models[0]
+    pending = models[1:]
+    unmerged = []
+
+    # Keep sweeping: a chunk may only overlap the merged model once its neighbour is in
+    while pending:
+        progress = False
+        rest = []
+        for chunk in pending:
+            sim = align_models(chunk, merged)
+            if sim is None:
+                rest.append(chunk)
+                continue
+            chunk.transform(sim)
+            added = _add_images(merged, chunk)
+            print(f"[*] Merged chunk ({describe_model(chunk)}): +{added} images.")
+            progress = True
+        pending = rest
+        if not progress:
+            unmerged = pending
+            break
+
+    print("[*] Re-triangulating merged model...")
+    merged = pycolmap.triangulate_points(merged, database_path, images_path, output_path, clear_points=True)
+    print("[*] Global bundle adjustment...")
+    pycolmap.bundle_adjustment(merged)
+    return merged, unmerged
+
+def partitioned_mapping(database_path, images_path, output_path, names, chunk_size=80, overlap=20, workers=None):
+    """
+    Maps overlapping chunks of the sequence in parallel worker processes and
+    merges them. Falls back to the best single model when chunks cannot be
+    aligned.
+    """
+    chunks = split_chunks(names, chunk_size, overlap)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(chunks)))
+    num_threads = max(1, (os.cpu_count() or 1) // workers)
+    chunk_root = Path(output_path) / "chunks"
+
+    print(f"[*] Mapping {len(names)} images in {len(chunks)} chunks of {chunk_size} (overlap {overlap}) on {workers} workers...")
+    chunk_models = {}
+    registered = set()  # names registered by any finished chunk; overlaps count once
+    # Spawned, not forked: the parent already runs pycolmap/OpenMP threads
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = {
+            pool.submit(_map_chunk, str(database_path), str(images_path), chunk, str(chunk_root / f"{i:03d}"), num_threads): i
+            for i, chunk in enumerate(chunks)
+        }
+        for future in as_completed(futures):
+            i, path = futures[future], future.result()
+            if path is None:
+                print(f"[!] Chunk {i} produced no model.")
+                chunk_models[i] = None
+            else:
+                model = chunk_models[i] = pycolmap.Reconstruction(path)
+                print(f"[*] Chunk {i}: {describe_model(model)}")
+                registered.update(model.images[image_id].name for image_id in model.reg_image_ids())
+            emit_progress("sparse", registered=len(registered), total=len(names),
+                          chunks=len(chunk_models), total_chunks=len(chunks))
+
+    models = [chunk_models[i] for i in sorted(chunk_models) if chunk_models[i] is not None]
+
+    if not models:
+        return None
+    if len(models) == 1:
+        return models[0]
+
+    merged, unmerged = merge_models(models, database_path, images_path, Path(output_path) / "merged")
+    if unmerged:
+        print(f"[!] {len(unmerged)} chunks could not be aligned and were left out.")
+    return best_model([merged] + unmerged)
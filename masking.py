@@ -0,0 +1,495 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+import cv2
+import numpy as np
+from PIL import Image
+
+# Models whose rembg session is a plain U2-Net style network.
+# For these we can run a real batched forward pass instead of one frame at a time.
+U2NET_MODELS = ("u2net", "u2netp", "u2net_human_seg", "silueta")
+
+# One session per worker process, created by the pool initializer and
+# reused for every frame that process sees.
+_session = None
+_session_model = None
+
+def _init_session(model):
+    global _session, _session_model
+    if _session is None or _session_model != model:
+        from rembg import new_session
+        _session = new_session(model)
+        _session_model = model
+    return _session
+
+def _dynamic_batch(session):
+    inner = getattr(session, "inner_session", None)
+    if inner is None:
+        return False
+    dim = inner.get_inputs()[0].shape[0]
+    return not isinstance(dim, int)
+
+def _predict_u2net_batch(session, images):
+    """
+    Batched forward pass for U2-Net style sessions.
+    Mirrors rembg's U2netSession.predict, minus the per-image session call.
+    """
+    inputs = [
+        session.normalize(img, (0.485, 0.456, 0.406), (0.229, 0.224, 0.225), (320, 320))
+        for img in images
+    ]
+    name = next(iter(inputs[0]))
+    batch = np.concatenate([inp[name] for inp in inputs], axis=0)
+    pred = session.inner_session.run(None, {name: batch})[0][:, 0, :, :]
+
+    masks = []
+    for img, p in zip(images, pred):
+        lo, hi = p.min(), p.max()
+        p = (p - lo) / max(hi - lo, 1e-8)
+        m = (p * 255).astype(np.uint8)
+        masks.append(cv2.resize(m, img.size, interpolation=cv2.INTER_LANCZOS4))
+    return masks
+
+def predict_masks(frames, model="u2net"):
+    """
+    Runs background removal on a list of BGR frames and returns uint8 masks
+    (White=Car, Black=Background). Only the alpha mask is produced, the RGBA
+    cutout that rembg.remove builds is never materialized.
+    """
+    session = _init_session(model)
+    images = [Image.fromarray(cv2.cvtColor(f, cv2.COLOR_BGR2RGB)) for f in frames]
+
+    if model in U2NET_MODELS and len(images) > 1 and _dynamic_batch(session):
+        return _predict_u2net_batch(session, images)
+
+    return [np.asarray(session.predict(img)[0].convert("L")) for img in images]
+
+class MaskingEngine:
+    """
+    Pool of mask workers, each holding one persistent rembg session.
+
+    workers <= 1 runs inference in the calling process (session created once).
+    Otherwise frames are shipped to worker processes in batches of batch_size.
+    """
+
+    def __init__(self, model="u2net", workers=1, batch_size=4):
+        self.model = model
+        self.workers = max(1, int(workers))
+        self.batch_size = max(1, int(batch_size))
+        self.pool = None
+        if self.workers > 1:
+            # Spawned, not forked: by now the process runs decode/encode threads
+            # and onnxruntime sessions, and forking those can deadlock the child
+            self.pool = ProcessPoolExecutor(
+                max_workers=self.workers, initializer=_init_session, initargs=(model,),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+
+        self.reset_stats()
+
+    def _mark(self, n):
+        if self.started is None:
+            self.started = time.perf_counter()
+        self.masks += n
+
+    def _done(self, future):
+        self.finished = time.perf_counter()
+
+    def submit(self, frames):
+        """
+        Queues one batch, returns a Future resolving to its list of masks.
+        """
+        self._mark(len(frames))
+        if self.pool is not None:
+            future = self.pool.submit(predict_masks, frames, self.model)
+        else:
+            future = Future()
+            try:
+                future.set_result(predict_masks(frames, self.model))
+            except Exception as e:
+                future.set_exception(e)
+        future.add_done_callback(self._done)
+        return future
+
+    def predict(self, frames):
+        """
+        Masks for all frames, in order, spread over the pool in batches.
+        """
+        futures = [
+            self.submit(frames[i:i + self.batch_size])
+            for i in range(0, len(frames), self.batch_size)
+        ]
+        masks = []
+        for f in futures:
+            masks.extend(f.result())
+        return masks
+
+    def warmup(self):
+        """
+        Forces every worker to load its session before timing starts.
+        """
+        dummy = np.zeros((64, 64, 3), dtype=np.uint8)
+        if self.pool is None:
+            predict_masks([dummy], self.model)
+        else:
+            list(self.pool.map(predict_masks, [[dummy]] * self.workers, [self.model] * self.workers))
+
+    def reset_stats(self):
+        self.masks = 0
+        self.started = None
+        self.finished = None
+
+    def throughput(self):
+        if not self.masks or self.started is None or self.finished is None:
+            return 0.0
+        return self.masks / max(self.finished - self.started, 1e-9)
+
+    def report(self):
+        print(f"[*] Masking: {self.masks} masks at {self.throughput():.2f} masks/s "
+              f"({self.workers} workers, batch {self.batch_size}, model {self.model}).")
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+def save_mask(mask, mask_path):
+    # Save mask (Binary: White=Car, Black=Background)
+    cv2.imwrite(mask_path, mask)
+
+def guided_filter(guide, src, radius=8, eps=1e-3):
+    """
+    Edge-aware smoothing of src steered by guide (He et al., guided image filter).
+    Both inputs are float32 in [0, 1] with the same shape.
+    """
+    ksize = (2 * radius + 1, 2 * radius + 1)
+    mean_i = cv2.boxFilter(guide, -1, ksize)
+    mean_p = cv2.boxFilter(src, -1, ksize)
+    corr_ip = cv2.boxFilter(guide * src, -1, ksize)
+    corr_ii = cv2.boxFilter(guide * guide, -1, ksize)
+
+    var_i = corr_ii - mean_i * mean_i
+    cov_ip = corr_ip - mean_i * mean_p
+    a = cov_ip / (var_i + eps)
+    b = mean_p - a * mean_i
+
+    mean_a = cv2.boxFilter(a, -1, ksize)
+    mean_b = cv2.boxFilter(b, -1, ksize)
+    return mean_a * guide + mean_b
+
+def upsample_mask(mask, guide_bgr, radius=8, eps=1e-3):
+    """
+    Resizes a low resolution mask to the guide's size and snaps its edges
+    to the guide image with a guided filter.
+    """
+    h, w = guide_bgr.shape[:2]
+    up = cv2.resize(mask, (w, h), interpolation=cv2.INTER_LINEAR).astype(np.float32) / 255.0
+    guide = cv2.cvtColor(guide_bgr, cv2.COLOR_BGR2GRAY).astype(np.float32) / 255.0
+    refined = guided_filter(guide, up, radius, eps)
+    return (np.clip(refined, 0.0, 1.0) * 255).astype(np.uint8)
+
+def mask_bbox(mask):
+    """
+    (x, y, w, h) of the foreground, or None for an empty mask.
+    """
+    points = cv2.findNonZero((mask > 127).astype(np.uint8))
+    if points is None:
+        return None
+    return cv2.boundingRect(points)
+
+class RoiMaskingEngine:
+    """
+    Wraps a MaskingEngine so inference only sees the region around the car.
+
+    The crop is the previous mask's bounding box grown by margin (a fraction
+    of its size), downscaled so its longest side is at most max_side. The
+    mask comes back at crop resolution and is upsampled with a guided filter
+    against the full-resolution crop. Frames whose mask runs into the crop
+    border (the car left the ROI) or comes back empty are redone full-frame.
+    Exposes the same submit/predict interface as MaskingEngine.
+    """
+
+    def __init__(self, engine, margin=0.15, max_side=1024, edge_fraction=0.02):
+        self.engine = engine
+        self.workers = engine.workers
+        self.batch_size = engine.batch_size
+        self.margin = margin
+        self.max_side = max_side
+        self.edge_fraction = edge_fraction
+        self.post_pool = ThreadPoolExecutor(max_workers=max(2, engine.workers))
+
+        self.bbox = None
+        self.bbox_seq = -1
+        self.seq = 0
+        self.lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.engine.reset_stats()
+        self.cropped = 0
+        self.fallbacks = 0
+        self.full_pixels = 0
+        self.inference_pixels = 0
+
+    def _roi(self, shape):
+        h, w = shape[:2]
+        with self.lock:
+            bbox = self.bbox
+        if bbox is None:
+            return None
+        x, y, bw, bh = bbox
+        mx, my = int(bw * self.margin), int(bh * self.margin)
+        x0, y0 = max(0, x - mx), max(0, y - my)
+        x1, y1 = min(w, x + bw + mx), min(h, y + bh + my)
+        if (x1 - x0) * (y1 - y0) >= 0.9 * w * h:
+            return None
+        return x0, y0, x1, y1
+
+    def _shrink(self, img):
+        h, w = img.shape[:2]
+        scale = min(1.0, self.max_side / float(max(h, w)))
+        if scale < 1.0:
+            img = cv2.resize(img, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+        return img
+
+    def _touches_border(self, mask, roi, shape):
+        # Only borders of the crop that are not also image borders count
+        h, w = shape[:2]
+        x0, y0, x1, y1 = roi
+        fg = mask > 127
+        edges = []
+        if x0 > 0:
+            edges.append(fg[:, 0])
+        if x1 < w:
+            edges.append(fg[:, -1])
+        if y0 > 0:
+            edges.append(fg[0, :])
+        if y1 < h:
+            edges.append(fg[-1, :])
+        return any(e.mean() > self.edge_fraction for e in edges)
+
+    def _finish(self, seq, frames, rois, future):
+        small = future.result()
+        masks = []
+        redo = []
+        for i, (frame, roi, m) in enumerate(zip(frames, rois, small)):
+            h, w = frame.shape[:2]
+            if roi is None:
+                masks.append(upsample_mask(m, frame) if m.shape[:2] != (h, w) else m)
+                continue
+            x0, y0, x1, y1 = roi
+            crop_mask = upsample_mask(m, frame[y0:y1, x0:x1])
+            if crop_mask.max() <= 127 or self._touches_border(crop_mask, roi, frame.shape):
+                masks.append(None)
+                redo.append(i)
+                continue
+            full = np.zeros((h, w), dtype=np.uint8)
+            full[y0:y1, x0:x1] = crop_mask
+            masks.append(full)
+
+        if redo:
+            # The car left the ROI: fall back to full-frame inference
+            fresh = self.engine.predict([self._shrink(frames[i]) for i in redo])
+            for i, m in zip(redo, fresh):
+                masks[i] = upsample_mask(m, frames[i]) if m.shape[:2] != frames[i].shape[:2] else m
+            with self.lock:
+                self.fallbacks += len(redo)
+
+        bbox = mask_bbox(masks[-1])
+        with self.lock:
+            if seq > self.bbox_seq:
+                self.bbox = bbox
+                self.bbox_seq = seq
+        return masks
+
+    def submit(self, frames):
+        rois = []
+        inputs = []
+        for frame in frames:
+            roi = self._roi(frame.shape)
+            crop = frame if roi is None else frame[roi[1]:roi[3], roi[0]:roi[2]]
+            small = self._shrink(crop)
+            rois.append(roi)
+            inputs.append(small)
+            with self.lock:
+                self.cropped += roi is not None
+                self.full_pixels += frame.shape[0] * frame.shape[1]
+                self.inference_pixels += small.shape[0] * small.shape[1]
+
+        seq = self.seq
+        self.seq += 1
+        future = self.engine.submit(inputs)
+        return self.post_pool.submit(self._finish, seq, frames, rois, future)
+
+    def predict(self, frames):
+        futures = [
+            self.submit(frames[i:i + self.batch_size])
+            for i in range(0, len(frames), self.batch_size)
+        ]
+        masks = []
+        for f in futures:
+            masks.extend(f.result())
+        return masks
+
+    def warmup(self):
+        self.engine.warmup()
+
+    def throughput(self):
+        return self.engine.throughput()
+
+    def report(self):
+        self.engine.report()
+        ratio = self.inference_pixels / max(self.full_pixels, 1)
+        print(f"[*] ROI: {self.cropped} frames cropped, {self.fallbacks} full-frame fallbacks, "
+              f"inference pixels at {ratio:.1%} of full resolution.")
+
+    def close(self):
+        self.post_pool.shutdown()
+        self.engine.close()
+
+def _flow_gray(frame, scale):
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    if scale != 1.0:
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return gray
+
+def warp_mask(mask, gray_src, gray_dst, scale):
+    """
+    Warps a keyframe mask onto another frame with dense optical flow.
+    Flow is computed on downscaled grayscale (gray_dst -> gray_src) and
+    applied to the full-resolution mask with a backward remap.
+    """
+    flow = cv2.calcOpticalFlowFarneback(gray_dst, gray_src, None, 0.5, 4, 21, 3, 5, 1.1, 0)
+    h, w = mask.shape[:2]
+    if scale != 1.0:
+        flow = cv2.resize(flow, (w, h), interpolation=cv2.INTER_LINEAR) / scale
+    grid_x, grid_y = np.meshgrid(np.arange(w, dtype=np.float32), np.arange(h, dtype=np.float32))
+    map_x = grid_x + flow[..., 0]
+    map_y = grid_y + flow[..., 1]
+    return cv2.remap(mask, map_x, map_y, cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT, borderValue=0)
+
+def mask_iou(a, b):
+    a = a > 127
+    b = b > 127
+    union = np.count_nonzero(a | b)
+    if union == 0:
+        return 1.0
+    return np.count_nonzero(a & b) / union
+
+class MaskPropagator:
+    """
+    Runs segmentation on every Kth frame only and fills the frames in
+    between by warping the two surrounding keyframe masks with optical flow.
+
+    Each in-between mask is a time-weighted blend of the previous and the next
+    keyframe warped onto it. When the two warps disagree (IoU below
+    1 - drift_threshold) the frame gets a fresh inference instead.
+    Frames after the last keyframe (at flush) only have the previous keyframe;
+    there a change in mask area above drift_threshold forces inference.
+
+    process() takes (key, frame) pairs in order and returns (key, mask) pairs
+    once their segment is closed by the next keyframe.
+    """
+
+    def __init__(self, engine, interval=4, drift_threshold=0.15, flow_scale=0.5, flow_workers=None):
+        self.engine = engine
+        self.interval = max(1, int(interval))
+        self.drift_threshold = drift_threshold
+        self.flow_scale = flow_scale
+        self.flow_pool = ThreadPoolExecutor(max_workers=flow_workers or min(8, os.cpu_count() or 1))
+
+        self.count = 0
+        self.last_key = None  # (key, gray, mask) of the latest keyframe
+        self.pending = []     # (key, frame, gray) waiting for the next keyframe
+
+        # Stats
+        self.inferred = 0
+        self.propagated = 0
+        self.redone = 0
+
+    def _infer(self, frames):
+        self.inferred += len(frames)
+        return self.engine.predict(frames)
+
+    def _fill(self, segment, prev, nxt):
+        """
+        Masks for the in-between frames of one segment.
+        Returns (masks, indices that drifted).
+        """
+        def one(i):
+            _, frame, gray = segment[i]
+            warped_prev = warp_mask(prev[2], prev[1], gray, self.flow_scale)
+            if nxt is None:
+                ref = max(np.count_nonzero(prev[2] > 127), 1)
+                change = abs(np.count_nonzero(warped_prev > 127) - ref) / ref
+                return warped_prev, change > self.drift_threshold
+
+            warped_next = warp_mask(nxt[2], nxt[1], gray, self.flow_scale)
+            if mask_iou(warped_prev, warped_next) < 1.0 - self.drift_threshold:
+                return None, True
+            w = (i + 1) / (len(segment) + 1)
+            blend = cv2.addWeighted(warped_prev, 1.0 - w, warped_next, w, 0)
+            return blend, False
+
+        results = list(self.flow_pool.map(one, range(len(segment))))
+        masks = [m for m, _ in results]
+        drifted = [i for i, (_, d) in enumerate(results) if d]
+        return masks, drifted
+
+    def _close_segment(self, segment, prev, nxt):
+        if prev is None:
+            # Nothing to propagate from yet
+            masks = self._infer([f for _, f, _ in segment])
+            return list(zip([k for k, _, _ in segment], masks))
+
+        masks, drifted = self._fill(segment, prev, nxt)
+        if drifted:
+            fresh = self._infer([segment[i][1] for i in drifted])
+            for i, m in zip(drifted, fresh):
+                masks[i] = m
+            self.redone += len(drifted)
+        self.propagated += len(segment) - len(drifted)
+        return list(zip([k for k, _, _ in segment], masks))
+
+    def process(self, items):
+        frames = []
+        for key, frame in items:
+            gray = _flow_gray(frame, self.flow_scale)
+            frames.append((key, frame, gray, self.count % self.interval == 0))
+            self.count += 1
+
+        # All keyframes of the chunk go through the engine together
+        key_frames = [f for _, f, _, is_key in frames if is_key]
+        key_masks = iter(self._infer(key_frames)) if key_frames else iter(())
+
+        out = []
+        for key, frame, gray, is_key in frames:
+            if not is_key:
+                self.pending.append((key, frame, gray))
+                continue
+            mask = next(key_masks)
+            current = (key, gray, mask)
+            if self.pending:
+                out.extend(self._close_segment(self.pending, self.last_key, current))
+                self.pending = []
+            out.append((key, mask))
+            self.last_key = current
+        return out
+
+    def flush(self):
+        out = []
+        if self.pending:
+            out = self._close_segment(self.pending, self.last_key, None)
+            self.pending = []
+        return out
+
+    def report(self):
+        total = self.inferred + self.propagated
+        print(f"[*] Propagation: {self.propagated}/{total} masks propagated, {self.inferred} inferred "
+              f"({self.redone} forced by drift, keyframe interval {self.interval}).")
+
+    def close(self):
+        self.flow_pool.shutdown()
@@ -0,0 +1,103 @@
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+def robust_extent(points, clip=1.0):
+    """
+    Per-axis size of the cloud between the clip and 100 - clip percentiles,
+    so a few stray points do not blow up the bounding box.
+    """
+    if len(points) > 100000:
+        points = points[np.random.default_rng(0).choice(len(points), 100000, replace=False)]
+    lo, hi = np.percentile(points, [clip, 100.0 - clip], axis=0)
+    return hi - lo
+
+def auto_voxel_size(points, target=400):
+    """
+    Voxel edge that splits the bounding-box diagonal into about `target` cells.
+    """
+    return float(np.linalg.norm(robust_extent(points))) / target
+
+def poisson_depth(points, spacing, min_depth=6, max_depth=11):
+    """
+    Octree depth whose finest cells are about the point spacing across the
+    object's largest extent.
+    """
+    extent = float(robust_extent(points).max())
+    if spacing <= 0 or extent <= 0:
+        return min_depth
+    depth = int(np.ceil(np.log2(extent / spacing)))
+    return int(np.clip(depth, min_depth, max_depth))
+
+def nearest_centers(points, centers, chunk=200000):
+    """
+    Index of the nearest camera center for every point, in chunks to bound
+    the size of the point x camera distance matrix.
+    """
+    centers = np.asarray(centers, dtype=np.float64)
+    c2 = (centers ** 2).sum(axis=1)
+    chunk = max(1, chunk * 64 // max(len(centers), 1))
+    out = np.empty(len(points), dtype=np.int64)
+    for start in range(0, len(points), chunk):
+        p = points[start:start + chunk]
+        # |p - c|^2 without the |p|^2 term, which does not change the argmin
+        d = c2[None, :] - 2.0 * p @ centers.T
+        out[start:start + chunk] = np.argmin(d, axis=1)
+    return out
+
+def orient_normals(points, normals, centers=None):
+    """
+    Flips normals to face the nearest camera center, or away from the
+    centroid when no cameras are known. Replaces the MST propagation of
+    orient_normals_consistent_tangent_plane.
+    """
+    if centers is not None and len(centers):
+        centers = np.asarray(centers, dtype=np.float64)
+        view = centers[nearest_centers(points, centers)] - points
+    else:
+        view = points - points.mean(axis=0)
+    flip = (normals * view).sum(axis=1) < 0
+    normals[flip] *= -1.0
+    return normals, int(flip.sum())
+
+def mask_votes(points, model, masks_dir, threshold=128):
+    """
+    Projects every point into each registered camera and counts the views
+    that see it (in front, inside the image) and, of those, the views where
+    it lands on the object mask. Occlusion is ignored.
+    Returns (inside_mask, seen) counts per point.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    inside = np.zeros(len(points), dtype=np.int32)
+    seen = np.zeros(len(points), dtype=np.int32)
+    homogeneous = np.hstack([points, np.ones((len(points), 1))])
+
+    for image in model.images.values():
+        mask_path = Path(masks_dir) / (image.name + ".png")
+        if not image.has_pose or not mask_path.exists():
+            continue
+        mask = cv2.imread(str(mask_path), cv2.IMREAD_GRAYSCALE)
+        if mask is None:
+            continue
+        camera = model.cameras[image.camera_id]
+        cam = homogeneous @ image.cam_from_world().matrix().T
+        front = cam[:, 2] > 1e-6
+        uv = camera.img_from_cam(cam[front])
+        h, w = mask.shape
+        # Masks may be stored at a different resolution than the camera
+        u = np.floor(uv[:, 0] * w / camera.width)
+        v = np.floor(uv[:, 1] * h / camera.height)
+        ok = np.isfinite(u) & np.isfinite(v) & (u >= 0) & (u < w) & (v >= 0) & (v < h)
+        idx = np.flatnonzero(front)[ok]
+        seen[idx] += 1
+        inside[idx] += mask[v[ok].astype(np.int64), u[ok].astype(np.int64)] >= threshold
+    return inside, seen
+
+def cull_by_masks(points, model, masks_dir, min_ratio=0.5):
+    """
+    Boolean keep-mask: points that lie on the object mask in at least
+    min_ratio of the views that see them. Points no camera sees are dropped.
+    """
+    inside, seen = mask_votes(points, model, masks_dir)
+    return (seen > 0) & (inside >= min_ratio * seen)
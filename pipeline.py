@@ -0,0 +1,194 @@
+import argparse
+import os
+import sys
+from pathlib import Path
+
+from cache import STAGES
+from profiling import Profiler
+
+# Stages handled by Pipeline.reconstruct, in order
+RECONSTRUCT_STAGES = ["features", "matches", "sparse", "dense"]
+
+class Pipeline:
+    """
+    The scan pipeline as one in-process object.
+
+    preprocess() -> reconstruct() -> mesh() -> visualize(), each usable on
+    its own. Frames and masks stay on disk (COLMAP's extractor reads them
+    from there), but the sparse model, the dense cloud and the mesh are
+    kept on the object and handed to the next stage instead of being read
+    back. The stage modules, and with them pycolmap, open3d and rembg, are
+    only imported when a stage runs.
+
+    Every stage runs as a step of `profiler` (wall time and peak RSS); pass
+    one in to collect the records, e.g. for benchmarks.
+    """
+
+    def __init__(self, project="./project_output", video=None, data_dir=None, recon_dir=None, profiler=None):
+        self.project = project
+        self.video = video
+        self.data_dir = Path(data_dir or os.path.join(project, "data"))
+        self.recon_dir = Path(recon_dir or os.path.join(project, "reconstruction"))
+        self.model = None   # best sparse pycolmap.Reconstruction
+        self.cloud = None   # dense PointCloudArrays
+        self.surface = None # open3d TriangleMesh of the final mesh
+        self.profiler = profiler or Profiler()
+
+    @property
+    def sparse_dir(self):
+        return self.recon_dir / "sparse"
+
+    @property
+    def dense_ply(self):
+        return self.recon_dir / "dense" / "fused.ply"
+
+    @property
+    def mesh_path(self):
+        return self.recon_dir / "final_mesh.ply"
+
+    @property
+    def timings(self):
+        """
+        Seconds per stage run so far (the last run of each).
+        """
+        return {r["step"]: r["seconds"] for r in self.profiler.records}
+
+    def preprocess(self, masks=True, **options):
+        """
+        Frames (and masks unless masks=False) from the video into data/.
+        Options are those of preprocess.process_video.
+        """
+        from preprocess import process_video
+
+        if not self.video:
+            raise ValueError("Pipeline.preprocess needs a video")
+        with self.profiler.step("preprocess"):
+            process_video(self.video, str(self.data_dir), masks=masks, **options)
+        return self
+
+    def masks(self, **options):
+        """
+        (Re)masks the frames already in data/. Options are those of preprocess.mask_images.
+        """
+        from preprocess import mask_images
+
+        with self.profiler.step("masks"):
+            mask_images(str(self.data_dir), **options)
+        return self
+
+    def reconstruct(self, stages=RECONSTRUCT_STAGES, pairing="sequential", top_k=3, chunk_size=0, chunk_overlap=20,
+                    mapper_workers=None, dense_backend="auto", dense_workers=None, max_features=0):
+        """
+        Features, matches, sparse mapping and dense fusion (the ones listed
+        in stages). Returns False if mapping produced no model.
+        """
+        from reconstruct import densify, extract_features, map_sparse, match_features
+
+        self.recon_dir.mkdir(parents=True, exist_ok=True)
+        if "features" in stages:
+            with self.profiler.step("features"):
+                extract_features(self.data_dir, self.recon_dir, max_features)
+
+        if "matches" in stages:
+            with self.profiler.step("matches"):
+                match_features(self.data_dir, self.recon_dir, pairing, top_k)
+
+        if "sparse" in stages:
+            with self.profiler.step("sparse"):
+                self.model = map_sparse(self.data_dir, self.recon_dir, chunk_size, chunk_overlap, mapper_workers)
+            if self.model is None:
+                return False
+
+        if "dense" in stages:
+            with self.profiler.step("dense"):
+                self.cloud = densify(self.data_dir, self.recon_dir, dense_backend, dense_workers, model=self.model)
+        return True
+
+    def mesh(self, depth=0, voxel_size=0.0, mask_ratio=0.5, trim_quantile=None, lod=True):
+        """
+        Poisson mesh of the dense cloud in final_mesh.ply, plus the LOD pyramid.
+        """
+        from reconstruct import create_mesh_from_dense_pcd
+
+        with self.profiler.step("mesh"):
+            self.surface = create_mesh_from_dense_pcd(self.dense_ply, self.mesh_path, depth, self.sparse_dir, voxel_size,
+                                                    self.data_dir / "masks", mask_ratio, trim_quantile,
+                                                    cloud=self.cloud, model=self.model)
+        # Coarser copies so viewers do not have to parse the full-resolution files
+        if lod:
+            from lod import write_lod_pyramid
+
+            with self.profiler.step("lod"):
+                print("[*] Writing LOD pyramid...")
+                write_lod_pyramid(self.recon_dir, self.mesh_path, self.dense_ply, mesh=self.surface, cloud=self.cloud)
+        return self
+
+    def visualize(self, **options):
+        """
+        Open3D window with the dense cloud and the camera frustums. Options
+        are those of viz.visualize_results (screenshot=... renders headless).
+        """
+        from viz import visualize_results
+
+        visualize_results(self.sparse_dir, self.dense_ply, model=self.model, cloud=self.cloud, **options)
+        return self
+
+    def run(self, stages=STAGES, preprocess_options=None, reconstruct_options=None, mesh_options=None):
+        """
+        Runs the given pipeline stages (names from cache.STAGES) in order.
+        Returns False if a stage failed.
+        """
+        if "frames" in stages:
+            self.preprocess(masks="masks" in stages, **(preprocess_options or {}))
+        elif "masks" in stages:
+            self.masks()
+
+        todo = [s for s in RECONSTRUCT_STAGES if s in stages]
+        if todo and not self.reconstruct(todo, **(reconstruct_options or {})):
+            return False
+
+        if "mesh" in stages:
+            self.mesh(**(mesh_options or {}))
+        return True
+
+def main():
+    parser = argparse.ArgumentParser(description="Run pipeline stages in one process")
+    parser.add_argument("--video", help="Input video path (needed for the frames stage)")
+    parser.add_argument("--project", default="./project_output", help="Project output folder")
+    parser.add_argument("--stages", default=",".join(STAGES), help=f"Comma separated stages to run (default: {','.join(STAGES)})")
+    parser.add_argument("--sample_rate", type=int, default=10, help="Frame sampling rate (default: 10)")
+    parser.add_argument("--blur_threshold", type=float, default=100.0, help="Blur threshold (default: 100.0)")
+    parser.add_argument("--select", choices=["fixed", "overlap"], default="fixed",
+                        help="fixed: keep every sampled frame above the blur threshold. overlap: keep the sharpest frame per constant-motion step (default: fixed)")
+    parser.add_argument("--target_overlap", type=float, default=0.85, help="Image overlap to keep between keyframes in overlap mode (default: 0.85)")
+    parser.add_argument("--pairing", choices=["sequential", "retrieval"], default="sequential", help="Feature matching pair selection (default: sequential)")
+    parser.add_argument("--dense_backend", choices=["auto", "colmap", "cpu"], default="auto", help="Dense stereo backend (default: auto)")
+    parser.add_argument("--depth", type=int, default=0, help="Poisson reconstruction depth, 0 for automatic (default: 0)")
+    parser.add_argument("--visualize", action="store_true", help="Open the viewer when done")
+    parser.add_argument("--screenshot", help="Render the final view off-screen to this image file")
+    args = parser.parse_args()
+
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = [s for s in stages if s not in STAGES]
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(unknown)}")
+    if "frames" in stages and not args.video:
+        parser.error("--video is required for the frames stage")
+
+    pipe = Pipeline(args.project, args.video)
+    ok = pipe.run(
+        stages,
+        preprocess_options={"sample_rate": args.sample_rate, "blur_threshold": args.blur_threshold,
+                            "select": args.select, "target_overlap": args.target_overlap},
+        reconstruct_options={"pairing": args.pairing, "dense_backend": args.dense_backend},
+        mesh_options={"depth": args.depth},
+    )
+    if not ok:
+        sys.exit(1)
+    if args.screenshot:
+        pipe.visualize(screenshot=args.screenshot)
+    elif args.visualize:
+        pipe.visualize()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+import json
+import os
+from collections import namedtuple
+from pathlib import Path
+
+import numpy as np
+
+# Arrays are numpy memmaps when read from the sidecar; colors/normals may be None
+PointCloudArrays = namedtuple("PointCloudArrays", ["points", "colors", "normals"])
+
+SIDECAR_SUFFIX = ".npcache"
+FORMAT_VERSION = 1
+
+PLY_TYPES = {
+    "char": "i1", "int8": "i1", "uchar": "u1", "uint8": "u1",
+    "short": "i2", "int16": "i2", "ushort": "u2", "uint16": "u2",
+    "int": "i4", "int32": "i4", "uint": "u4", "uint32": "u4",
+    "float": "f4", "float32": "f4", "double": "f8", "float64": "f8",
+}
+
+def sidecar_path(ply_path):
+    return Path(str(ply_path) + SIDECAR_SUFFIX)
+
+def read_ply_vertices(ply_path):
+    """
+    Vertex positions, colors (uint8) and normals from a PLY file.
+    Binary little-endian files whose first element is the vertex list are
+    read directly with numpy; anything else goes through Open3D.
+    """
+    with open(ply_path, "rb") as f:
+        header = []
+        while True:
+            line = f.readline()
+            if not line:
+                raise ValueError(f"{ply_path}: truncated PLY header")
+            line = line.decode("ascii", "replace").strip()
+            header.append(line)
+            if line == "end_header":
+                break
+        offset = f.tell()
+
+    fmt = next((l.split()[1] for l in header if l.startswith("format")), None)
+    elements = [l.split() for l in header if l.startswith("element")]
+    first = next((i for i, l in enumerate(header) if l.startswith("element")), len(header))
+    fields = []
+    for line in header[first + 1:]:
+        if not line.startswith("property"):
+            break
+        parts = line.split()
+        if parts[1] == "list" or parts[1] not in PLY_TYPES:
+            fields = None
+            break
+        fields.append((parts[2], "<" + PLY_TYPES[parts[1]]))
+
+    if fmt != "binary_little_endian" or not elements or elements[0][1] != "vertex" or fields is None:
+        return _read_with_open3d(ply_path)
+
+    count = int(elements[0][2])
+    data = np.fromfile(ply_path, dtype=np.dtype(fields), count=count, offset=offset)
+    names = data.dtype.names
+    points = np.stack([data["x"], data["y"], data["z"]], axis=1).astype(np.float32)
+    colors = None
+    if all(c in names for c in ("red", "green", "blue")):
+        colors = np.stack([data["red"], data["green"], data["blue"]], axis=1)
+        if colors.dtype != np.uint8:
+            colors = np.clip(colors * (255.0 if colors.dtype.kind == "f" else 1.0), 0, 255).astype(np.uint8)
+    normals = None
+    if all(n in names for n in ("nx", "ny", "nz")):
+        normals = np.stack([data["nx"], data["ny"], data["nz"]], axis=1).astype(np.float32)
+    return PointCloudArrays(points, colors, normals)
+
+def _read_with_open3d(ply_path):
+    import open3d as o3d
+    pcd = o3d.io.read_point_cloud(str(ply_path))
+    points = np.asarray(pcd.points, dtype=np.float32)
+    colors = (np.asarray(pcd.colors) * 255).round().astype(np.uint8) if pcd.has_colors() else None
+    normals = np.asarray(pcd.normals, dtype=np.float32) if pcd.has_normals() else None
+    return PointCloudArrays(points, colors, normals)
+
+def pack_normals(normals):
+    # Unit normals fit int8 with ~1/127 precision, a quarter of float32
+    return np.clip(np.round(normals * 127.0), -127, 127).astype(np.int8)
+
+def unpack_normals(packed):
+    normals = packed.astype(np.float32) / 127.0
+    return normals / np.maximum(np.linalg.norm(normals, axis=1, keepdims=True), 1e-6)
+
+def write_sidecar(ply_path, cloud=None):
+    """
+    Writes the cloud as raw .npy arrays next to the PLY: float32 positions,
+    uint8 colors and int8-packed normals. Reads the PLY when no arrays are given.
+    """
+    cloud = cloud if cloud is not None else read_ply_vertices(ply_path)
+    path = sidecar_path(ply_path)
+    path.mkdir(parents=True, exist_ok=True)
+    (path / "meta.json").unlink(missing_ok=True)
+    np.save(path / "points.npy", np.ascontiguousarray(cloud.points, dtype=np.float32))
+    if cloud.colors is not None:
+        np.save(path / "colors.npy", np.ascontiguousarray(cloud.colors, dtype=np.uint8))
+    if cloud.normals is not None:
+        np.save(path / "normals.npy", pack_normals(np.asarray(cloud.normals)))
+
+    # Written last: a sidecar without meta is incomplete and ignored
+    meta = {"version": FORMAT_VERSION, "points": int(len(cloud.points)),
+            "colors": cloud.colors is not None, "normals": cloud.normals is not None}
+    with open(path / "meta.json", "w") as f:
+        json.dump(meta, f)
+    return path
+
+def sidecar_is_fresh(ply_path):
+    meta = sidecar_path(ply_path) / "meta.json"
+    if not meta.exists() or not os.path.exists(ply_path):
+        return False
+    return os.path.getmtime(meta) >= os.path.getmtime(ply_path)
+
+def open_sidecar(ply_path):
+    """
+    Memory-maps the sidecar arrays. Slicing them reads only what is touched.
+    Normals are returned packed (int8); see unpack_normals.
+    """
+    path = sidecar_path(ply_path)
+    with open(path / "meta.json") as f:
+        meta = json.load(f)
+    if meta.get("version") != FORMAT_VERSION:
+        raise ValueError(f"{path}: unsupported sidecar version {meta.get('version')}")
+    points = np.load(path / "points.npy", mmap_mode="r")
+    colors = np.load(path / "colors.npy", mmap_mode="r") if meta["colors"] else None
+    normals = np.load(path / "normals.npy", mmap_mode="r") if meta["normals"] else None
+    return PointCloudArrays(points, colors, normals)
+
+def load_point_cloud(ply_path):
+    """
+    The cloud from its sidecar when that is newer than the PLY; otherwise
+    parses the PLY once, (re)writes the sidecar and maps that.
+    """
+    if not sidecar_is_fresh(ply_path):
+        write_sidecar(ply_path)
+    return open_sidecar(ply_path)
+
+def to_open3d(cloud):
+    """
+    Open3D PointCloud from PointCloudArrays (copies into Open3D's storage).
+    """
+    import open3d as o3d
+    pcd = o3d.geometry.PointCloud(o3d.utility.Vector3dVector(np.asarray(cloud.points, dtype=np.float64)))
+    if cloud.colors is not None:
+        pcd.colors = o3d.utility.Vector3dVector(np.asarray(cloud.colors, dtype=np.float64) / 255.0)
+    if cloud.normals is not None:
+        normals = cloud.normals
+        normals = unpack_normals(normals) if normals.dtype == np.int8 else normals
+        pcd.normals = o3d.utility.Vector3dVector(np.asarray(normals, dtype=np.float64))
+    return pcd
@@ -2,8 +2,15 @@ import cv2
 import numpy as np
 import argparse
 import os
-from rembg import remove
-from PIL import Image
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from keyframes import KeyframeSelector, small_gray
+from masking import MaskingEngine, MaskPropagator, RoiMaskingEngine, save_mask
+from jobs import Progress, emit_progress
+from previews import PREVIEW_DIR, write_manifest, write_preview
 from tqdm import tqdm
 
 def variance_of_laplacian(image):
@@ -13,77 +20,566 @@ def variance_of_laplacian(image):
     """
     return cv2.Laplacian(image, cv2.CV_64F).var()
 
-def process_video(video_path, output_dir, sample_rate=10, blur_threshold=100.0):
+class FrameSampler:
     """
-    Extracts frames, filters blur, and generates masks.
+    Iterates over the sampled frames of a video without decoding the rest.
+
+    Skipped frames are only grab()'ed (demuxed, never converted to BGR).
+    For large strides the sampler measures what a seek costs compared to
+    grabbing through the gap and seeks to the next sample whenever that is
+    cheaper, so long GOPs are not paid for twice.
+    With target_fps set, frames are picked by footage time instead of
+    every Nth frame.
+    """
+
+    def __init__(self, video_path, sample_rate=10, target_fps=None, seek="auto"):
+        self.video_path = video_path
+        self.sample_rate = max(1, int(sample_rate))
+        self.target_fps = target_fps
+        self.seek = seek  # "auto", "always" or "never"
+
+        self.cap = cv2.VideoCapture(video_path)
+        self.total_frames = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.video_fps = self.cap.get(cv2.CAP_PROP_FPS) or 0.0
+
+        # Stats
+        self.retrieved = 0
+        self.grabbed = 0
+        self.seeks = 0
+        self.elapsed = 0.0
+
+        # Running cost estimates (seconds) used by the "auto" seek policy
+        self._grab_cost = None
+        self._seek_cost = None
+
+    def describe(self):
+        if self.target_fps and self.video_fps > 0:
+            return f"Sampling {self.target_fps:g} frames per second of footage (video is {self.video_fps:.2f} fps)."
+        return f"Sampling every {self.sample_rate}th frame."
+
+    def sample_indices(self):
+        """
+        Frame indices to keep, in order.
+        """
+        if self.target_fps and self.video_fps > 0:
+            step = self.video_fps / float(self.target_fps)
+            k = 0
+            while True:
+                idx = int(round(k * step))
+                if self.total_frames > 0 and idx >= self.total_frames:
+                    return
+                yield idx
+                k += 1
+        else:
+            idx = 0
+            while self.total_frames <= 0 or idx < self.total_frames:
+                yield idx
+                idx += self.sample_rate
+
+    def _should_seek(self, gap):
+        if self.seek == "never" or gap <= 1:
+            return False
+        if self.seek == "always":
+            return True
+        # Auto: grab until we know what a grab costs, then try one seek
+        if self._grab_cost is None:
+            return False
+        if self._seek_cost is None:
+            return True
+        return self._seek_cost < gap * self._grab_cost
+
+    def _grab_to(self, pos, target):
+        t0 = time.perf_counter()
+        n = 0
+        while pos < target:
+            if not self.cap.grab():
+                return pos, False
+            pos += 1
+            n += 1
+        if n:
+            cost = (time.perf_counter() - t0) / n
+            self._grab_cost = cost if self._grab_cost is None else 0.8 * self._grab_cost + 0.2 * cost
+            self.grabbed += n
+        return pos, True
+
+    def _seek_to(self, target):
+        t0 = time.perf_counter()
+        self.cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+        actual = int(self.cap.get(cv2.CAP_PROP_POS_FRAMES))
+        cost = time.perf_counter() - t0
+        self._seek_cost = cost if self._seek_cost is None else 0.8 * self._seek_cost + 0.2 * cost
+        self.seeks += 1
+        if actual != target:
+            # Backend cannot seek frame-accurately, stop trying
+            self.seek = "never"
+        return actual
+
+    def __iter__(self):
+        start = time.perf_counter()
+        pos = 0  # index of the next frame the decoder will return
+        try:
+            for target in self.sample_indices():
+                if target < pos:
+                    continue
+
+                gap = target - pos
+                if self._should_seek(gap):
+                    pos = self._seek_to(target)
+                    if pos > target:
+                        continue
+                pos, ok = self._grab_to(pos, target)
+                if not ok:
+                    break
+
+                # Only the sampled frame is fully decoded
+                ret, frame = self.cap.read()
+                if not ret:
+                    break
+                pos += 1
+                self.retrieved += 1
+                yield target, frame
+        finally:
+            self.elapsed = time.perf_counter() - start
+
+    def report(self):
+        elapsed = max(self.elapsed, 1e-9)
+        traversed = self.retrieved + self.grabbed
+        print(f"[*] Decode: {self.retrieved} frames decoded in {self.elapsed:.2f}s "
+              f"({self.retrieved / elapsed:.1f} decoded frames/s, "
+              f"{traversed / elapsed:.1f} grabbed+decoded frames/s, {self.seeks} seeks).")
+
+    def release(self):
+        self.cap.release()
+
+def score_frame(frame):
+    """
+    Blur score of a BGR frame (variance of the Laplacian on grayscale).
+    """
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    return variance_of_laplacian(gray)
+
+def score_candidate(frame):
+    """
+    Blur score plus the small grayscale copy the keyframe selector tracks motion on.
+    """
+    return score_frame(frame), small_gray(frame)
+
+# Sentinel closing a queue
+_DONE = object()
+
+def _put(q, item, stop_event):
+    """
+    Blocking put that gives up once the pipeline is being torn down.
+    """
+    while not stop_event.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def _decode_stage(sampler, frame_queue, stop_event, errors):
+    try:
+        for frame_idx, frame in sampler:
+            if not _put(frame_queue, (frame_idx, frame), stop_event):
+                break
+    except Exception as e:
+        errors.append(e)
+        stop_event.set()
+    finally:
+        _put(frame_queue, _DONE, stop_event)
+
+def fit_to_side(frame, max_side):
+    """
+    The frame shrunk (never enlarged) so its longest side is at most max_side.
+    """
+    scale = max_side / max(frame.shape[:2])
+    if scale >= 1:
+        return frame
+    size = (round(frame.shape[1] * scale), round(frame.shape[0] * scale))
+    return cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+
+def _clear_frames(directory, suffix):
+    for f in os.listdir(directory):
+        if f.startswith("frame_") and f.endswith(suffix):
+            os.remove(os.path.join(directory, f))
+
+def _write_frame(img_path, frame):
+    cv2.imwrite(img_path, frame)
+    write_preview(frame, img_path)
+
+def _save_mask(mask, mask_path):
+    save_mask(mask, mask_path)
+    write_preview(mask, mask_path)
+
+def build_mask_engine(mask_model="u2net", mask_workers=1, mask_batch=4, roi=False, roi_margin=0.15, roi_max_side=1024):
+    engine = MaskingEngine(mask_model, mask_workers, mask_batch)
+    if roi:
+        engine = RoiMaskingEngine(engine, roi_margin, roi_max_side)
+    return engine
+
+def _mask_stage(engine, mask_queue, stop_event, errors):
+    """
+    Collects frames into batches and keeps the masking engine busy.
+    At most one batch per worker (plus one) is in flight at a time.
+    """
+    inflight = deque()  # (mask paths, future)
+
+    def finish(block):
+        # block waits for the oldest batch only; later batches keep the workers busy
+        if block and inflight:
+            inflight[0][1].result()
+        while inflight and inflight[0][1].done():
+            paths, future = inflight.popleft()
+            for path, mask in zip(paths, future.result()):
+                _save_mask(mask, path)
+
+    def flush(batch):
+        paths = [p for p, _ in batch]
+        frames = [f for _, f in batch]
+        inflight.append((paths, engine.submit(frames)))
+        finish(block=len(inflight) > engine.workers)
+
+    batch = []
+    try:
+        while not stop_event.is_set():
+            try:
+                item = mask_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if item is _DONE:
+                break
+            batch.append(item)
+            if len(batch) >= engine.batch_size:
+                flush(batch)
+                batch = []
+            else:
+                finish(block=False)
+        if batch and not stop_event.is_set():
+            flush(batch)
+        while inflight:
+            finish(block=True)
+    except Exception as e:
+        errors.append(e)
+        stop_event.set()
+
+def _propagate_stage(propagator, mask_queue, stop_event, errors):
+    """
+    Mask propagation variant of the masking stage. Frames are handed to the
+    propagator in chunks holding one keyframe per engine batch slot, so
+    keyframe inference still fills every worker.
+    """
+    engine = propagator.engine
+    chunk_size = propagator.interval * engine.batch_size * engine.workers
+    chunk = []
+    try:
+        while not stop_event.is_set():
+            try:
+                item = mask_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if item is _DONE:
+                break
+            chunk.append(item)
+            if len(chunk) >= chunk_size:
+                for path, mask in propagator.process(chunk):
+                    _save_mask(mask, path)
+                chunk = []
+        if not stop_event.is_set():
+            for path, mask in propagator.process(chunk) + propagator.flush():
+                _save_mask(mask, path)
+    except Exception as e:
+        errors.append(e)
+        stop_event.set()
+
+def process_video(video_path, output_dir, sample_rate=10, blur_threshold=100.0, target_fps=None, seek="auto",
+                  workers=None, mask_workers=1, queue_size=16, mask_batch=4, mask_model="u2net",
+                  propagate=0, drift_threshold=0.15, roi=False, roi_margin=0.15, roi_max_side=1024,
+                  select="fixed", target_overlap=0.85, masks=True, max_side=0):
+    """
+    Extracts frames, filters blur, and generates masks (skipped with masks=False).
+    max_side > 0 downscales kept frames so their longest side fits it.
+
+    Runs as a streaming pipeline:
+    decoder thread -> [frame queue] -> blur/encode pool -> [mask queue] -> masking engine.
+    Queues are bounded, so a slow masking stage throttles decoding instead of
+    piling frames up in memory. Frames are numbered in decode order, so the
+    output names are the same as a sequential run.
+
+    With propagate=K the model only runs on every Kth kept frame and the
+    masks in between are warped from the surrounding keyframes.
+    With roi=True inference runs on a downscaled crop around the previous mask.
+
+    select="fixed" keeps every sampled frame above blur_threshold.
+    select="overlap" treats sampled frames as candidates and keeps the
+    sharpest one each time the camera has moved enough for target_overlap.
     """
     # Create directories
     img_dir = os.path.join(output_dir, "images")
     mask_dir = os.path.join(output_dir, "masks")
     os.makedirs(img_dir, exist_ok=True)
     os.makedirs(mask_dir, exist_ok=True)
+    preview_dir = os.path.join(output_dir, PREVIEW_DIR)
+    os.makedirs(preview_dir, exist_ok=True)
+    # Frames left over from a previous, longer run would leak into COLMAP
+    _clear_frames(img_dir, ".jpg")
+    _clear_frames(preview_dir, ".jpg")
+    if masks:
+        _clear_frames(mask_dir, ".jpg.png")
+        _clear_frames(preview_dir, ".jpg.png")
 
-    cap = cv2.VideoCapture(video_path)
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    workers = workers or min(8, os.cpu_count() or 1)
+    sampler = FrameSampler(video_path, sample_rate, target_fps, seek)
     
     print(f"[*] Processing {video_path}...")
-    print(f"[*] Total frames: {total_frames}. Sampling every {sample_rate}th frame.")
+    print(f"[*] Total frames: {sampler.total_frames}. {sampler.describe()}")
+    print(f"[*] Pipeline: {workers} blur/encode workers, {mask_workers if masks else 0} masking workers, queue size {queue_size}.")
+
+    engine = build_mask_engine(mask_model, mask_workers, mask_batch, roi, roi_margin, roi_max_side) if masks else None
+    selector = KeyframeSelector(target_overlap) if select == "overlap" else None
+    propagator = MaskPropagator(engine, propagate, drift_threshold) if masks and propagate > 1 else None
+
+    frame_queue = queue.Queue(maxsize=queue_size)
+    mask_queue = queue.Queue(maxsize=queue_size)
+    stop_event = threading.Event()
+    errors = []
+
+    decoder = threading.Thread(target=_decode_stage, args=(sampler, frame_queue, stop_event, errors), daemon=True)
+    masker = None
+    if propagator is not None:
+        masker = threading.Thread(target=_propagate_stage, args=(propagator, mask_queue, stop_event, errors), daemon=True)
+    elif engine is not None:
+        masker = threading.Thread(target=_mask_stage, args=(engine, mask_queue, stop_event, errors), daemon=True)
+    decoder.start()
+    if masker is not None:
+        masker.start()
 
-    count = 0
     saved_count = 0
+    sources = {}       # output name -> video frame index, for the frame manifest
+    pending = deque()  # (frame_idx, frame, score future) in decode order
+    writes = deque()   # outstanding JPEG encodes
     
-    pbar = tqdm(total=total_frames)
+    pbar = tqdm(total=sampler.total_frames)
+    progress = Progress("frames")
 
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
-            break
+    def emit(frame_idx, frame):
+        nonlocal saved_count
+        filename = f"frame_{saved_count:05d}.jpg"
+        img_path = os.path.join(img_dir, filename)
+        # COLMAP SAFE NAMING: frame_00000.jpg -> frame_00000.jpg.png
+        mask_path = os.path.join(mask_dir, filename + ".png")
+        if max_side:
+            frame = fit_to_side(frame, max_side)
+
+        # Save original image and its preview (encoded on the pool)
+        writes.append(pool.submit(_write_frame, img_path, frame))
+        sources[filename] = frame_idx
+        # AI Background Removal (Masking) on the masking pool
+        if masks:
+            _put(mask_queue, (mask_path, frame), stop_event)
 
-        # 1. Sampling Rate Check
-        if count % sample_rate == 0:
-            
-            # 2. Blur Detection
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            fm = variance_of_laplacian(gray)
-
-            if fm > blur_threshold:
-                filename = f"frame_{saved_count:05d}.jpg"
-                img_path = os.path.join(img_dir, filename)
-                # COLMAP SAFE NAMING: frame_00000.jpg -> frame_00000.jpg.png
-                mask_path = os.path.join(mask_dir, filename + ".png")
-
-                # Save original image
-                cv2.imwrite(img_path, frame)
-
-                # 3. AI Background Removal (Masking)
-                # Convert to PIL for rembg
-                pil_img = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-                
-                # 'remove' returns the image with alpha channel (RGBA)
-                # We need to extract just the alpha channel as a binary mask
-                no_bg = remove(pil_img)
-                mask = no_bg.split()[-1] # Get Alpha channel
-                
-                # Save mask (Binary: White=Car, Black=Background)
-                mask.save(mask_path)
-
-                saved_count += 1
+        saved_count += 1
+
+        while writes and (len(writes) > queue_size or writes[0].done()):
+            writes.popleft().result()
+
+    def drain(block):
+        # Hand scored frames on strictly in decode order, so numbering is deterministic.
+        # block waits for the oldest frame only, so the pool never runs dry here
+        if block and pending:
+            pending[0][2].result()
+        while pending and pending[0][2].done():
+            frame_idx, frame, future = pending.popleft()
+
+            if selector is not None:
+                fm, gray = future.result()
+                for kf_idx, kf in selector.push(frame_idx, frame, fm, gray):
+                    emit(kf_idx, kf)
+            elif future.result() > blur_threshold:
+                emit(frame_idx, frame)
             else:
                 pass # Frame is too blurry, skip it
 
-        count += 1
-        pbar.update(1)
+            pbar.update(frame_idx + 1 - pbar.n)
+            progress(processed=pbar.n, total=sampler.total_frames, saved=saved_count)
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            while not stop_event.is_set():
+                try:
+                    item = frame_queue.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if item is _DONE:
+                    break
+                frame_idx, frame = item
+                score = score_candidate if selector is not None else score_frame
+                pending.append((frame_idx, frame, pool.submit(score, frame)))
+                drain(block=len(pending) >= queue_size)
+            while pending:
+                drain(block=True)
+            if selector is not None:
+                for kf_idx, kf in selector.flush():
+                    emit(kf_idx, kf)
+            while writes:
+                writes.popleft().result()
+    except BaseException:
+        stop_event.set()
+        raise
+    finally:
+        if masker is not None:
+            _put(mask_queue, _DONE, stop_event)
+            masker.join()
+        stop_event.set()
+        decoder.join()
+        sampler.release()
+        if engine is not None:
+            engine.close()
+        if propagator is not None:
+            propagator.close()
+        pbar.close()
 
-    cap.release()
-    pbar.close()
-    print(f"[*] Done. Saved {saved_count} clean frames and masks to '{output_dir}'.")
+    if errors:
+        raise errors[0]
+
+    progress(force=True, processed=pbar.n, total=sampler.total_frames, saved=saved_count)
+    if masks:
+        emit_progress("masks", done=saved_count, total=saved_count)
+    write_manifest(output_dir, sources)
+    sampler.report()
+    if selector is not None:
+        selector.report()
+    if masks:
+        engine.report()
+        if propagator is not None:
+            propagator.report()
+        print(f"[*] Done. Saved {saved_count} clean frames and masks to '{output_dir}'.")
+    else:
+        print(f"[*] Done. Saved {saved_count} clean frames to '{output_dir}'.")
+
+def mask_images(output_dir, mask_workers=1, queue_size=16, mask_batch=4, mask_model="u2net",
+                propagate=0, drift_threshold=0.15, roi=False, roi_margin=0.15, roi_max_side=1024):
+    """
+    (Re)generates masks for the frames already in output_dir/images,
+    through the same masking stage process_video uses.
+    """
+    img_dir = os.path.join(output_dir, "images")
+    mask_dir = os.path.join(output_dir, "masks")
+    os.makedirs(mask_dir, exist_ok=True)
+    _clear_frames(mask_dir, ".jpg.png")
+    if os.path.isdir(os.path.join(output_dir, PREVIEW_DIR)):
+        _clear_frames(os.path.join(output_dir, PREVIEW_DIR), ".jpg.png")
+
+    frames = sorted(f for f in os.listdir(img_dir) if f.endswith(".jpg"))
+    print(f"[*] Masking {len(frames)} frames in {img_dir}...")
+
+    engine = build_mask_engine(mask_model, mask_workers, mask_batch, roi, roi_margin, roi_max_side)
+    propagator = MaskPropagator(engine, propagate, drift_threshold) if propagate > 1 else None
+
+    mask_queue = queue.Queue(maxsize=queue_size)
+    stop_event = threading.Event()
+    errors = []
+    if propagator is not None:
+        masker = threading.Thread(target=_propagate_stage, args=(propagator, mask_queue, stop_event, errors), daemon=True)
+    else:
+        masker = threading.Thread(target=_mask_stage, args=(engine, mask_queue, stop_event, errors), daemon=True)
+    masker.start()
+
+    progress = Progress("masks")
+    try:
+        for i, filename in enumerate(tqdm(frames)):
+            frame = cv2.imread(os.path.join(img_dir, filename))
+            if not _put(mask_queue, (os.path.join(mask_dir, filename + ".png"), frame), stop_event):
+                break
+            progress(queued=i + 1, total=len(frames))
+    except BaseException:
+        stop_event.set()
+        raise
+    finally:
+        _put(mask_queue, _DONE, stop_event)
+        masker.join()
+        engine.close()
+        if propagator is not None:
+            propagator.close()
+
+    if errors:
+        raise errors[0]
+
+    emit_progress("masks", done=len(frames), total=len(frames))
+    write_manifest(output_dir)
+    engine.report()
+    if propagator is not None:
+        propagator.report()
+    print(f"[*] Done. Saved {len(frames)} masks to '{mask_dir}'.")
+
+def benchmark_masking(video_path, num_frames=32, sample_rate=10, target_fps=None,
+                      mask_workers=1, mask_batch=4, mask_model="u2net", roi=False, roi_margin=0.15, roi_max_side=1024):
+    """
+    Measures masks/s at the given worker count on frames sampled from the video.
+    Sessions are warmed up first so model loading is not counted.
+    """
+    sampler = FrameSampler(video_path, sample_rate, target_fps)
+    frames = []
+    for _, frame in sampler:
+        frames.append(frame)
+        if len(frames) >= num_frames:
+            break
+    sampler.release()
+
+    engine = build_mask_engine(mask_model, mask_workers, mask_batch, roi, roi_margin, roi_max_side)
+    try:
+        print(f"[*] Warming up {engine.workers} masking workers...")
+        engine.warmup()
+        engine.reset_stats()
+        engine.predict(frames)
+    finally:
+        engine.close()
+    engine.report()
+    return engine.throughput()
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
-    parser.add_argument("--video", required=True, help="Path to input video file")
+    parser.add_argument("--video", help="Path to input video file (not needed with --stage masks)")
     parser.add_argument("--out", required=True, help="Output directory")
     parser.add_argument("--sample_rate", type=int, default=10, help="Frame sampling rate (default: 10)")
+    parser.add_argument("--fps", type=float, default=None, help="Sample N frames per second of footage instead of every Nth frame")
+    parser.add_argument("--seek", choices=["auto", "always", "never"], default="auto", help="Seek over skipped frames instead of grabbing them (default: auto)")
     parser.add_argument("--blur_threshold", type=float, default=100.0, help="Blur threshold (default: 100.0)")
+    parser.add_argument("--select", choices=["fixed", "overlap"], default="fixed",
+                        help="fixed: keep every sampled frame above the blur threshold. overlap: keep the sharpest frame per constant-motion step (default: fixed)")
+    parser.add_argument("--target_overlap", type=float, default=0.85, help="Image overlap to keep between keyframes in overlap mode (default: 0.85)")
+    parser.add_argument("--workers", type=int, default=None, help="Blur scoring / JPEG encoding threads (default: CPU count, max 8)")
+    parser.add_argument("--mask_workers", type=int, default=1, help="Masking processes, each with its own rembg session (default: 1)")
+    parser.add_argument("--mask_batch", type=int, default=4, help="Frames per masking batch (default: 4)")
+    parser.add_argument("--mask_model", default="u2net", help="rembg model name (default: u2net)")
+    parser.add_argument("--stage", choices=["all", "frames", "masks"], default="all",
+                        help="frames: extract frames only. masks: mask the frames already in --out (default: all)")
+    parser.add_argument("--bench_masks", type=int, default=0, metavar="N",
+                        help="Only measure masking throughput (masks/s) on N sampled frames at --mask_workers, then exit")
+    parser.add_argument("--propagate", type=int, default=0, metavar="K",
+                        help="Run segmentation on every Kth kept frame only and warp masks in between with optical flow (default: off)")
+    parser.add_argument("--drift_threshold", type=float, default=0.15,
+                        help="Max disagreement of propagated masks before a fresh inference is forced (default: 0.15)")
+    parser.add_argument("--roi", action="store_true", help="Run mask inference on a downscaled crop around the previous mask")
+    parser.add_argument("--roi_margin", type=float, default=0.15, help="ROI margin as a fraction of the mask box (default: 0.15)")
+    parser.add_argument("--roi_max_side", type=int, default=1024, help="Longest side of the inference input in ROI mode (default: 1024)")
+    parser.add_argument("--queue_size", type=int, default=16, help="Max frames buffered between stages (default: 16)")
+    parser.add_argument("--max_side", type=int, default=0, help="Downscale saved frames to this longest side, 0 keeps the video resolution (default: 0)")
     args = parser.parse_args()
 
-    process_video(args.video, args.out, args.sample_rate, args.blur_threshold)
+    if args.stage != "masks" and not args.video:
+        parser.error("--video is required unless --stage masks")
+
+    if args.stage == "masks":
+        mask_images(args.out, args.mask_workers, args.queue_size, args.mask_batch, args.mask_model,
+                    args.propagate, args.drift_threshold, args.roi, args.roi_margin, args.roi_max_side)
+    elif args.bench_masks:
+        benchmark_masking(args.video, args.bench_masks, args.sample_rate, args.fps,
+                          args.mask_workers, args.mask_batch, args.mask_model,
+                          args.roi, args.roi_margin, args.roi_max_side)
+    else:
+        process_video(args.video, args.out, args.sample_rate, args.blur_threshold, args.fps, args.seek,
+                      args.workers, args.mask_workers, args.queue_size, args.mask_batch, args.mask_model,
+                      args.propagate, args.drift_threshold, args.roi, args.roi_margin, args.roi_max_side,
+                      args.select, args.target_overlap, args.stage == "all", args.max_side)
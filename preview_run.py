@@ -0,0 +1,163 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from pipeline import Pipeline
+from pointcache import PointCloudArrays
+
+# Preview runs live next to the full run's data/ and reconstruction/
+PREVIEW_PROJECT = "preview"
+HEALTH_FILE = "health.json"
+
+PREVIEW_FRAMES = 40
+PREVIEW_MAX_SIDE = 800
+PREVIEW_FEATURES = 2048
+# Small rembg model, run on every 4th frame with the masks in between propagated
+PREVIEW_MASK_MODEL = "u2netp"
+PREVIEW_PROPAGATE = 4
+
+# Exit code of a preview that ran to completion but rejected the capture,
+# distinct from 1 (a crash) so job runners can record it as completed
+NO_GO_EXIT = 3
+
+# A capture passes when every metric is on the right side of its limit
+HEALTH_LIMITS = {
+    "registered_ratio": (">=", 0.8),
+    "reprojection_error": ("<=", 1.5),
+    "track_length": (">=", 3.0),
+    "points": (">=", 1000),
+}
+
+def preview_sample_rate(video_path, frames=PREVIEW_FRAMES):
+    """
+    Sample rate spreading about `frames` frames over the whole video.
+    """
+    import cv2
+
+    cap = cv2.VideoCapture(video_path)
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    return max(1, total // max(frames, 1))
+
+def sparse_cloud(model):
+    """
+    PointCloudArrays of a sparse model's 3D points (positions and colors).
+    """
+    points = [p for p in model.points3D.values()]
+    if not points:
+        return PointCloudArrays(np.zeros((0, 3), np.float32), None, None)
+    xyz = np.array([p.xyz for p in points], dtype=np.float32)
+    rgb = np.array([p.color for p in points], dtype=np.uint8)
+    return PointCloudArrays(xyz, rgb, None)
+
+def model_health(model, num_images):
+    """
+    Health metrics of a sparse model built from num_images frames.
+    A failed mapping (model None) scores zero everywhere.
+    """
+    if model is None:
+        return {"images": num_images, "registered": 0, "registered_ratio": 0.0,
+                "reprojection_error": None, "track_length": 0.0, "points": 0}
+    registered = model.num_reg_images()
+    return {
+        "images": num_images,
+        "registered": registered,
+        "registered_ratio": round(registered / max(num_images, 1), 3),
+        "reprojection_error": round(float(model.compute_mean_reprojection_error()), 3),
+        "track_length": round(float(model.compute_mean_track_length()), 2),
+        "points": model.num_points3D(),
+    }
+
+def assess(health, limits=HEALTH_LIMITS):
+    """
+    Reasons the capture fails its limits; empty when it is good to go.
+    """
+    problems = []
+    for name, (op, limit) in limits.items():
+        value = health.get(name)
+        ok = value is not None and (value >= limit if op == ">=" else value <= limit)
+        if not ok:
+            problems.append(f"{name} {value} (needs {op} {limit})")
+    return problems
+
+def read_health(project):
+    """
+    The last preview report of a project, or None.
+    """
+    path = os.path.join(project, PREVIEW_PROJECT, HEALTH_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def run_preview(video_path, project="./project_output", frames=PREVIEW_FRAMES, max_side=PREVIEW_MAX_SIDE,
+                max_features=PREVIEW_FEATURES, mask_model=PREVIEW_MASK_MODEL, blur_threshold=0.0, mesh=True):
+    """
+    The whole chain on ~`frames` low-resolution frames: cheap masks
+    (mask_model="none" skips them), capped SIFT, sequential matching,
+    mapping and a coarse Poisson mesh of the sparse points instead of
+    dense stereo. Writes and returns the health report.
+    """
+    pipe = Pipeline(os.path.join(project, PREVIEW_PROJECT), video_path)
+    started = time.time()
+
+    print(f"[*] Preview: ~{frames} frames at {max_side}px, {max_features} SIFT features per image")
+    masks = mask_model != "none"
+    pipe.preprocess(masks=masks, sample_rate=preview_sample_rate(video_path, frames), blur_threshold=blur_threshold,
+                    max_side=max_side, mask_model=mask_model if masks else "u2net",
+                    propagate=PREVIEW_PROPAGATE if masks else 0)
+    num_images = len(os.listdir(pipe.data_dir / "images"))
+
+    pipe.reconstruct(["features", "matches", "sparse"], max_features=max_features)
+    health = model_health(pipe.model, num_images)
+
+    if mesh and pipe.model is not None and health["points"]:
+        from reconstruct import create_mesh_from_dense_pcd
+
+        # Sparse points only: enough to see whether the car's shape is there
+        with pipe.profiler.step("mesh"):
+            create_mesh_from_dense_pcd(None, pipe.recon_dir / "preview_mesh.ply", depth=7, cloud=sparse_cloud(pipe.model),
+                                       model=pipe.model, mask_ratio=0)
+
+    problems = assess(health)
+    report = {
+        "video": video_path,
+        "status": "go" if not problems else "no-go",
+        "problems": problems,
+        "health": health,
+        "timings": pipe.timings,
+        "seconds": round(time.time() - started, 1),
+    }
+    with open(os.path.join(pipe.project, HEALTH_FILE), "w") as f:
+        json.dump(report, f, indent=2)
+    print_report(report)
+    return report
+
+def print_report(report):
+    health = report["health"]
+    print(f"\n[*] Preview finished in {report['seconds']}s")
+    print(f"    Registered:         {health['registered']}/{health['images']} ({health['registered_ratio']:.0%})")
+    print(f"    Reprojection error: {health['reprojection_error']} px")
+    print(f"    Mean track length:  {health['track_length']}")
+    print(f"    3D points:          {health['points']}")
+    if report["status"] == "go":
+        print("[*] Capture looks good: GO")
+    else:
+        print(f"[!] Capture rejected: NO-GO ({'; '.join(report['problems'])})")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Quick low-resolution run with capture health metrics")
+    parser.add_argument("--video", required=True, help="Input video path")
+    parser.add_argument("--project", default="./project_output", help="Project output folder; the preview goes to its preview/ folder")
+    parser.add_argument("--frames", type=int, default=PREVIEW_FRAMES, help=f"Frames spread over the video (default: {PREVIEW_FRAMES})")
+    parser.add_argument("--max_side", type=int, default=PREVIEW_MAX_SIDE, help=f"Longest frame side in pixels (default: {PREVIEW_MAX_SIDE})")
+    parser.add_argument("--max_features", type=int, default=PREVIEW_FEATURES, help=f"SIFT features per image (default: {PREVIEW_FEATURES})")
+    parser.add_argument("--mask_model", default=PREVIEW_MASK_MODEL, help=f"rembg model, or none to skip masking (default: {PREVIEW_MASK_MODEL})")
+    args = parser.parse_args()
+
+    report = run_preview(args.video, args.project, args.frames, args.max_side, args.max_features, args.mask_model)
+    sys.exit(0 if report["status"] == "go" else NO_GO_EXIT)
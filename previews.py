@@ -0,0 +1,175 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+PREVIEW_DIR = "previews"
+MANIFEST_NAME = "frames.json"
+PREVIEW_WIDTH = 480
+
+def preview_path(path):
+    """
+    data/images/frame_00000.jpg -> data/previews/frame_00000.jpg, and
+    data/masks/frame_00000.jpg.png -> data/previews/frame_00000.jpg.png
+    """
+    parent, name = os.path.split(path)
+    return os.path.join(os.path.dirname(parent), PREVIEW_DIR, name)
+
+def downscale(image, width=PREVIEW_WIDTH):
+    h, w = image.shape[:2]
+    if w <= width:
+        return image
+    return cv2.resize(image, (width, max(1, round(h * width / w))), interpolation=cv2.INTER_AREA)
+
+def write_preview(image, path, width=PREVIEW_WIDTH):
+    """
+    Downscaled copy of a frame or mask saved next to the data folders.
+    """
+    out = preview_path(path)
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    params = [cv2.IMWRITE_JPEG_QUALITY, 85] if out.endswith(".jpg") else []
+    cv2.imwrite(out, downscale(image, width), params)
+    return out
+
+def write_manifest(output_dir, sources=None):
+    """
+    Frame index for the inspector: every frame in output_dir/images with its
+    preview, mask and mask preview (relative paths, None when missing) and
+    the video frame it came from. Entries of an existing manifest are kept
+    for frames that are still there.
+    """
+    img_dir = os.path.join(output_dir, "images")
+    previous = {e["name"]: e for e in (read_manifest(output_dir) or {}).get("frames", [])}
+    sources = sources or {}
+
+    frames = []
+    for name in sorted(f for f in os.listdir(img_dir) if f.endswith(".jpg")):
+        rel = {
+            "image": os.path.join("images", name),
+            "preview": os.path.join(PREVIEW_DIR, name),
+            "mask": os.path.join("masks", name + ".png"),
+            "mask_preview": os.path.join(PREVIEW_DIR, name + ".png"),
+        }
+        entry = {"name": name, "source_frame": sources.get(name, previous.get(name, {}).get("source_frame"))}
+        for key, path in rel.items():
+            entry[key] = path if os.path.exists(os.path.join(output_dir, path)) else None
+        frames.append(entry)
+
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump({"preview_width": PREVIEW_WIDTH, "frames": frames}, f, indent=1)
+    os.replace(tmp, path)
+    return path
+
+def read_manifest(output_dir):
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def build_previews(output_dir, width=PREVIEW_WIDTH):
+    """
+    Writes missing previews (and the manifest) for a data folder produced
+    before previews existed.
+    """
+    for sub in ("images", "masks"):
+        folder = os.path.join(output_dir, sub)
+        if not os.path.isdir(folder):
+            continue
+        for name in os.listdir(folder):
+            path = os.path.join(folder, name)
+            if name.startswith("frame_") and not os.path.exists(preview_path(path)):
+                image = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+                if image is not None:
+                    write_preview(image, path, width)
+    return write_manifest(output_dir)
+
+def overlay_mask(image, mask, color=(255, 0, 0)):
+    """
+    Paints the mask over an RGB image in `color`, using the mask as alpha.
+    """
+    if mask.shape[:2] != image.shape[:2]:
+        mask = cv2.resize(mask, (image.shape[1], image.shape[0]), interpolation=cv2.INTER_LINEAR)
+    alpha = (mask.astype(np.float32) / 255.0)[:, :, None]
+    return (image * (1.0 - alpha) + np.array(color, np.float32) * alpha).astype(np.uint8)
+
+class PreviewCache:
+    """
+    LRU of decoded preview images (RGB, or grayscale for masks) keyed by
+    path and mtime, with background prefetching of the frames around the
+    one on screen.
+    """
+
+    def __init__(self, max_items=256, workers=2):
+        self.max_items = max_items
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.pending = set()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(path):
+        try:
+            return path, os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    @staticmethod
+    def _decode(path):
+        if path.endswith(".png"):
+            return cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        image = cv2.imread(path, cv2.IMREAD_COLOR)
+        return None if image is None else cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+    def _store(self, key, image):
+        with self.lock:
+            self.items[key] = image
+            self.items.move_to_end(key)
+            while len(self.items) > self.max_items:
+                self.items.popitem(last=False)
+
+    def get(self, path):
+        key = self._key(path)
+        if key is None:
+            return None
+        with self.lock:
+            if key in self.items:
+                self.items.move_to_end(key)
+                self.hits += 1
+                return self.items[key]
+            self.misses += 1
+        image = self._decode(path)
+        if image is not None:
+            self._store(key, image)
+        return image
+
+    def _load(self, key):
+        try:
+            image = self._decode(key[0])
+            if image is not None:
+                self._store(key, image)
+        finally:
+            with self.lock:
+                self.pending.discard(key)
+
+    def prefetch(self, paths):
+        """
+        Decodes the given previews in the background unless already cached.
+        """
+        for path in paths:
+            key = self._key(path)
+            if key is None:
+                continue
+            with self.lock:
+                if key in self.items or key in self.pending:
+                    continue
+                self.pending.add(key)
+            self.pool.submit(self._load, key)
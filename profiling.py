@@ -0,0 +1,123 @@
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+def current_rss():
+    """
+    Resident set size of this process in bytes, or None if unknown.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        return None
+
+def max_rss():
+    """
+    Peak RSS of this process since it started, in bytes, or None.
+    """
+    if resource is None:
+        return None
+    return rusage_peak(resource.getrusage(resource.RUSAGE_SELF))
+
+def total_memory():
+    """
+    Physical memory of the machine in bytes, or None if unknown.
+    """
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (ValueError, OSError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.virtual_memory().total
+    except ImportError:
+        return None
+
+def rusage_peak(usage):
+    """
+    ru_maxrss of a resource usage struct in bytes.
+    """
+    # Linux reports kilobytes, macOS bytes
+    return usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+
+class Profiler:
+    """
+    Wall time and peak memory per named step.
+
+    Peak RSS within a step is sampled by a background thread while the step
+    runs, so short spikes between samples can be missed. Steps are kept in
+    order in `records` and can be dumped to JSON for benchmarks.
+    """
+
+    def __init__(self, interval=0.02):
+        self.interval = interval
+        self.records = []
+
+    @contextmanager
+    def step(self, name, **info):
+        start_rss = current_rss()
+        peak = [start_rss or 0]
+        done = threading.Event()
+
+        def sample():
+            while not done.wait(self.interval):
+                rss = current_rss()
+                if rss is not None and rss > peak[0]:
+                    peak[0] = rss
+
+        sampler = None
+        if start_rss is not None:
+            sampler = threading.Thread(target=sample, daemon=True)
+            sampler.start()
+        started = time.perf_counter()
+        record = {"step": name, **info}
+        try:
+            yield record
+        finally:
+            record["seconds"] = round(time.perf_counter() - started, 4)
+            done.set()
+            if sampler is not None:
+                sampler.join()
+                end_rss = current_rss() or 0
+                record["peak_rss_mb"] = round(max(peak[0], end_rss) / 1024 ** 2, 1)
+                record["rss_delta_mb"] = round((end_rss - start_rss) / 1024 ** 2, 1)
+            self.records.append(record)
+
+    def total(self):
+        return sum(r["seconds"] for r in self.records)
+
+    def report(self, title="Profile"):
+        print(f"[*] {title}:")
+        for r in self.records:
+            mem = f", peak RSS {r['peak_rss_mb']:.0f} MB" if "peak_rss_mb" in r else ""
+            print(f"    {r['step']:<24} {r['seconds']:8.2f}s{mem}")
+        print(f"    {'total':<24} {self.total():8.2f}s")
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.records, f, indent=2)
+
+@contextmanager
+def maybe_step(profiler, name, **info):
+    """
+    profiler.step(name) when a profiler is given, otherwise a no-op.
+    """
+    if profiler is None:
+        yield {}
+    else:
+        with profiler.step(name, **info) as record:
+            yield record
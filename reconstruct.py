@@ -1,114 +1,441 @@
-import pycolmap
 import argparse
+import hashlib
+import json
 import os
+import sys
 from pathlib import Path
-import open3d as o3d
 import numpy as np
 
-def run_reconstruction(data_dir, output_dir):
+from colmap_db import FeatureDatabase, pair_id
+from jobs import Progress, emit_progress
+from meshing import auto_voxel_size, cull_by_masks, orient_normals, poisson_depth
+from pointcache import PointCloudArrays, load_point_cloud, to_open3d, write_sidecar
+from profiling import Profiler
+from retrieval import global_descriptors, select_pairs
+
+# pycolmap, open3d and the modules built on them are imported inside the
+# functions that use them, so `--help` and light stages start quickly.
+
+# Stages run_reconstruction can execute, in order
+STAGES = ["features", "matches", "sparse", "dense", "mesh"]
+
+# Sequential matching window for video frames (5-10 works well)
+SEQUENTIAL_OVERLAP = 5
+
+def _image_hash(image_path, mask_path):
+    # Features depend on the mask as well as the pixels
+    h = hashlib.sha256()
+    for path in (image_path, mask_path):
+        if path.exists():
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    h.update(chunk)
+    return h.hexdigest()
+
+def list_images(images_path):
+    return sorted(p.name for p in Path(images_path).iterdir() if p.suffix.lower() in (".jpg", ".jpeg", ".png"))
+
+def extract_features(data_dir, output_dir, max_features=0):
+    """
+    Incremental SIFT extraction (at most max_features per image, 0 for
+    COLMAP's default). The database is kept between runs and
+    only images whose content (or mask) hash changed, or that are new, are
+    extracted again. Removed images are dropped, and matches touching any
+    changed image are deleted so match_features recomputes just those pairs.
+    """
     data_path = Path(data_dir)
     images_path = data_path / "images"
     masks_path = data_path / "masks"
     database_path = Path(output_dir) / "database.db"
-    
-    output_path = Path(output_dir)
-    output_path.mkdir(exist_ok=True, parents=True)
+    Path(output_dir).mkdir(exist_ok=True, parents=True)
+    import pycolmap
+
+    # Define options to use masks (COLMAP skips images whose mask is missing,
+    # so unmasked runs such as a preview without masking leave the path unset)
+    reader_options = pycolmap.ImageReaderOptions()
+    if masks_path.is_dir() and any(masks_path.glob("*.png")):
+        reader_options.mask_path = masks_path  # Point to the masks folder
+    extraction_options = pycolmap.FeatureExtractionOptions()
+    if max_features:
+        extraction_options.sift.max_num_features = max_features
+    params = json.dumps(extraction_options.todict(), sort_keys=True, default=str)
+
+    names = list_images(images_path)
+    hashes = {n: _image_hash(images_path / n, masks_path / (n + ".png")) for n in names}
 
     if database_path.exists():
-        database_path.unlink()
+        with FeatureDatabase(database_path) as db:
+            if db.feature_params() != params:
+                print("[*] Feature extraction options changed, rebuilding database...")
+                rebuild = True
+            else:
+                rebuild = False
+        if rebuild:
+            database_path.unlink()
+
+    print(f"[*] Opening database at {database_path}...")
+    # Let COLMAP create its schema before we look at it
+    pycolmap.Database.open(database_path).close()
+    with FeatureDatabase(database_path) as db:
+        ids = db.image_ids()
+        stored = db.hashes()
+        with_features = db.image_ids_with_features()
+
+        removed = [ids[n] for n in ids if n not in hashes]
+        changed = [ids[n] for n in names if n in ids and stored.get(n) != hashes[n]]
+        missing = [ids[n] for n in names if n in ids and ids[n] not in with_features]
+        if removed:
+            db.delete_images(removed)
+        stale = set(changed) | set(missing)
+        if stale:
+            db.delete_pairs(stale)
+            db.delete_features(stale)
+
+        todo = [n for n in names if n not in ids or ids[n] in stale]
+        reused = len(names) - len(todo)
+        db.write_feature_params(params)
 
-    print(f"[*] Creating database at {database_path}...")
-    
     # 1. Feature Extraction with Masks
-    print("[*] Extracting features (SIFT) with Masks...")
-    
-    # Define options to use masks
-    reader_options = pycolmap.ImageReaderOptions()
-    reader_options.mask_path = masks_path  # Point to the masks folder
-    
-    # Run extraction
-    pycolmap.extract_features(
-        database_path, 
-        images_path, 
-        reader_options=reader_options,
-        verbose=True
-    )
-    
-    print("[*] Matching features (Sequential)...")
-    pycolmap.match_sequential(database_path, overlap=5) # 5-10 overlap for video frames
+    print(f"[*] Features: reusing {reused}, extracting {len(todo)}, removed {len(removed)} images.")
+    if todo:
+        print("[*] Extracting features (SIFT) with Masks...")
+        pycolmap.extract_features(
+            database_path, 
+            images_path, 
+            image_names=todo,
+            reader_options=reader_options,
+            extraction_options=extraction_options,
+        )
+
+    # Only record hashes once extraction succeeded
+    with FeatureDatabase(database_path) as db:
+        db.write_hashes(hashes)
+    emit_progress("features", images=len(names), extracted=len(todo))
+    return reused, len(todo)
+
+def sequential_pairs(names, overlap=SEQUENTIAL_OVERLAP):
+    return [(names[i], names[j]) for i in range(len(names)) for j in range(i + 1, min(i + 1 + overlap, len(names)))]
+
+def match_pairs(database_path, pairs, output_dir):
+    """
+    Matches exactly the given image-name pairs (with geometric verification).
+    Pairs that already have matches in the database are reused, and pairs
+    that are no longer selected (e.g. after a pairing change) are deleted
+    so the mapper only sees the selected ones.
+    Returns (reused, matched) pair counts.
+    """
+    with FeatureDatabase(database_path) as db:
+        ids = db.image_ids()
+        # Files COLMAP did not import (unreadable, empty, filtered) have no id to match
+        skipped = [(a, b) for a, b in pairs if a not in ids or b not in ids]
+        if skipped:
+            missing = sorted({n for pair in skipped for n in pair if n not in ids})
+            print(f"[!] Skipping {len(skipped)} pairs with images missing from the database: {', '.join(missing)}")
+            pairs = [(a, b) for a, b in pairs if a in ids and b in ids]
+        selected = {pair_id(ids[a], ids[b]) for a, b in pairs}
+        stale = db.stored_pairs() - selected
+        if stale:
+            db.delete_pair_ids(stale)
+        existing = db.matched_pairs()
+
+    todo = [(a, b) for a, b in pairs if pair_id(ids[a], ids[b]) not in existing]
+    reused = len(pairs) - len(todo)
+    print(f"[*] Matches: reusing {reused}, matching {len(todo)} pairs, dropped {len(stale)} unselected.")
+    if todo:
+        pairs_path = Path(output_dir) / "pairs.txt"
+        with open(pairs_path, "w") as f:
+            f.writelines(f"{a} {b}\n" for a, b in todo)
+        import pycolmap
+        pairing_options = pycolmap.ImportedPairingOptions()
+        pairing_options.match_list_path = str(pairs_path)
+        pycolmap.match_image_pairs(database_path, pairing_options=pairing_options)
+    return reused, len(todo)
+
+def retrieval_pairs(database_path, names, top_k=3):
+    """
+    Pairs chosen from VLAD global descriptors built over the database's own
+    SIFT features: an adaptive sequential window plus top-k retrieval.
+    """
+    with FeatureDatabase(database_path) as db:
+        ids = db.image_ids()
+        missing = [n for n in names if n not in ids]
+        if missing:
+            print(f"[!] {len(missing)} images are not in the database and get no pairs: {', '.join(missing)}")
+        # Images COLMAP imported, in sequence order
+        names = [n for n in names if n in ids]
+        descriptors = [db.read_descriptors(ids[n]) for n in names]
+
+    print(f"[*] Building global descriptors (VLAD) for {len(names)} images...")
+    index_pairs, sequential = select_pairs(global_descriptors(descriptors), top_k=top_k)
+    pairs = [(names[i], names[j]) for i, j in index_pairs]
+    print(f"[*] Pair selection: {len(pairs)} pairs ({sequential} sequential, {len(pairs) - sequential} retrieved), "
+          f"{2.0 * len(pairs) / max(len(names), 1):.1f} pairs per image.")
+    return pairs
+
+def match_features(data_dir, output_dir, pairing="sequential", top_k=3):
+    database_path = Path(output_dir) / "database.db"
+    names = list_images(Path(data_dir) / "images")
+
+    if pairing == "retrieval":
+        print("[*] Matching features (Retrieval + adaptive sequential)...")
+        pairs = retrieval_pairs(database_path, names, top_k)
+    else:
+        print("[*] Matching features (Sequential)...")
+        # Window over the imported images, so a missing frame does not break the sequence
+        with FeatureDatabase(database_path) as db:
+            ids = db.image_ids()
+        pairs = sequential_pairs([n for n in names if n in ids])
+    return match_pairs(database_path, pairs, output_dir)
+
+def map_sparse(data_dir, output_dir, chunk_size=0, chunk_overlap=20, mapper_workers=None):
+    """
+    Incremental (or chunked) mapping. Writes the best model to sparse/ and
+    its points to fused.ply, and returns it (None if mapping failed).
+    """
+    import pycolmap
+    from mapping import best_model as pick_best_model, describe_model, partitioned_mapping
+
+    images_path = Path(data_dir) / "images"
+    output_path = Path(output_dir)
+    database_path = output_path / "database.db"
 
-    print("[*] Running Incremental Mapper...")
-    maps = pycolmap.incremental_mapping(database_path, images_path, output_path)
+    names = list_images(images_path)
+    if chunk_size and len(names) > chunk_size:
+        print("[*] Running Partitioned Incremental Mapper...")
+        best_model = partitioned_mapping(database_path, images_path, output_path, names,
+                                         chunk_size, chunk_overlap, mapper_workers)
+    else:
+        print("[*] Running Incremental Mapper...")
+        progress = Progress("sparse")
+        calls = 0
+
+        # Live estimate only: the callback also fires on retries and re-registrations,
+        # so it is capped at the image count and the exact count is sent at the end
+        def on_initial_pair():
+            nonlocal calls
+            calls = 2
+            progress(registered=min(calls, len(names)), total=len(names), approximate=True)
+
+        def on_next_image():
+            nonlocal calls
+            calls += 1
+            progress(registered=min(calls, len(names)), total=len(names), approximate=True)
+
+        maps = pycolmap.incremental_mapping(database_path, images_path, output_path,
+                                            initial_image_pair_callback=on_initial_pair,
+                                            next_image_callback=on_next_image)
+        # Several models may come back; keep the best-registered one
+        best_model = pick_best_model(maps)
     
-    if not maps:
+    if best_model is None:
         print("[!] Reconstruction failed! No models created.")
-        return
+        emit_progress("sparse", registered=0, total=len(names), approximate=False)
+        return None
 
-    # Save the best model (usually index 0)
-    best_model_idx = 0 
-    best_model = maps[best_model_idx]
+    print(f"[*] Best model: {describe_model(best_model)} ({len(names)} input images)")
+    emit_progress("sparse", registered=len(best_model.reg_image_ids()), total=len(names), approximate=False,
+                  points=best_model.num_points3D())
     
     sparse_dir = output_path / "sparse"
     sparse_dir.mkdir(exist_ok=True)
     best_model.write(sparse_dir)
     
     ply_path = output_path / "fused.ply"
-    best_model.export_ply(ply_path)
+    best_model.export_PLY(ply_path)
     print(f"[*] Reconstruction finished. Saved to {output_path}")
     print(f"[*] Point cloud: {ply_path}")
+    return best_model
+
+def resolve_dense_backend(backend="auto"):
+    # PatchMatch stereo needs CUDA; fall back to the CPU backend without it
+    if backend == "auto":
+        import pycolmap
+        return "colmap" if pycolmap.has_cuda else "cpu"
+    return backend
 
-    # --- Dense Reconstruction (MVS) ---
-    print("[*] Running Dense Reconstruction (MVS)...")
+def densify(data_dir, output_dir, backend="auto", workers=None, model=None):
+    """
+    Dense cloud in dense/fused.ply (plus its sidecar), returned as
+    PointCloudArrays. `model` saves re-reading sparse/ when the caller
+    has just mapped it.
+    """
+    import pycolmap
+    from dense import cpu_dense
+
+    images_path = Path(data_dir) / "images"
+    output_path = Path(output_dir)
+    sparse_dir = output_path / "sparse"
     dense_path = output_path / "dense"
     dense_path.mkdir(exist_ok=True)
-    
-    # Undistort images for dense stereo
-    pycolmap.undistort_images(dense_path, sparse_dir, images_path)
-    
-    # Stereo matching (The heavy lifting)
-    pycolmap.patch_match_stereo(dense_path) 
-    
-    # Fusion to dense point cloud
     dense_ply = dense_path / "fused.ply"
-    pycolmap.stereo_fusion(dense_path, dense_ply)
-    
+
+    backend = resolve_dense_backend(backend)
+    if backend == "cpu":
+        print("[*] Running Dense Reconstruction (CPU stereo)...")
+        model = model if model is not None else pycolmap.Reconstruction(sparse_dir)
+        points, colors, _ = cpu_dense(model, images_path, Path(data_dir) / "masks", dense_path, workers=workers)
+        cloud = PointCloudArrays(points, colors, None)
+    else:
+        # --- Dense Reconstruction (MVS) ---
+        print("[*] Running Dense Reconstruction (MVS)...")
+
+        # Undistort images for dense stereo
+        pycolmap.undistort_images(dense_path, sparse_dir, images_path)
+
+        # Stereo matching (The heavy lifting)
+        pycolmap.patch_match_stereo(dense_path)
+
+        # Fusion to dense point cloud
+        pycolmap.stereo_fusion(output_path=dense_ply, workspace_path=dense_path, output_type="ply")
+        cloud = None
+
+    # Memory-mappable copy so later readers skip the PLY parse
+    write_sidecar(dense_ply, cloud)
+    cloud = cloud if cloud is not None else load_point_cloud(dense_ply)
+    emit_progress("dense", points_fused=len(cloud.points))
     print(f"[*] Dense point cloud saved to {dense_ply}")
+    return cloud
 
-    # --- Meshing ---
-    mesh_output = output_path / "final_mesh.ply"
-    create_mesh_from_dense_pcd(dense_ply, mesh_output)
+def run_reconstruction(data_dir, output_dir, stages=STAGES, depth=0, pairing="sequential", top_k=3,
+                       chunk_size=0, chunk_overlap=20, mapper_workers=None, dense_backend="auto", dense_workers=None,
+                       voxel_size=0.0, mask_ratio=0.5, trim_quantile=None, lod=True):
+    """
+    Runs the requested reconstruction stages (all by default) through a
+    Pipeline, so the model and dense cloud stay in memory between stages.
+    Stages read what the previous ones left in output_dir, so a later
+    stage can be re-run on its own.
+    """
+    from pipeline import Pipeline
 
-def create_mesh_from_dense_pcd(pcd_path, output_mesh_path, depth=9):
-    print(f"[*] Loading dense point cloud from {pcd_path}...")
-    pcd = o3d.io.read_point_cloud(str(pcd_path))
-    
-    # 1. Estimate Normals (Crucial for Poisson)
-    print("[*] Estimating normals...")
-    pcd.estimate_normals(search_param=o3d.geometry.KDTreeSearchParamHybrid(radius=0.1, max_nn=30))
-    # Align normals to point towards the camera locations (heuristic) 
-    # or just orient consistently for a closed object
-    pcd.orient_normals_consistent_tangent_plane(100)
-
-    # 2. Poisson Surface Reconstruction
-    print(f"[*] Running Poisson Reconstruction (depth={depth})...")
-    with o3d.utility.VerbosityContextManager(o3d.utility.VerbosityLevel.Debug) as cm:
-        mesh, densities = o3d.geometry.TriangleMesh.create_from_point_cloud_poisson(
-            pcd, depth=depth
-        )
+    pipe = Pipeline(data_dir=data_dir, recon_dir=output_dir)
+    if not pipe.reconstruct([s for s in stages if s != "mesh"], pairing, top_k, chunk_size, chunk_overlap,
+                            mapper_workers, dense_backend, dense_workers):
+        return False
+    if "mesh" in stages:
+        pipe.mesh(depth, voxel_size, mask_ratio, trim_quantile, lod)
+    return True
+
+def create_mesh_from_dense_pcd(pcd_path, output_mesh_path, depth=0, sparse_dir=None, voxel_size=0.0,
+                               masks_dir=None, mask_ratio=0.5, trim_quantile=None, profiler=None,
+                               cloud=None, model=None):
+    """
+    Downsample -> mask culling -> outlier removal -> normals oriented
+    towards the cameras -> Poisson -> optional density trim.
+    depth=0 picks the Poisson depth from the point spacing and object
+    extent; voxel_size=0 picks the voxel from the bounding box.
+    Culling keeps points that land on the object mask in at least
+    mask_ratio of the views that see them (0 disables it). The density
+    trim defaults to the 10% quantile only when no culling ran.
+    An in-memory `cloud` (PointCloudArrays) and sparse `model` are used
+    instead of reading pcd_path and sparse_dir when given.
+    Prints time and peak memory per step.
+    """
+    import open3d as o3d
+    import pycolmap
+
+    profiler = profiler or Profiler()
+
+    with profiler.step("load"):
+        if cloud is None:
+            print(f"[*] Loading dense point cloud from {pcd_path}...")
+            cloud = load_point_cloud(pcd_path)
+        pcd = to_open3d(cloud)
+        points_in = len(pcd.points)
+        if model is None and sparse_dir and Path(sparse_dir).exists():
+            model = pycolmap.Reconstruction(sparse_dir)
+
+    # 1. Downsample and clean: meshing cost grows with the point count
+    with profiler.step("downsample"):
+        if not voxel_size:
+            voxel_size = auto_voxel_size(np.asarray(pcd.points))
+        pcd = pcd.voxel_down_sample(voxel_size)
+        print(f"[*] Voxel downsample ({voxel_size:.4g}): {points_in} -> {len(pcd.points)} points")
+
+    # Background that survived fusion would otherwise end up in the surface
+    culled = False
+    if model is not None and masks_dir and Path(masks_dir).is_dir() and mask_ratio > 0:
+        with profiler.step("mask_cull"):
+            keep = cull_by_masks(np.asarray(pcd.points), model, masks_dir, mask_ratio)
+            pcd = pcd.select_by_index(np.flatnonzero(keep))
+            culled = True
+            print(f"[*] Mask culling: kept {int(keep.sum())}/{len(keep)} points")
+
+    with profiler.step("outliers"):
+        pcd, _ = pcd.remove_statistical_outlier(nb_neighbors=20, std_ratio=2.0)
+        print(f"[*] Outlier removal: {len(pcd.points)} points left")
+
+    # 2. Estimate Normals (Crucial for Poisson)
+    with profiler.step("normals"):
+        print("[*] Estimating normals...")
+        pcd.estimate_normals(search_param=o3d.geometry.KDTreeSearchParamHybrid(radius=4 * voxel_size, max_nn=30))
+
+    # Point normals at the camera that most likely saw them instead of the
+    # MST-based orient_normals_consistent_tangent_plane
+    with profiler.step("orient"):
+        centers = None
+        if model is not None:
+            centers = np.array([im.projection_center() for im in model.images.values() if im.has_pose])
+        normals, flipped = orient_normals(np.asarray(pcd.points), np.asarray(pcd.normals), centers)
+        pcd.normals = o3d.utility.Vector3dVector(normals)
+        source = f"{len(centers)} camera centers" if centers is not None else "the centroid"
+        print(f"[*] Oriented normals towards {source} ({flipped} flipped)")
+
+    # 3. Poisson Surface Reconstruction
+    if not depth:
+        depth = poisson_depth(np.asarray(pcd.points), voxel_size)
+    with profiler.step("poisson", depth=depth):
+        print(f"[*] Running Poisson Reconstruction (depth={depth})...")
+        mesh, densities = o3d.geometry.TriangleMesh.create_from_point_cloud_poisson(pcd, depth=depth)
     
-    # 3. Clean the Mesh (Remove "Bubble" artifacts)
+    # 4. Clean the Mesh (Remove "Bubble" artifacts)
     # Poisson creates a "bubble" around the object. We remove low-density vertices.
-    print("[*] Cleaning mesh artifacts...")
-    vertices_to_remove = densities < np.quantile(densities, 0.1)
-    mesh.remove_vertices_by_mask(vertices_to_remove)
+    if trim_quantile is None:
+        trim_quantile = 0.0 if culled else 0.1
+    if trim_quantile > 0:
+        with profiler.step("trim"):
+            print(f"[*] Cleaning mesh artifacts (density quantile {trim_quantile})...")
+            densities = np.asarray(densities)
+            vertices_to_remove = densities < np.quantile(densities, trim_quantile)
+            mesh.remove_vertices_by_mask(vertices_to_remove)
     
-    print(f"[*] Saving final mesh to {output_mesh_path}")
-    o3d.io.write_triangle_mesh(str(output_mesh_path), mesh)
+    with profiler.step("write"):
+        print(f"[*] Saving final mesh to {output_mesh_path} ({len(mesh.triangles)} triangles)")
+        o3d.io.write_triangle_mesh(str(output_mesh_path), mesh)
+
+    profiler.report("Meshing")
+    emit_progress("mesh", triangles=len(mesh.triangles))
+    return mesh
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--data", required=True, help="Path to preprocessed data directory (containing images/ and masks/)")
     parser.add_argument("--out", required=True, help="Output directory for reconstruction")
+    parser.add_argument("--stages", default=",".join(STAGES), help=f"Comma separated stages to run (default: {','.join(STAGES)})")
+    parser.add_argument("--depth", type=int, default=0, help="Poisson reconstruction depth, 0 picks it from point density and extent (default: 0)")
+    parser.add_argument("--voxel_size", type=float, default=0.0, help="Downsampling voxel before meshing, 0 for 1/400 of the bounding-box diagonal (default: 0)")
+    parser.add_argument("--pairing", choices=["sequential", "retrieval"], default="sequential",
+                        help="sequential: fixed window. retrieval: VLAD top-k + adaptive window (default: sequential)")
+    parser.add_argument("--top_k", type=int, default=3, help="Retrieved pairs per image in retrieval pairing (default: 3)")
+    parser.add_argument("--chunk_size", type=int, default=0, help="Map overlapping chunks of this many images in parallel and merge them (default: off)")
+    parser.add_argument("--chunk_overlap", type=int, default=20, help="Images shared by consecutive chunks (default: 20)")
+    parser.add_argument("--mapper_workers", type=int, default=None, help="Parallel chunk mappers (default: CPU count)")
+    parser.add_argument("--mask_ratio", type=float, default=0.5,
+                        help="Keep dense points that land on the masks in at least this share of the views seeing them, 0 to disable (default: 0.5)")
+    parser.add_argument("--trim_quantile", type=float, default=None,
+                        help="Poisson density quantile to trim (default: 0.1 without mask culling, off with it)")
+    parser.add_argument("--no_lod", action="store_true", help="Do not write decimated meshes and downsampled clouds to lod/")
+    parser.add_argument("--dense_backend", choices=["auto", "colmap", "cpu"], default="auto",
+                        help="colmap: CUDA PatchMatch. cpu: SGBM depth maps + fusion. auto picks colmap when CUDA is available (default: auto)")
+    parser.add_argument("--dense_workers", type=int, default=None, help="Processes for CPU stereo (default: CPU count)")
     args = parser.parse_args()
-    
-    run_reconstruction(args.data, args.out)
+
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = [s for s in stages if s not in STAGES]
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(unknown)}")
+
+    if not run_reconstruction(args.data, args.out, stages, args.depth, args.pairing, args.top_k,
+                              args.chunk_size, args.chunk_overlap, args.mapper_workers,
+                              args.dense_backend, args.dense_workers, args.voxel_size,
+                              args.mask_ratio, args.trim_quantile, not args.no_lod):
+        sys.exit(1)
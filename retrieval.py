@@ -0,0 +1,103 @@
+import cv2
+import numpy as np
+
+def root_sift(descriptors):
+    """
+    RootSIFT: L1-normalize, then square root. Makes Euclidean distance behave
+    like the Hellinger kernel, which works better for SIFT.
+    """
+    d = descriptors.astype(np.float32)
+    d /= np.maximum(d.sum(axis=1, keepdims=True), 1e-8)
+    return np.sqrt(d)
+
+def build_codebook(descriptor_sets, num_words=64, max_samples=100000, seed=0):
+    """
+    k-means vocabulary over a random sample of all descriptors.
+    Built locally from the images being reconstructed, nothing is downloaded.
+    """
+    rng = np.random.default_rng(seed)
+    per_image = max(1, max_samples // max(len(descriptor_sets), 1))
+    samples = []
+    for d in descriptor_sets:
+        if len(d) > per_image:
+            d = d[rng.choice(len(d), per_image, replace=False)]
+        samples.append(d)
+    samples = np.concatenate(samples).astype(np.float32)
+
+    k = min(num_words, len(samples))
+    criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 20, 1e-3)
+    cv2.setRNGSeed(seed)
+    _, _, centers = cv2.kmeans(samples, k, None, criteria, 1, cv2.KMEANS_PP_CENTERS)
+    return centers
+
+def vlad(descriptors, codebook):
+    """
+    VLAD descriptor: sum of residuals to the nearest visual word,
+    intra-normalized per word, power-normalized and L2-normalized.
+    """
+    k, dim = codebook.shape
+    out = np.zeros((k, dim), dtype=np.float32)
+    if len(descriptors) == 0:
+        return out.ravel()
+
+    # Squared distances to all words without materializing N x K x D
+    d2 = (descriptors ** 2).sum(1)[:, None] - 2 * descriptors @ codebook.T + (codebook ** 2).sum(1)[None, :]
+    words = np.argmin(d2, axis=1)
+    np.add.at(out, words, descriptors - codebook[words])
+
+    norms = np.linalg.norm(out, axis=1, keepdims=True)
+    out /= np.maximum(norms, 1e-8)
+    out = out.ravel()
+    out = np.sign(out) * np.sqrt(np.abs(out))
+    return out / max(np.linalg.norm(out), 1e-8)
+
+def global_descriptors(descriptor_sets, num_words=64):
+    """
+    One VLAD vector per image (rows), from raw SIFT descriptors.
+    """
+    sets = [root_sift(d) for d in descriptor_sets]
+    codebook = build_codebook(sets, num_words)
+    return np.stack([vlad(d, codebook) for d in sets])
+
+def select_pairs(descriptors, top_k=3, min_window=2, max_window=8, window_ratio=0.6):
+    """
+    Image index pairs to match, from global descriptors in capture order.
+
+    Sequential: each image is paired with the next frames as long as their
+    similarity stays above window_ratio times its similarity to the very next
+    frame (between min_window and max_window frames), so slow stretches get
+    wider windows and fast ones narrower.
+    Retrieval: up to top_k more images outside that window, taken only if they
+    look at least as similar as the farthest frame inside it. This picks up
+    loop closures when the operator comes back around the car without
+    spending matches on unrelated views.
+    """
+    n = len(descriptors)
+    sim = descriptors @ descriptors.T
+    np.fill_diagonal(sim, -np.inf)
+
+    pairs = set()
+    edge = np.full(n, np.inf)  # similarity of the farthest sequential partner
+    for i in range(n - 1):
+        ref = sim[i, i + 1]
+        w = 1
+        while i + w + 1 < n and w < max_window and (w < min_window or sim[i, i + w + 1] >= window_ratio * ref):
+            w += 1
+        for j in range(i + 1, i + w + 1):
+            pairs.add((i, j))
+        edge[i] = min(edge[i], sim[i, i + w])
+        edge[i + w] = min(edge[i + w], sim[i, i + w])
+
+    sequential = len(pairs)
+    for i in range(n):
+        picked = 0
+        for j in np.argsort(-sim[i]):
+            j = int(j)
+            if picked >= top_k or sim[i, j] < edge[i]:
+                break
+            pair = (min(i, j), max(i, j))
+            if pair in pairs:
+                continue
+            pairs.add(pair)
+            picked += 1
+    return sorted(pairs), sequential
@@ -0,0 +1,129 @@
+import argparse
+import json
+
+import cv2
+import numpy as np
+
+def _box(center, size):
+    """
+    The six faces of an axis-aligned box as (4, 3) corner arrays.
+    """
+    c, s = np.asarray(center, dtype=float), np.asarray(size, dtype=float)
+    corners = np.array([c + np.array([dx, dy, dz]) * s / 2 for dx in (-1, 1) for dy in (-1, 1) for dz in (-1, 1)])
+    faces = [[0, 1, 3, 2], [4, 6, 7, 5], [0, 4, 5, 1], [2, 3, 7, 6], [0, 2, 6, 4], [1, 5, 7, 3]]
+    return [corners[f] for f in faces]
+
+def _texture(rng, size=512):
+    """
+    Blocky color texture with fine noise: SIFT finds plenty of corners on it.
+    """
+    blocks = rng.integers(0, 256, (size // 8, size // 8, 3), dtype=np.uint8)
+    blocks = cv2.GaussianBlur(cv2.resize(blocks, (size, size), interpolation=cv2.INTER_NEAREST), (3, 3), 0)
+    noise = rng.integers(0, 256, (size, size, 3), dtype=np.uint8)
+    return cv2.addWeighted(blocks, 0.7, noise, 0.3, 0)
+
+class TurntableScene:
+    """
+    A textured car-like object (body + cabin on a ground plane) filmed by a
+    camera circling it once, with known intrinsics and poses.
+
+    Frames are rendered with plain OpenCV perspective warps (painter's
+    order), so videos can be generated offline at any length and size.
+    Poses are world-to-camera (X_cam = R X_world + t), as in COLMAP.
+    """
+
+    def __init__(self, frames=120, width=640, height=480, radius=7.0, elevation=2.5, seed=0):
+        rng = np.random.default_rng(seed)
+        self.frames, self.width, self.height = frames, width, height
+        self.radius, self.elevation = radius, elevation
+        self.car = _box((0, 0, 0), (4, 1.8, 1.2)) + _box((0, 0, 0.9), (2, 1.6, 0.6))
+        self.ground = [np.array([[-6, -6, -0.6], [6, -6, -0.6], [6, 6, -0.6], [-6, 6, -0.6]], dtype=float)]
+        self.textures = [_texture(rng) for _ in self.car + self.ground]
+        focal = 0.9 * width
+        self.K = np.array([[focal, 0, width / 2], [0, focal, height / 2], [0, 0, 1]])
+
+    def pose(self, i):
+        """
+        R (3, 3) and t (3,) of frame i, looking at the origin.
+        """
+        angle = 2 * np.pi * i / self.frames
+        center = np.array([self.radius * np.cos(angle), self.radius * np.sin(angle), self.elevation])
+        z = -center / np.linalg.norm(center)
+        x = np.cross(z, [0, 0, 1])
+        x /= np.linalg.norm(x)
+        y = np.cross(z, x)
+        R = np.stack([x, y, z])
+        return R, -R @ center
+
+    def poses(self):
+        """
+        (frames, 3, 4) array of [R | t] per frame.
+        """
+        return np.array([np.hstack([R, t[:, None]]) for R, t in map(self.pose, range(self.frames))])
+
+    def _project(self, i, quads):
+        R, t = self.pose(i)
+        visible = []
+        for k, quad in quads:
+            cam = quad @ R.T + t
+            if (cam[:, 2] < 0.1).any():
+                continue
+            pixels = cam @ self.K.T
+            visible.append((cam[:, 2].mean(), k, np.float32(pixels[:, :2] / pixels[:, 2:])))
+        # Far to near, so nearer faces paint over farther ones
+        return sorted(visible, key=lambda v: -v[0])
+
+    def render(self, i):
+        """
+        BGR image of frame i.
+        """
+        image = np.full((self.height, self.width, 3), 60, np.uint8)
+        size = (self.width, self.height)
+        for _, k, corners in self._project(i, enumerate(self.car + self.ground)):
+            texture = self.textures[k]
+            n = texture.shape[0]
+            H = cv2.getPerspectiveTransform(np.float32([[0, 0], [n, 0], [n, n], [0, n]]), corners)
+            warped = cv2.warpPerspective(texture, H, size)
+            cover = cv2.warpPerspective(np.full((n, n), 255, np.uint8), H, size) > 0
+            image[cover] = warped[cover]
+        return image
+
+    def mask(self, i):
+        """
+        Ground-truth car silhouette of frame i (255 car, 0 background).
+        """
+        mask = np.zeros((self.height, self.width), np.uint8)
+        for _, _, corners in self._project(i, enumerate(self.car)):
+            cv2.fillConvexPoly(mask, np.round(corners).astype(np.int32), 255)
+        return mask
+
+    def write_video(self, path, fps=30):
+        """
+        Renders every frame into an mp4 file.
+        """
+        writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"mp4v"), fps, (self.width, self.height))
+        try:
+            for i in range(self.frames):
+                writer.write(self.render(i))
+        finally:
+            writer.release()
+
+    def describe(self):
+        return {"frames": self.frames, "width": self.width, "height": self.height,
+                "radius": self.radius, "elevation": self.elevation, "K": self.K.tolist()}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render a synthetic turntable video with known camera poses")
+    parser.add_argument("--out", required=True, help="Output video path (.mp4); poses go next to it as .poses.npy")
+    parser.add_argument("--frames", type=int, default=120, help="Frames in one revolution (default: 120)")
+    parser.add_argument("--width", type=int, default=640, help="Frame width (default: 640)")
+    parser.add_argument("--height", type=int, default=480, help="Frame height (default: 480)")
+    parser.add_argument("--seed", type=int, default=0, help="Texture seed (default: 0)")
+    args = parser.parse_args()
+
+    scene = TurntableScene(args.frames, args.width, args.height, seed=args.seed)
+    scene.write_video(args.out)
+    np.save(args.out + ".poses.npy", scene.poses())
+    with open(args.out + ".scene.json", "w") as f:
+        json.dump(scene.describe(), f, indent=2)
+    print(f"[*] Wrote {args.frames} frames ({args.width}x{args.height}) to {args.out}")
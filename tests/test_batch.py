@@ -0,0 +1,105 @@
+import unittest
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from batch import TASKS, BatchScheduler, VideoRun, project_names, read_video_list
+
+TASK_SCRIPT = """
+import os, sys, time
+trace, video, task, fail = sys.argv[1:]
+with open(trace, "a") as f:
+    f.write(f"start {video} {task} {time.time()}\\n")
+time.sleep(0.3)
+with open(trace, "a") as f:
+    f.write(f"end {video} {task} {time.time()}\\n")
+marker = f"{trace}.{video}.{task}"
+if fail == "1" and not os.path.exists(marker):
+    open(marker, "w").close()
+    sys.exit(1)
+"""
+
+class ScriptedRun(VideoRun):
+    """VideoRun whose tasks are a short script logging when it runs."""
+
+    def __init__(self, project, trace, fail_once=()):
+        super().__init__(project + ".mp4", project, argparse.Namespace(force_from=None))
+        self.trace = trace
+        self.fail_once = fail_once
+
+    def plan(self):
+        self.queue = list(TASKS)
+
+    def command(self, stages):
+        task = next(t for t, s, _ in TASKS if s == stages)
+        script = os.path.join(os.path.dirname(self.trace), "task.py")
+        if not os.path.exists(script):
+            with open(script, "w") as f:
+                f.write(TASK_SCRIPT)
+        fail = int(task in self.fail_once)
+        return [sys.executable, script, self.trace, os.path.basename(self.project), task, str(fail)]
+
+    def record_stages(self, stages, seconds):
+        pass
+
+def intervals(trace):
+    spans = {}
+    with open(trace) as f:
+        for line in f:
+            event, video, task, t = line.split()
+            spans.setdefault((video, task), []).append(float(t))
+    return spans
+
+def overlaps(a, b):
+    return a[0] < b[-1] and b[0] < a[-1]
+
+class TestBatch(unittest.TestCase):
+    def test_video_list_from_folder_and_manifests(self):
+        with tempfile.TemporaryDirectory() as d:
+            for name in ("b.mp4", "a.MOV", "notes.txt"):
+                open(os.path.join(d, name), "w").close()
+            self.assertEqual([os.path.basename(v) for v, _ in read_video_list(d)], ["a.MOV", "b.mp4"])
+
+            with open(os.path.join(d, "list.txt"), "w") as f:
+                f.write("# lane 3\nb.mp4\n\nsub/b.mp4\n")
+            entries = read_video_list(os.path.join(d, "list.txt"))
+            self.assertEqual(entries[0], (os.path.join(d, "b.mp4"), None))
+            self.assertEqual(project_names(entries), ["b", "b_2"])
+
+            with open(os.path.join(d, "list.json"), "w") as f:
+                json.dump([{"video": "a.MOV", "project": "car_17"}, "b.mp4"], f)
+            self.assertEqual(project_names(read_video_list(os.path.join(d, "list.json"))), ["car_17", "b"])
+
+    def test_overlap_memory_cap_and_retry(self):
+        with tempfile.TemporaryDirectory() as d:
+            trace = os.path.join(d, "trace.txt")
+            runs = [ScriptedRun(os.path.join(d, "v1"), trace),
+                    ScriptedRun(os.path.join(d, "v2"), trace, fail_once=("mapping",))]
+            for run in runs:
+                os.makedirs(run.project)
+
+            # The budget holds one memory task at a time
+            gb = 1024 ** 3
+            scheduler = BatchScheduler(runs, ram_budget=8 * gb, ram_estimates={"dense": 6 * gb, "mesh": 6 * gb},
+                                       retries=1, retry_delay=0, poll=0.02)
+            summaries = scheduler.run()
+
+            self.assertEqual([s["status"] for s in summaries], ["done", "done"])
+            self.assertEqual(summaries[1]["stages"]["mapping"]["attempts"], 2)
+            self.assertTrue(os.path.exists(os.path.join(d, "v1", "summary.json")))
+
+            spans = intervals(trace)
+            # Masking of the second video runs while the first one is mapped
+            self.assertTrue(overlaps(spans[("v2", "preprocess")], spans[("v1", "mapping")]))
+            memory = [spans[(v, t)] for v in ("v1", "v2") for t in ("dense", "mesh")]
+            for i in range(len(memory)):
+                for j in range(i + 1, len(memory)):
+                    self.assertFalse(overlaps(memory[i], memory[j]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+import os
+import sys
+import numpy as np
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmark import compare, parse_scenarios, pose_errors
+from synthetic import TurntableScene
+
+def rotation_z(degrees):
+    a = np.radians(degrees)
+    return np.array([[np.cos(a), -np.sin(a), 0], [np.sin(a), np.cos(a), 0], [0, 0, 1]])
+
+class TestBenchmark(unittest.TestCase):
+    def test_synthetic_scene_poses_and_masks(self):
+        scene = TurntableScene(frames=12, width=160, height=120)
+        poses = scene.poses()
+        self.assertEqual(poses.shape, (12, 3, 4))
+        centers = -np.einsum("nji,nj->ni", poses[:, :, :3], poses[:, :, 3])
+        np.testing.assert_allclose(np.linalg.norm(centers[:, :2], axis=1), scene.radius)
+
+        image, mask = scene.render(3), scene.mask(3)
+        self.assertEqual(image.shape, (120, 160, 3))
+        # The car fills part of the view, not all of it
+        self.assertTrue(0.05 < (mask > 0).mean() < 0.6)
+
+    def test_pose_error_ignores_gauge_and_finds_rotation_drift(self):
+        gt = TurntableScene(frames=24).poses()
+        rotations = gt[:, :, :3]
+        centers = -np.einsum("nji,nj->ni", rotations, gt[:, :, 3])
+
+        def poses(rotations, centers):
+            return np.concatenate([rotations, -np.einsum("nij,nj->ni", rotations, centers)[:, :, None]], axis=2)
+
+        # Same cameras in another world frame: x' = s R x + t
+        s, R, t = 0.3, rotation_z(40), np.array([1.0, -2.0, 0.5])
+        est_rotations = rotations @ R.T
+        est_centers = s * centers @ R.T + t
+        rotation, position = pose_errors(poses(est_rotations, est_centers), gt)
+        self.assertLess(rotation, 1e-6)
+        self.assertLess(position, 1e-6)
+
+        # Every camera turned 2 degrees about its optical axis
+        drifted = np.einsum("ij,njk->nik", rotation_z(2), est_rotations)
+        rotation, position = pose_errors(poses(drifted, est_centers), gt)
+        self.assertAlmostEqual(rotation, 2.0, places=6)
+        self.assertLess(position, 1e-6)
+
+    def test_compare_flags_regressions_only(self):
+        self.assertEqual(parse_scenarios("120x640x480, 60x1280x720"), [(120, 640, 480), (60, 1280, 720)])
+        metrics = {"frames_per_s": 100.0, "features_per_s": 1000.0, "registration_ratio": 1.0,
+                   "rotation_error_deg": 0.4, "mesh_seconds": 3.0, "masks_per_s": None}
+        baseline = {"scenarios": [{"name": "a", "metrics": metrics}]}
+        current = {"scenarios": [{"name": "a", "metrics": dict(metrics, frames_per_s=90.0, rotation_error_deg=0.6,
+                                                               features_per_s=600.0, mesh_seconds=2.0)}]}
+        self.assertEqual(compare(current, baseline, tolerance=0.25), ["a features_per_s: 1000.0 -> 600.0"])
+
+        current["scenarios"][0]["metrics"].update(registration_ratio=0.5, mesh_seconds=None)
+        self.assertEqual(len(compare(current, baseline)), 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+import os
+import sys
+import json
+import tempfile
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+class TestStageCache(unittest.TestCase):
+    def test_keys_follow_inputs_and_params(self):
+        """Keys change with input content and parameters, and chain downstream."""
+        from cache import StageCache
+        with tempfile.TemporaryDirectory() as tmp:
+            video = os.path.join(tmp, "video.mp4")
+            with open(video, "wb") as f:
+                f.write(b"abc")
+            cache = StageCache(os.path.join(tmp, "project"))
+
+            k1 = cache.key("frames", {"sample_rate": 10}, inputs=[video])
+            self.assertEqual(k1, cache.key("frames", {"sample_rate": 10}, inputs=[video]))
+            self.assertNotEqual(k1, cache.key("frames", {"sample_rate": 5}, inputs=[video]))
+            self.assertNotEqual(cache.key("masks", {}, upstream=k1), cache.key("masks", {}, upstream="other"))
+
+            with open(video, "wb") as f:
+                f.write(b"abcd")
+            self.assertNotEqual(k1, cache.key("frames", {"sample_rate": 10}, inputs=[video]))
+
+    def test_validity_and_force(self):
+        """Recorded stages stay valid until their outputs vanish or are forced."""
+        from cache import StageCache
+        with tempfile.TemporaryDirectory() as tmp:
+            out = os.path.join(tmp, "out.ply")
+            open(out, "w").close()
+            cache = StageCache(tmp)
+            cache.record("dense", "k", [out], 1.0)
+            cache.record("mesh", "m", [out], 1.0)
+            cache.save()
+
+            cache = StageCache(tmp)
+            self.assertTrue(cache.is_valid("dense", "k"))
+            self.assertFalse(cache.is_valid("dense", "other"))
+            cache.invalidate_from("dense")
+            self.assertFalse(cache.is_valid("dense", "k"))
+            self.assertFalse(cache.is_valid("mesh", "m"))
+
+    def test_lru_eviction(self):
+        """The least recently used project goes first; kept projects survive."""
+        from cache import evict_lru, MANIFEST_NAME
+        with tempfile.TemporaryDirectory() as tmp:
+            for name, last_used in [("old", 1), ("new", 2), ("current", 0)]:
+                d = os.path.join(tmp, name)
+                os.makedirs(d)
+                with open(os.path.join(d, MANIFEST_NAME), "w") as f:
+                    json.dump({"last_used": last_used}, f)
+                with open(os.path.join(d, "blob"), "wb") as f:
+                    f.write(b"x" * 1000)
+
+            evicted = evict_lru(tmp, 2500, keep=[os.path.join(tmp, "current")])
+            self.assertEqual([os.path.basename(d) for d in evicted], ["old"])
+            self.assertTrue(os.path.exists(os.path.join(tmp, "current")))
+            self.assertTrue(os.path.exists(os.path.join(tmp, "new")))
+
+    def test_frame_selection_is_part_of_frames_key(self):
+        """Switching the selection mode or target overlap re-runs the frames stage."""
+        import argparse
+        from cache import StageCache
+        from main import plan_stages
+        with tempfile.TemporaryDirectory() as tmp:
+            video = os.path.join(tmp, "video.mp4")
+            with open(video, "wb") as f:
+                f.write(b"abc")
+            cache = StageCache(os.path.join(tmp, "project"))
+            base = dict(video=video, sample_rate=10, blur_threshold=100.0, select="fixed", target_overlap=0.85,
+                        pairing="sequential", dense_backend="auto", depth=0)
+
+            def frames_key(**changes):
+                args = argparse.Namespace(**{**base, **changes})
+                return plan_stages(args, cache, "data", "reconstruction")[0][1]
+
+            self.assertEqual(frames_key(), frames_key())
+            self.assertNotEqual(frames_key(), frames_key(select="overlap"))
+            self.assertNotEqual(frames_key(select="overlap"), frames_key(select="overlap", target_overlap=0.7))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,179 @@
+import unittest
+import os
+import sys
+import tempfile
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+def render_frames(data_dir, count=8):
+    """A few small synthetic turntable frames in data_dir/images."""
+    import cv2
+    from synthetic import TurntableScene
+    scene = TurntableScene(frames=48, width=320, height=240)
+    os.makedirs(os.path.join(data_dir, "images"), exist_ok=True)
+    for i in range(count):
+        cv2.imwrite(os.path.join(data_dir, "images", f"frame_{i:05d}.jpg"), scene.render(i))
+
+class TestFeatureDatabase(unittest.TestCase):
+    def test_pair_id_roundtrip(self):
+        """Pair ids are order independent and decode back to the image ids."""
+        from colmap_db import pair_id, pair_id_to_image_ids
+        self.assertEqual(pair_id(3, 7), pair_id(7, 3))
+        self.assertEqual(pair_id_to_image_ids(pair_id(7, 3)), (3, 7))
+
+    def test_delete_pairs_touching_images(self):
+        """Only pairs involving the given images are dropped."""
+        import pycolmap
+        from colmap_db import FeatureDatabase, pair_id
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "database.db")
+            pycolmap.Database.open(path).close()
+            with FeatureDatabase(path) as db:
+                for a, b in [(1, 2), (2, 3), (3, 4)]:
+                    db.conn.execute("INSERT INTO matches (pair_id, rows, cols) VALUES (?, 0, 2)", (pair_id(a, b),))
+                db.conn.commit()
+                db.write_hashes({"frame_00000.jpg": "abc"})
+
+                self.assertEqual(db.delete_pairs([2]), 2)
+                self.assertEqual(db.matched_pairs(), {pair_id(3, 4)})
+                self.assertEqual(db.hashes(), {"frame_00000.jpg": "abc"})
+
+    def test_pairing_change_leaves_only_selected_pairs(self):
+        """Switching the pairing drops matches of pairs that are no longer selected."""
+        from colmap_db import FeatureDatabase, pair_id
+        from reconstruct import extract_features, list_images, match_features, retrieval_pairs, sequential_pairs
+        with tempfile.TemporaryDirectory() as tmp:
+            render_frames(tmp)
+            extract_features(tmp, tmp)
+            names = list_images(os.path.join(tmp, "images"))
+            database_path = os.path.join(tmp, "database.db")
+
+            def selected(pairs):
+                with FeatureDatabase(database_path) as db:
+                    ids = db.image_ids()
+                    return {pair_id(ids[a], ids[b]) for a, b in pairs}, db.stored_pairs()
+
+            match_features(tmp, tmp, "sequential")
+            wanted, stored = selected(sequential_pairs(names))
+            self.assertEqual(stored, wanted)
+
+            match_features(tmp, tmp, "retrieval", top_k=1)
+            wanted, stored = selected(retrieval_pairs(database_path, names, top_k=1))
+            self.assertEqual(stored, wanted)
+            self.assertLess(len(wanted), len(sequential_pairs(names)))
+
+    def test_unimported_image_does_not_abort_matching(self):
+        """A zero-byte frame COLMAP cannot read is left out of the pairs instead of raising."""
+        from colmap_db import FeatureDatabase, pair_id_to_image_ids
+        from reconstruct import extract_features, match_features, match_pairs, retrieval_pairs
+        with tempfile.TemporaryDirectory() as tmp:
+            render_frames(tmp, count=4)
+            open(os.path.join(tmp, "images", "frame_00002b.jpg"), "wb").close()
+            extract_features(tmp, tmp)
+            database_path = os.path.join(tmp, "database.db")
+            with FeatureDatabase(database_path) as db:
+                ids = db.image_ids()
+            self.assertNotIn("frame_00002b.jpg", ids)
+
+            names = sorted(os.listdir(os.path.join(tmp, "images")))
+            pairs = retrieval_pairs(database_path, names, top_k=1)
+            self.assertTrue(pairs)
+            self.assertFalse(any("frame_00002b.jpg" in pair for pair in pairs))
+
+            match_features(tmp, tmp, "sequential")
+            reused, matched = match_pairs(database_path, [("frame_00000.jpg", "frame_00002b.jpg"),
+                                                          ("frame_00000.jpg", "frame_00001.jpg")], tmp)
+            self.assertEqual((reused, matched), (1, 0))
+            with FeatureDatabase(database_path) as db:
+                pairs = {pair_id_to_image_ids(p) for p in db.stored_pairs()}
+            self.assertEqual(pairs, {tuple(sorted((ids["frame_00000.jpg"], ids["frame_00001.jpg"])))})
+
+    def test_delete_images_cleans_every_table(self):
+        """Removing an image leaves no rows of it behind, and keeps the others intact."""
+        from colmap_db import FeatureDatabase, pair_id_to_image_ids
+        from reconstruct import extract_features, match_features
+        with tempfile.TemporaryDirectory() as tmp:
+            render_frames(tmp, count=4)
+            extract_features(tmp, tmp)
+            match_features(tmp, tmp, "sequential")
+
+            def count(db, sql, image_id):
+                return db.conn.execute(sql, (image_id,)).fetchone()[0]
+
+            queries = [
+                "SELECT COUNT(*) FROM images WHERE image_id = ?",
+                "SELECT COUNT(*) FROM keypoints WHERE image_id = ?",
+                "SELECT COUNT(*) FROM descriptors WHERE image_id = ?",
+                "SELECT COUNT(*) FROM pose_priors WHERE corr_data_id = ?",
+                "SELECT COUNT(*) FROM frame_data WHERE data_id = ?",
+                "SELECT COUNT(*) FROM frames WHERE frame_id IN (SELECT frame_id FROM frame_data WHERE data_id = ?)",
+            ]
+            with FeatureDatabase(os.path.join(tmp, "database.db")) as db:
+                ids = db.image_ids()
+                # COLMAP only writes pose priors for images with GPS, so add some
+                for image_id in ids.values():
+                    db.conn.execute("INSERT INTO pose_priors (corr_data_id, corr_sensor_id, corr_sensor_type, "
+                                    "coordinate_system) VALUES (?, 1, 1, 0)", (image_id,))
+                frames_before = db.conn.execute("SELECT COUNT(*) FROM frames").fetchone()[0]
+                gone, kept = ids["frame_00001.jpg"], ids["frame_00002.jpg"]
+
+                db.delete_images([gone])
+                for sql in queries:
+                    self.assertEqual(count(db, sql, gone), 0, sql)
+                    self.assertEqual(count(db, sql, kept), 1, sql)
+                self.assertEqual(db.conn.execute("SELECT COUNT(*) FROM frames").fetchone()[0], frames_before - 1)
+                self.assertFalse(any(gone in pair_id_to_image_ids(p) for p in db.stored_pairs()))
+                self.assertTrue(db.stored_pairs())
+
+class TestIncrementalExtraction(unittest.TestCase):
+    def test_skips_images_with_stored_features(self):
+        """A second run reuses everything; editing one image re-extracts just that one."""
+        import cv2
+        from colmap_db import FeatureDatabase
+        from reconstruct import extract_features
+        with tempfile.TemporaryDirectory() as tmp:
+            render_frames(tmp, count=4)
+            self.assertEqual(extract_features(tmp, tmp), (0, 4))
+            database_path = os.path.join(tmp, "database.db")
+            with FeatureDatabase(database_path) as db:
+                ids = db.image_ids()
+                descriptors = {i: db.read_descriptors(i).tobytes() for i in ids.values()}
+
+            self.assertEqual(extract_features(tmp, tmp), (4, 0))
+
+            path = os.path.join(tmp, "images", "frame_00002.jpg")
+            cv2.imwrite(path, cv2.flip(cv2.imread(path), 1))
+            self.assertEqual(extract_features(tmp, tmp), (3, 1))
+            with FeatureDatabase(database_path) as db:
+                self.assertEqual(db.image_ids(), ids)
+                for name, image_id in ids.items():
+                    same = db.read_descriptors(image_id).tobytes() == descriptors[image_id]
+                    self.assertEqual(same, name != "frame_00002.jpg", name)
+
+    def test_reextracts_removed_image(self):
+        """A removed image is dropped from the database and extracted again when it comes back."""
+        import shutil
+        from colmap_db import FeatureDatabase
+        from reconstruct import extract_features
+        with tempfile.TemporaryDirectory() as tmp:
+            render_frames(tmp, count=4)
+            extract_features(tmp, tmp)
+            database_path = os.path.join(tmp, "database.db")
+            path = os.path.join(tmp, "images", "frame_00001.jpg")
+            shutil.move(path, os.path.join(tmp, "frame_00001.jpg"))
+
+            self.assertEqual(extract_features(tmp, tmp), (3, 0))
+            with FeatureDatabase(database_path) as db:
+                self.assertNotIn("frame_00001.jpg", db.image_ids())
+                self.assertNotIn("frame_00001.jpg", db.hashes())
+
+            shutil.move(os.path.join(tmp, "frame_00001.jpg"), path)
+            self.assertEqual(extract_features(tmp, tmp), (3, 1))
+            with FeatureDatabase(database_path) as db:
+                image_id = db.image_ids()["frame_00001.jpg"]
+                self.assertIn(image_id, db.image_ids_with_features())
+                self.assertGreater(len(db.read_descriptors(image_id)), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+import os
+import sys
+import numpy as np
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+class TestCpuStereo(unittest.TestCase):
+    def _render_plane(self, texture, K, t, depth):
+        """View of a fronto-parallel textured plane at `depth` from a camera translated by t."""
+        import cv2
+        n = texture.shape[0]
+        half = 2.0
+        corners = np.array([[-half, -half], [half, -half], [half, half], [-half, half]])
+        cam = np.column_stack([corners, np.full(4, depth)]) + t
+        proj = (K @ cam.T).T
+        proj = (proj[:, :2] / proj[:, 2:]).astype(np.float32)
+        H = cv2.getPerspectiveTransform(np.float32([[0, 0], [n, 0], [n, n], [0, n]]), proj)
+        return cv2.warpPerspective(texture, H, (320, 240))
+
+    def test_depth_of_textured_plane(self):
+        """SGBM depth from a rectified pair recovers the distance of a plane."""
+        import cv2
+        from dense import stereo_depth
+
+        rng = np.random.default_rng(0)
+        texture = cv2.resize(rng.integers(0, 256, (128, 128), dtype=np.uint8), (512, 512), interpolation=cv2.INTER_LINEAR)
+        K = np.array([[300.0, 0, 160], [0, 300.0, 120], [0, 0, 1]])
+        dist = np.zeros(4)
+        view = lambda t: {"gray": self._render_plane(texture, K, t, 5.0), "K": K, "dist": dist, "R": np.eye(3), "t": t}
+        ref = view(np.zeros(3))
+
+        # Source to the right, to the left and above the reference
+        for t in ([-0.3, 0, 0], [0.3, 0, 0], [0, 0.3, 0]):
+            with self.subTest(t=t):
+                depth = stereo_depth(ref, view(np.array(t, dtype=np.float64)), max_disparity=64)
+                valid = depth[60:180, 80:240]
+                self.assertGreater((valid > 0).mean(), 0.5)
+                self.assertAlmostEqual(float(np.median(valid[valid > 0])), 5.0, delta=0.1)
+
+class TestFusion(unittest.TestCase):
+    def test_fuse_keeps_consistent_views(self):
+        """Depth maps that agree are fused; a view at the wrong depth is voted out."""
+        import tempfile
+        from dense import fuse_depth_maps
+
+        K = np.array([[300.0, 0, 160], [0, 300.0, 120], [0, 0, 1]])
+        # Three cameras facing a plane at z=5; the third one's depth map is off by 20%
+        offsets = {1: [0, 0, 0], 2: [-0.3, 0, 0], 3: [0.3, 0, 0]}
+        with tempfile.TemporaryDirectory() as tmp:
+            paths, views = {}, {}
+            for i, t in offsets.items():
+                depth = np.full((240, 320), 6.0 if i == 3 else 5.0, dtype=np.float32)
+                color = np.full((240, 320, 3), 40 * i, dtype=np.uint8)
+                paths[i] = os.path.join(tmp, f"{i}.npz")
+                np.savez(paths[i], depth=depth, color=color)
+                views[i] = {"K": K, "R": np.eye(3), "t": np.array(t, dtype=np.float64)}
+            neighbors = {1: [2, 3], 2: [1, 3], 3: [1, 2]}
+
+            points, colors = fuse_depth_maps(paths, neighbors, views)
+            # Every .npz is closed again, so the folder can go
+            for path in paths.values():
+                os.remove(path)
+
+        self.assertGreater(len(points), 1000)
+        np.testing.assert_allclose(points[:, 2], 5.0, atol=1e-4)
+        self.assertNotIn(120, np.unique(colors))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import unittest
+import os
+import sys
+import tempfile
+import time
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from jobs import Job, list_jobs, parse_progress, submit
+
+def wait_for(job, statuses, timeout=20):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job.refresh()
+        if job.status in statuses:
+            return True
+        time.sleep(0.1)
+    return False
+
+class TestJobs(unittest.TestCase):
+    def test_parse_progress_keeps_latest_per_stage(self):
+        lines = [
+            "[*] Extracting frames\n",
+            '[progress] {"stage": "frames", "processed": 10, "total": 100}\n',
+            '[progress] {"stage": "frames", "processed": 60, "total": 100}\n',
+            '[progress] {"stage": "sparse", "registered": 4\n',  # truncated line
+            '[progress] {"stage": "sparse", "registered": 5, "total": 8}\n',
+        ]
+        progress = parse_progress(lines)
+        self.assertEqual(list(progress), ["frames", "sparse"])
+        self.assertEqual(progress["frames"]["processed"], 60)
+        self.assertEqual(progress["sparse"], {"registered": 5, "total": 8})
+
+    def test_job_streams_log_and_survives_reopen(self):
+        """Steps run detached; a fresh Job object sees the finished record."""
+        step = [sys.executable, "-c",
+                "from jobs import emit_progress; print('hello'); emit_progress('frames', processed=3, total=3)"]
+        with tempfile.TemporaryDirectory() as d:
+            job = submit(d, [step, step], cwd=os.path.join(os.path.dirname(__file__), '..'))
+            self.assertTrue(wait_for(job, ("done", "failed")))
+
+            reopened = list_jobs(d)[0]
+            self.assertEqual(reopened.id, job.id)
+            self.assertEqual(reopened.status, "done")
+            self.assertEqual(reopened.tail().count("\nhello\n"), 2)
+            self.assertEqual(reopened.progress()["frames"]["processed"], 3)
+
+    def test_failed_and_cancelled_jobs(self):
+        with tempfile.TemporaryDirectory() as d:
+            failing = submit(d, [[sys.executable, "-c", "import sys; sys.exit(3)"], [sys.executable, "-c", "print('never')"]])
+            self.assertTrue(wait_for(failing, ("done", "failed")))
+            self.assertEqual(failing.status, "failed")
+            self.assertEqual(failing.record["returncode"], 3)
+            self.assertNotIn("never", failing.tail().replace("print('never')", ""))
+
+            # An accepted non-zero code completes the job and runs the next step
+            verdict = submit(d, [[sys.executable, "-c", "import sys; sys.exit(3)"], [sys.executable, "-c", "print('next')"]],
+                             ok_codes=(0, 3))
+            self.assertTrue(wait_for(verdict, ("done", "failed")))
+            self.assertEqual(verdict.status, "done")
+            self.assertIn("\nnext\n", verdict.tail())
+
+            slow = submit(d, [[sys.executable, "-c", "import time; print('started', flush=True); time.sleep(60)"]])
+            self.assertTrue(wait_for(slow, ("running",)))
+            deadline = time.time() + 10
+            while "started" not in slow.tail().split("\n", 2)[-1] and time.time() < deadline:
+                time.sleep(0.1)
+            self.assertTrue(slow.cancel())
+            self.assertTrue(wait_for(slow, ("cancelled",)))
+            self.assertFalse(Job(slow.dir).cancel())
+
+if __name__ == '__main__':
+    unittest.main()
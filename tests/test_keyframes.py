@@ -0,0 +1,43 @@
+import unittest
+import os
+import sys
+import numpy as np
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+class TestKeyframeSelector(unittest.TestCase):
+    def _run(self, speeds):
+        import cv2
+        from keyframes import KeyframeSelector, small_gray
+
+        rng = np.random.default_rng(0)
+        texture = cv2.GaussianBlur(rng.integers(0, 256, (240, 4000), dtype=np.uint8), (5, 5), 0)
+        selector = KeyframeSelector(target_overlap=0.85)
+        kept = []
+        x = 0
+        for i, speed in enumerate(speeds):
+            frame = cv2.cvtColor(texture[:, x:x + 320].copy(), cv2.COLOR_GRAY2BGR)
+            # Every third frame is blurrier than its neighbours
+            score = 50.0 if i % 3 == 0 else 100.0
+            kept += [idx for idx, _ in selector.push(i, frame, score, small_gray(frame))]
+            x += speed
+        kept += [idx for idx, _ in selector.flush()]
+        return kept
+
+    def test_spacing_follows_motion(self):
+        """Keyframes should be twice as dense when the camera moves twice as fast."""
+        kept = self._run([3] * 100 + [6] * 100)
+        gaps = np.diff(kept)
+        slow = np.median(gaps[np.array(kept[1:]) < 100])
+        fast = np.median(gaps[np.array(kept[1:]) > 110])
+        self.assertEqual(kept[0], 0)
+        self.assertAlmostEqual(slow / fast, 2.0, delta=0.5)
+
+    def test_prefers_sharp_frames(self):
+        """Relative sharpness should steer picks away from the blurry frames."""
+        kept = self._run([3] * 150)
+        self.assertTrue(all(i % 3 != 0 for i in kept[1:]))
+
+if __name__ == '__main__':
+    unittest.main()
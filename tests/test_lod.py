@@ -0,0 +1,67 @@
+import unittest
+import os
+import sys
+import tempfile
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+class TestLodPyramid(unittest.TestCase):
+    def test_levels_and_budget_selection(self):
+        """Each level is coarser than the last and pick_level respects the budget."""
+        import open3d as o3d
+        from lod import load_index, pick_level, write_lod_pyramid
+
+        with tempfile.TemporaryDirectory() as out:
+            mesh = o3d.geometry.TriangleMesh.create_sphere(radius=1.0, resolution=200)
+            mesh_path = os.path.join(out, "final_mesh.ply")
+            o3d.io.write_triangle_mesh(mesh_path, mesh)
+            cloud_path = os.path.join(out, "fused.ply")
+            o3d.io.write_point_cloud(cloud_path, mesh.sample_points_uniformly(200000))
+
+            write_lod_pyramid(out, mesh_path, cloud_path)
+            index = load_index(out)
+
+            meshes = [e for e in index["levels"] if e["kind"] == "mesh"]
+            clouds = [e for e in index["levels"] if e["kind"] == "cloud"]
+            self.assertEqual(meshes[0]["path"], os.path.realpath(mesh_path))
+            self.assertGreater(len(meshes), 1)
+            self.assertGreater(len(clouds), 1)
+            for levels, key in ((meshes, "triangles"), (clouds, "points")):
+                counts = [e[key] for e in levels]
+                self.assertEqual(counts, sorted(counts, reverse=True))
+                self.assertTrue(all(os.path.exists(e["path"]) for e in levels))
+
+            self.assertEqual(pick_level(index, "mesh", 10 ** 9)["level"], 0)
+            self.assertLessEqual(pick_level(index, "cloud", 50000)["points"], 50000)
+            # Nothing fits: fall back to the coarsest level
+            self.assertEqual(pick_level(index, "cloud", 1)["level"], clouds[-1]["level"])
+
+    def test_levels_of_a_rewritten_source_are_ignored(self):
+        """Re-running densify alone must not leave readers on the old cloud's levels."""
+        import open3d as o3d
+        from lod import load_index, pick_level, write_lod_pyramid
+        from view3d import resolve_level
+
+        with tempfile.TemporaryDirectory() as out:
+            mesh = o3d.geometry.TriangleMesh.create_sphere(radius=1.0, resolution=100)
+            mesh_path = os.path.join(out, "final_mesh.ply")
+            o3d.io.write_triangle_mesh(mesh_path, mesh)
+            cloud_path = os.path.join(out, "dense", "fused.ply")
+            os.makedirs(os.path.dirname(cloud_path))
+            o3d.io.write_point_cloud(cloud_path, mesh.sample_points_uniformly(100000))
+            write_lod_pyramid(out, mesh_path, cloud_path)
+            self.assertGreater(pick_level(load_index(out), "cloud", 1000)["level"], 0)
+
+            # A new dense cloud, newer than the index
+            o3d.io.write_point_cloud(cloud_path, mesh.sample_points_uniformly(50000))
+            later = os.path.getmtime(os.path.join(out, "lod", "index.json")) + 10
+            os.utime(cloud_path, (later, later))
+
+            index = load_index(out)
+            self.assertFalse([e for e in index["levels"] if e["kind"] == "cloud"])
+            self.assertTrue([e for e in index["levels"] if e["kind"] == "mesh"])
+            self.assertEqual(resolve_level(out, "dense", cloud_path, 1000), cloud_path)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+import os
+import sys
+import io
+import tempfile
+from contextlib import redirect_stdout
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+class TestChunking(unittest.TestCase):
+    def test_chunks_overlap_and_cover_sequence(self):
+        """Consecutive chunks share `overlap` images and every image lands in a chunk."""
+        from mapping import split_chunks
+
+        names = [f"frame_{i:05d}.jpg" for i in range(100)]
+        chunks = split_chunks(names, 30, 10)
+        self.assertEqual(chunks[0][0], names[0])
+        self.assertEqual(chunks[-1][-1], names[-1])
+        for a, b in zip(chunks, chunks[1:]):
+            self.assertEqual(len(set(a) & set(b)), 10)
+        # The tail is folded in rather than left as a tiny chunk
+        self.assertGreaterEqual(min(len(c) for c in chunks), 30)
+
+    def test_short_sequence_is_one_chunk(self):
+        from mapping import split_chunks
+
+        self.assertEqual(split_chunks(["a", "b", "c"], 10, 2), [["a", "b", "c"]])
+
+class TestSparseProgress(unittest.TestCase):
+    def _map(self, **options):
+        """Progress updates of map_sparse on 24 synthetic turntable frames, and the model."""
+        import cv2
+        from jobs import parse_progress
+        from reconstruct import extract_features, map_sparse, match_features
+        from synthetic import TurntableScene
+
+        scene = TurntableScene(frames=60, width=320, height=240)
+        with tempfile.TemporaryDirectory() as tmp:
+            os.makedirs(os.path.join(tmp, "images"))
+            for i in range(24):
+                cv2.imwrite(os.path.join(tmp, "images", f"frame_{i:05d}.jpg"), scene.render(i))
+            extract_features(tmp, tmp)
+            match_features(tmp, tmp, "sequential")
+
+            log = io.StringIO()
+            with redirect_stdout(log):
+                model = map_sparse(tmp, tmp, **options)
+
+        self.assertIsNotNone(model)
+        lines = [line for line in log.getvalue().splitlines() if '"stage": "sparse"' in line]
+        updates = [parse_progress([line + "\n"])["sparse"] for line in lines]
+        for update in updates:
+            self.assertLessEqual(update["registered"], update["total"])
+            self.assertEqual(update["total"], 24)
+        self.assertEqual(updates[-1]["registered"], len(model.reg_image_ids()))
+        self.assertFalse(updates[-1]["approximate"])
+        return updates
+
+    def test_chunks_count_registered_images_once(self):
+        """Chunk progress counts distinct registered images, never more than there are."""
+        updates = self._map(chunk_size=12, chunk_overlap=4, mapper_workers=2)
+        self.assertGreaterEqual(len(updates), 3)  # one per chunk, then the final model
+
+    def test_single_model_reports_live_estimate(self):
+        """The single mapper reports a capped live estimate while running, then the exact count."""
+        updates = self._map()
+        self.assertGreaterEqual(len(updates), 2)
+        self.assertTrue(updates[0]["approximate"])
+
+if __name__ == '__main__':
+    unittest.main()
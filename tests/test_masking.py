@@ -0,0 +1,120 @@
+import unittest
+import os
+import sys
+import tempfile
+import numpy as np
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+class TestMaskPropagation(unittest.TestCase):
+    def test_mask_iou(self):
+        """IoU of binarized masks."""
+        from masking import mask_iou
+        a = np.zeros((10, 10), dtype=np.uint8)
+        b = np.zeros((10, 10), dtype=np.uint8)
+        self.assertEqual(mask_iou(a, b), 1.0)
+
+        a[:, :5] = 255
+        b[:, :5] = 255
+        self.assertEqual(mask_iou(a, b), 1.0)
+
+        b[:] = 0
+        b[:5, :] = 255
+        self.assertAlmostEqual(mask_iou(a, b), 25 / 75)
+
+    def test_warp_follows_motion(self):
+        """A mask warped with optical flow should follow a translated texture."""
+        import cv2
+        from masking import warp_mask, mask_iou
+
+        rng = np.random.default_rng(0)
+        texture = cv2.GaussianBlur(rng.integers(0, 256, (120, 160), dtype=np.uint8), (5, 5), 0)
+        shifted = np.roll(texture, 4, axis=1)
+
+        mask = np.zeros((120, 160), dtype=np.uint8)
+        mask[40:80, 50:110] = 255
+        expected = np.roll(mask, 4, axis=1)
+
+        warped = warp_mask(mask, texture, shifted, 1.0)
+        self.assertGreater(mask_iou(warped, expected), mask_iou(mask, expected))
+
+class TestRoiMasking(unittest.TestCase):
+    def test_upsample_mask_snaps_to_edges(self):
+        """Guided upsampling should restore full size and follow the guide's edges."""
+        from masking import upsample_mask, mask_bbox
+        guide = np.zeros((200, 200, 3), dtype=np.uint8)
+        guide[50:150, 60:140] = 255
+        low = np.zeros((50, 50), dtype=np.uint8)
+        low[12:38, 15:35] = 255
+
+        up = upsample_mask(low, guide)
+        self.assertEqual(up.shape, (200, 200))
+        x, y, w, h = mask_bbox(up)
+        self.assertLessEqual(abs(x - 60), 3)
+        self.assertLessEqual(abs(y - 50), 3)
+        self.assertIsNone(mask_bbox(np.zeros((10, 10), dtype=np.uint8)))
+
+# Stand-in for rembg: the "mask" of a frame is filled with its mean value,
+# so every mask can be traced back to the frame it came from
+FAKE_REMBG = """
+import numpy as np
+from PIL import Image
+
+class FakeSession:
+    def predict(self, img):
+        value = int(np.asarray(img).mean())
+        return [Image.fromarray(np.full((img.size[1], img.size[0]), value, dtype=np.uint8))]
+
+def new_session(model):
+    return FakeSession()
+"""
+
+class TestMaskingEngine(unittest.TestCase):
+    def setUp(self):
+        import masking
+        self.tmp = tempfile.TemporaryDirectory()
+        with open(os.path.join(self.tmp.name, "rembg.py"), "w") as f:
+            f.write(FAKE_REMBG)
+        # Spawned workers inherit sys.path, so they import the stub too
+        sys.path.insert(0, self.tmp.name)
+        self.saved_rembg = sys.modules.pop("rembg", None)
+        masking._session = masking._session_model = None
+
+    def tearDown(self):
+        import masking
+        sys.path.remove(self.tmp.name)
+        sys.modules.pop("rembg", None)
+        if self.saved_rembg is not None:
+            sys.modules["rembg"] = self.saved_rembg
+        masking._session = masking._session_model = None
+        self.tmp.cleanup()
+
+    def frames(self, count=11):
+        return [np.full((24, 32, 3), 10 * i + 5, dtype=np.uint8) for i in range(count)]
+
+    def test_predict_masks_keeps_frame_order(self):
+        from masking import predict_masks
+        masks = predict_masks(self.frames(5))
+        self.assertEqual([int(m[0, 0]) for m in masks], [5, 15, 25, 35, 45])
+        self.assertEqual(masks[0].shape, (24, 32))
+
+    def test_pool_returns_masks_in_order_and_shuts_down(self):
+        from masking import MaskingEngine
+        engine = MaskingEngine(workers=2, batch_size=3)
+        pool = engine.pool
+        self.assertEqual(pool._mp_context.get_start_method(), "spawn")
+        try:
+            masks = engine.predict(self.frames())
+        finally:
+            processes = list(pool._processes.values())
+            engine.close()
+
+        self.assertEqual([int(m[0, 0]) for m in masks], [10 * i + 5 for i in range(11)])
+        self.assertEqual(engine.masks, 11)
+        self.assertIsNone(engine.pool)
+        self.assertTrue(processes)
+        self.assertFalse(any(p.is_alive() for p in processes))
+
+if __name__ == '__main__':
+    unittest.main()
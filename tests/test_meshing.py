@@ -0,0 +1,63 @@
+import unittest
+import os
+import sys
+import numpy as np
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+class TestMeshingHelpers(unittest.TestCase):
+    def test_normals_face_cameras(self):
+        """Randomly signed sphere normals end up pointing out, towards the surrounding cameras."""
+        from meshing import orient_normals
+
+        rng = np.random.default_rng(0)
+        points = rng.normal(size=(5000, 3))
+        points /= np.linalg.norm(points, axis=1, keepdims=True)
+        normals = points * rng.choice([-1.0, 1.0], size=(5000, 1))
+        centers = rng.normal(size=(200, 3))
+        centers *= 5 / np.linalg.norm(centers, axis=1, keepdims=True)
+
+        oriented, flipped = orient_normals(points, normals.copy(), centers)
+        self.assertTrue(((oriented * points).sum(axis=1) > 0).all())
+        self.assertEqual(flipped, int(((normals * points).sum(axis=1) < 0).sum()))
+
+    def test_poisson_depth_follows_spacing(self):
+        from meshing import poisson_depth
+
+        points = np.random.default_rng(0).uniform(0, 4.0, size=(10000, 3))
+        self.assertEqual(poisson_depth(points, 4.0 / 512), 9)
+        self.assertLess(poisson_depth(points, 4.0 / 64), poisson_depth(points, 4.0 / 512))
+        self.assertEqual(poisson_depth(points, 1e-9), 11)
+
+    def test_mask_culling_drops_background(self):
+        """A point on the object survives, one on the ground beside it does not."""
+        import tempfile
+        import cv2
+        import pycolmap
+        from meshing import cull_by_masks
+
+        model = pycolmap.Reconstruction()
+        with tempfile.TemporaryDirectory() as masks_dir:
+            for i, angle in enumerate(np.linspace(0, 2 * np.pi, 8, endpoint=False)):
+                # Cameras on a ring looking at the origin
+                center = np.array([5 * np.cos(angle), 5 * np.sin(angle), 1.0])
+                z = -center / np.linalg.norm(center)
+                x = np.cross(z, [0, 0, 1.0])
+                x /= np.linalg.norm(x)
+                R = np.stack([x, np.cross(z, x), z])
+                camera = pycolmap.Camera(model="PINHOLE", width=200, height=200, params=[200, 200, 100, 100], camera_id=i + 1)
+                model.add_camera_with_trivial_rig(camera)
+                image = pycolmap.Image(name=f"frame_{i:05d}.jpg", keypoints=np.zeros((0, 2)), camera_id=i + 1, image_id=i + 1)
+                model.add_image_with_trivial_frame(image, pycolmap.Rigid3d(pycolmap.Rotation3d(R), -R @ center))
+
+                mask = np.zeros((200, 200), np.uint8)
+                cv2.circle(mask, (100, 100), 30, 255, -1)
+                cv2.imwrite(os.path.join(masks_dir, f"frame_{i:05d}.jpg.png"), mask)
+
+            points = np.array([[0.0, 0.0, 0.0], [0.3, -0.2, 0.1], [3.0, 0.0, -0.5]])
+            keep = cull_by_masks(points, model, masks_dir)
+        self.assertEqual(keep.tolist(), [True, True, False])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+import unittest
+import os
+import subprocess
+import sys
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pipeline import Pipeline
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+class TestPipeline(unittest.TestCase):
+    def test_entry_points_import_no_heavy_modules(self):
+        """--help of the scripts must not pay for open3d, pycolmap or rembg."""
+        code = ("import sys, main, pipeline, reconstruct, viz, batch; "
+                "print(','.join(m for m in ('open3d', 'pycolmap', 'rembg', 'onnxruntime') if m in sys.modules))")
+        out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+        self.assertEqual(out.stdout.strip(), "")
+
+    def test_run_dispatches_stages_in_order(self):
+        pipe = Pipeline("/tmp/unused", video="car.mp4")
+        calls = []
+        pipe.preprocess = lambda masks=True, **o: calls.append(("preprocess", masks, o))
+        pipe.masks = lambda **o: calls.append(("masks",))
+        pipe.reconstruct = lambda stages, **o: calls.append(("reconstruct", stages, o)) or True
+        pipe.mesh = lambda **o: calls.append(("mesh", o))
+
+        self.assertTrue(pipe.run(["frames", "masks", "sparse", "dense", "mesh"],
+                                 preprocess_options={"sample_rate": 5}, mesh_options={"depth": 8}))
+        self.assertEqual(calls, [
+            ("preprocess", True, {"sample_rate": 5}),
+            ("reconstruct", ["sparse", "dense"], {}),
+            ("mesh", {"depth": 8}),
+        ])
+
+        calls.clear()
+        pipe.reconstruct = lambda stages, **o: calls.append(("reconstruct", stages, o)) and False
+        self.assertFalse(pipe.run(["masks", "features", "matches", "sparse", "mesh"]))
+        self.assertEqual(calls, [("masks",), ("reconstruct", ["features", "matches", "sparse"], {})])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+import unittest
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+class TestPointCache(unittest.TestCase):
+    def test_sidecar_roundtrip_and_refresh(self):
+        """The sidecar is memory-mapped, matches the PLY and is rebuilt when the PLY changes."""
+        from dense import write_ply
+        from pointcache import load_point_cloud, sidecar_path, unpack_normals
+
+        rng = np.random.default_rng(0)
+        points = rng.normal(size=(1000, 3)).astype(np.float32)
+        colors = rng.integers(0, 256, (1000, 3), dtype=np.uint8)
+        normals = points / np.linalg.norm(points, axis=1, keepdims=True)
+
+        with tempfile.TemporaryDirectory() as out:
+            ply = os.path.join(out, "fused.ply")
+            write_ply(ply, points, colors, normals)
+
+            cloud = load_point_cloud(ply)
+            self.assertIsInstance(cloud.points, np.memmap)
+            self.assertTrue(sidecar_path(ply).is_dir())
+            np.testing.assert_array_equal(cloud.points, points)
+            np.testing.assert_array_equal(cloud.colors[10:20], colors[10:20])
+            np.testing.assert_allclose(unpack_normals(cloud.normals), normals, atol=0.02)
+
+            # A newer PLY invalidates the sidecar
+            del cloud
+            time.sleep(0.01)
+            write_ply(ply, points[:10], colors[:10])
+            os.utime(ply, (time.time() + 5, time.time() + 5))
+            cloud = load_point_cloud(ply)
+            self.assertEqual(len(cloud.points), 10)
+            self.assertIsNone(cloud.normals)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import unittest
+import os
+import sys
+import json
+import tempfile
+import numpy as np
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+def write_clip(path, count=40, width=160, height=120, flat_every=0):
+    """
+    Short mp4 of a noise texture sliding sideways. With flat_every=N every
+    Nth frame is a uniform gray image, which the blur filter rejects.
+    """
+    import cv2
+
+    rng = np.random.default_rng(0)
+    texture = rng.integers(0, 256, (height, width + 4 * count, 3), dtype=np.uint8)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), 30, (width, height))
+    try:
+        for i in range(count):
+            if flat_every and i % flat_every == 0:
+                writer.write(np.full((height, width, 3), 128, np.uint8))
+            else:
+                writer.write(np.ascontiguousarray(texture[:, 4 * i:4 * i + width]))
+    finally:
+        writer.release()
+
+def read_all(path):
+    import cv2
+
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+class TestFrameSampler(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.video = os.path.join(cls.tmp.name, "clip.mp4")
+        # 41 frames: no stride below divides it evenly, so the last stride is partial
+        write_clip(cls.video, count=41)
+        cls.frames = read_all(cls.video)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def test_matches_sequential_read(self):
+        """Every seek mode and stride returns exactly the frames a plain read() loop sees."""
+        from preprocess import FrameSampler
+
+        self.assertEqual(len(self.frames), 41)
+        for seek in ("auto", "always", "never"):
+            for stride in (1, 2, 3, 7, 12):
+                with self.subTest(seek=seek, stride=stride):
+                    sampler = FrameSampler(self.video, sample_rate=stride, seek=seek)
+                    try:
+                        sampled = list(sampler)
+                    finally:
+                        sampler.release()
+                    indices = [idx for idx, _ in sampled]
+                    self.assertEqual(indices, list(range(0, 41, stride)))
+                    for idx, frame in sampled:
+                        np.testing.assert_array_equal(frame, self.frames[idx])
+
+class TestProcessVideo(unittest.TestCase):
+    def test_repeated_runs_are_identical(self):
+        """Two runs over the same clip give the same names, order, bytes and manifest."""
+        from preprocess import process_video
+        from previews import read_manifest
+
+        with tempfile.TemporaryDirectory() as tmp:
+            video = os.path.join(tmp, "clip.mp4")
+            write_clip(video, flat_every=3)
+
+            runs = []
+            for run in ("a", "b"):
+                out = os.path.join(tmp, run)
+                # Small queue and several workers, so scoring finishes out of order
+                process_video(video, out, sample_rate=2, blur_threshold=50.0, masks=False, workers=4, queue_size=2)
+                img_dir = os.path.join(out, "images")
+                names = sorted(os.listdir(img_dir))
+                images = []
+                for name in names:
+                    with open(os.path.join(img_dir, name), "rb") as f:
+                        images.append(f.read())
+                runs.append((names, images, read_manifest(out)))
+
+            (names, images, manifest), (names_b, images_b, manifest_b) = runs
+            self.assertEqual(names, names_b)
+            self.assertEqual(images, images_b)
+            self.assertEqual(json.dumps(manifest, sort_keys=True), json.dumps(manifest_b, sort_keys=True))
+
+            # Sampled frames 0, 2, ..., 38 minus the flat ones (multiples of 3), numbered in video order
+            expected = [i for i in range(0, 40, 2) if i % 3 != 0]
+            self.assertEqual(names, [f"frame_{k:05d}.jpg" for k in range(len(expected))])
+            self.assertEqual([e["name"] for e in manifest["frames"]], names)
+            self.assertEqual([e["source_frame"] for e in manifest["frames"]], expected)
+
+if __name__ == '__main__':
+    unittest.main()
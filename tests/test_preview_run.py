@@ -0,0 +1,52 @@
+import unittest
+import os
+import sys
+import numpy as np
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from preprocess import fit_to_side
+from preview_run import assess, model_health
+
+class FakeModel:
+    """The parts of pycolmap.Reconstruction the health metrics read."""
+
+    def __init__(self, registered, error, track_length, points):
+        self.registered, self.error, self.track, self.points = registered, error, track_length, points
+
+    def num_reg_images(self):
+        return self.registered
+
+    def compute_mean_reprojection_error(self):
+        return self.error
+
+    def compute_mean_track_length(self):
+        return self.track
+
+    def num_points3D(self):
+        return self.points
+
+class TestPreview(unittest.TestCase):
+    def test_health_metrics_and_verdict(self):
+        good = model_health(FakeModel(38, 0.41, 4.2, 5000), 40)
+        self.assertEqual(good["registered_ratio"], 0.95)
+        self.assertEqual(assess(good), [])
+
+        # Half the frames registered with a loose fit: rejected for both reasons
+        bad = model_health(FakeModel(20, 2.7, 3.5, 3000), 40)
+        problems = assess(bad)
+        self.assertEqual(len(problems), 2)
+        self.assertTrue(problems[0].startswith("registered_ratio 0.5"))
+        self.assertTrue(problems[1].startswith("reprojection_error 2.7"))
+
+        # No model at all fails every check
+        self.assertEqual(len(assess(model_health(None, 40))), 4)
+
+    def test_frames_are_downscaled_not_enlarged(self):
+        frame = np.zeros((1080, 1920, 3), dtype=np.uint8)
+        self.assertEqual(fit_to_side(frame, 800).shape, (450, 800, 3))
+        self.assertIs(fit_to_side(frame, 4000), frame)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+class TestPreviews(unittest.TestCase):
+    def test_manifest_lists_frames_and_previews(self):
+        """Previews land in data/previews and the manifest points at them."""
+        from previews import build_previews, read_manifest
+
+        with tempfile.TemporaryDirectory() as data:
+            os.makedirs(os.path.join(data, "images"))
+            os.makedirs(os.path.join(data, "masks"))
+            import cv2
+            for i in range(3):
+                name = f"frame_{i:05d}.jpg"
+                cv2.imwrite(os.path.join(data, "images", name), np.full((720, 1280, 3), 50 * i, np.uint8))
+                if i < 2:
+                    cv2.imwrite(os.path.join(data, "masks", name + ".png"), np.full((720, 1280), 255, np.uint8))
+
+            build_previews(data)
+            frames = read_manifest(data)["frames"]
+            self.assertEqual([f["name"] for f in frames], ["frame_00000.jpg", "frame_00001.jpg", "frame_00002.jpg"])
+            self.assertEqual(frames[0]["mask_preview"], os.path.join("previews", "frame_00000.jpg.png"))
+            self.assertIsNone(frames[2]["mask"])
+            preview = cv2.imread(os.path.join(data, frames[1]["preview"]))
+            self.assertEqual(preview.shape[1], 480)
+
+    def test_cache_evicts_and_prefetches(self):
+        import cv2
+        from previews import PreviewCache
+
+        with tempfile.TemporaryDirectory() as d:
+            paths = []
+            for i in range(5):
+                paths.append(os.path.join(d, f"frame_{i:05d}.jpg"))
+                cv2.imwrite(paths[-1], np.full((20, 30, 3), 40 * i, np.uint8))
+
+            cache = PreviewCache(max_items=3)
+            cache.prefetch(paths[:3])
+            deadline = time.time() + 5
+            while cache.pending and time.time() < deadline:
+                time.sleep(0.01)
+            self.assertEqual(cache.get(paths[0]).shape, (20, 30, 3))
+            self.assertEqual((cache.hits, cache.misses), (1, 0))
+
+            cache.get(paths[3])
+            cache.get(paths[4])
+            # paths[0] was used most recently of the prefetched ones, 1 and 2 were evicted
+            self.assertEqual([k[0] for k in cache.items], [paths[0], paths[3], paths[4]])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,33 @@
+import unittest
+import os
+import sys
+import numpy as np
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+class TestPairSelection(unittest.TestCase):
+    def test_loop_closure_on_circular_pan(self):
+        """Panning once around a loop should pair the last views with the first ones."""
+        import cv2
+        from retrieval import global_descriptors, select_pairs
+
+        rng = np.random.default_rng(1)
+        texture = cv2.GaussianBlur(rng.integers(0, 256, (300, 3000), dtype=np.uint8), (3, 3), 0)
+        texture = np.concatenate([texture, texture[:, :400]], axis=1)
+        sift = cv2.SIFT_create(1000)
+
+        descriptors = []
+        for x in range(0, 3000, 60):
+            _, d = sift.detectAndCompute(texture[:, x:x + 400], None)
+            descriptors.append(d.clip(0, 255).astype(np.uint8))
+        n = len(descriptors)
+
+        pairs, sequential = select_pairs(global_descriptors(descriptors))
+        self.assertTrue(all((i, i + 1) in pairs for i in range(n - 1)))
+        self.assertTrue(any(j - i > n - 5 for i, j in pairs))
+        # Fewer pairs than a fixed 5-frame sequential window
+        self.assertLess(len(pairs), 5 * n - 15)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import unittest
+import os
+import sys
+import numpy as np
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+class TestViewHelpers(unittest.TestCase):
+    def test_voxel_subsample_fits_budget_evenly(self):
+        """A cloud with one dense cluster is thinned to the budget without starving the sparse part."""
+        from view3d import voxel_subsample
+
+        rng = np.random.default_rng(0)
+        sparse = rng.uniform(0, 10, size=(20000, 3)) * [1, 1, 0]
+        dense = rng.uniform(0, 1, size=(180000, 3)) * [1, 1, 0]
+        points = np.concatenate([sparse, dense])
+
+        keep = voxel_subsample(points, 5000)
+        self.assertLessEqual(len(keep), 5000)
+        self.assertGreater(len(keep), 2500)
+        # A stride would keep 90% from the dense cluster; voxels keep far fewer
+        self.assertLess((keep >= len(sparse)).mean(), 0.3)
+        self.assertEqual(len(voxel_subsample(points[:100], 5000)), 100)
+
+    def test_palette_indices_match_colorscale(self):
+        from view3d import palette, palette_indices
+
+        colors = np.array([[0, 0, 0], [255, 255, 255], [255, 0, 0], [0, 73, 219]], dtype=np.uint8)
+        idx = palette_indices(colors)
+        self.assertEqual(idx.dtype, np.uint16)
+        scale = palette()
+        self.assertEqual(len(scale), 512)
+        self.assertEqual([scale[i][1] for i in idx], ["rgb(0,0,0)", "rgb(255,255,255)", "rgb(255,0,0)", "rgb(0,73,219)"])
+
+        # Six levels still fit one byte per point
+        idx = palette_indices(np.array([[0, 102, 204]], dtype=np.uint8), levels=6)
+        self.assertEqual(idx.dtype, np.uint8)
+        self.assertEqual(palette(6)[idx[0]][1], "rgb(0,102,204)")
+
+    def test_finer_palette_reduces_banding(self):
+        """A smooth gradient keeps more distinct shades, and smaller errors, with more levels."""
+        from view3d import palette, palette_indices
+
+        ramp = np.repeat(np.arange(256, dtype=np.uint8)[:, None], 3, axis=1)
+        errors = {}
+        for levels in (6, 8):
+            scale = palette(levels)
+            shown = np.array([[int(c) for c in scale[i][1][4:-1].split(",")] for i in palette_indices(ramp, levels)])
+            errors[levels] = np.abs(shown - ramp).max()
+            self.assertEqual(len(np.unique(shown[:, 0])), levels)
+        self.assertLess(errors[8], errors[6])
+        self.assertLessEqual(errors[8], 18)
+
+    def test_mesh_view_keeps_exact_vertex_colors(self):
+        """Mesh colors are sent as uint8 RGB, not palette indices Plotly would interpolate."""
+        import tempfile
+        import open3d as o3d
+        from view3d import load_mesh_view
+
+        mesh = o3d.geometry.TriangleMesh.create_tetrahedron()
+        colors = np.array([[3, 200, 17], [250, 0, 128], [0, 0, 0], [255, 255, 255]], dtype=np.uint8)
+        mesh.vertex_colors = o3d.utility.Vector3dVector(colors / 255.0)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "mesh.ply")
+            o3d.io.write_triangle_mesh(path, mesh)
+            data = load_mesh_view(path)
+
+        self.assertEqual(data["colors"].dtype, np.uint8)
+        np.testing.assert_array_equal(data["colors"], colors)
+        self.assertNotIn("levels", data)
+
+if __name__ == '__main__':
+    unittest.main()
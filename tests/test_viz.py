@@ -0,0 +1,65 @@
+import unittest
+import os
+import sys
+import numpy as np
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pointcache import PointCloudArrays
+from viz import FRUSTUM_CORNERS, camera_poses, frustum_lines, select_cameras, viewer_cloud
+
+def rotation(axis, angle):
+    c, s = np.cos(angle), np.sin(angle)
+    i, j = [k for k in range(3) if k != axis]
+    R = np.eye(3)
+    R[i, i], R[i, j], R[j, i], R[j, j] = c, -s, s, c
+    return R
+
+class TestViz(unittest.TestCase):
+    def test_batched_frustums_match_per_camera_transform(self):
+        R = np.stack([rotation(1, 0.3), rotation(0, -1.2), np.eye(3)])
+        t = np.array([[0.5, 0, 2], [1, -1, 0], [0, 0, 0]])
+        points, lines = frustum_lines(R, t, scale=0.2)
+
+        self.assertEqual(points.shape, (15, 3))
+        self.assertEqual(lines.shape, (24, 2))
+        for n in range(3):
+            center = -R[n].T @ t[n]
+            expected = (R[n].T @ (FRUSTUM_CORNERS * 0.2).T).T + center
+            np.testing.assert_allclose(points[5 * n:5 * n + 5], expected)
+            # Each camera's lines only index its own five points
+            self.assertTrue(np.all(lines[8 * n:8 * n + 8] // 5 == n))
+
+    def test_unposed_images_get_no_frustum(self):
+        """Only images with a pose are turned into cameras, in file name order."""
+        from types import SimpleNamespace
+        import pycolmap
+
+        def image(name, t=None):
+            if t is None:
+                return SimpleNamespace(name=name, has_pose=False, cam_from_world=lambda: None)
+            pose = pycolmap.Rigid3d(pycolmap.Rotation3d(np.eye(3)), np.array(t, dtype=float))
+            return SimpleNamespace(name=name, has_pose=True, cam_from_world=lambda: pose)
+
+        model = SimpleNamespace(images={1: image("b.jpg", [0, 0, 2]), 2: image("c.jpg"), 3: image("a.jpg", [1, 0, 0])})
+        R, t = camera_poses(model)
+        self.assertEqual(R.shape, (2, 3, 3))
+        np.testing.assert_allclose(t, [[1, 0, 0], [0, 0, 2]])
+
+    def test_camera_decimation_and_point_budget(self):
+        self.assertEqual(select_cameras(10, step=3).tolist(), [0, 3, 6, 9])
+        self.assertEqual(len(select_cameras(1000, max_cameras=100)), 100)
+        self.assertEqual(len(select_cameras(50, step=2, max_cameras=100)), 25)
+
+        rng = np.random.default_rng(0)
+        cloud = PointCloudArrays(rng.uniform(0, 1, size=(20000, 3)) * [1, 1, 0],
+                                 rng.integers(0, 255, size=(20000, 3), dtype=np.uint8), None)
+        shown = viewer_cloud(None, max_points=2000, cloud=cloud)
+        self.assertLessEqual(len(shown.points), 2000)
+        self.assertEqual(len(shown.colors), len(shown.points))
+        self.assertIsNone(shown.normals)
+        self.assertIs(viewer_cloud(None, max_points=0, cloud=cloud), cloud)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import os
+
+import numpy as np
+
+from lod import load_index, pick_level
+from pointcache import load_point_cloud
+
+# Colors are sent to the browser as indices into a LEVELS^3 palette, so each
+# channel is rounded to LEVELS steps: 6 fits uint8 but bands smooth shading,
+# 8 (uint16) keeps the error within half a step (~18 of 255)
+PALETTE_LEVELS = 8
+
+def view_sources(recon_dir):
+    """
+    Full-resolution files behind each 3D view, for the views that exist.
+    """
+    sources = {
+        "dense": os.path.join(recon_dir, "dense", "fused.ply"),
+        "sparse": os.path.join(recon_dir, "fused.ply"),
+        "mesh": os.path.join(recon_dir, "final_mesh.ply"),
+    }
+    return {view: path for view, path in sources.items() if os.path.exists(path)}
+
+def resolve_level(recon_dir, view, path, budget):
+    """
+    The LOD file to load for a view: the most detailed level within the
+    budget when the reconstruction has an LOD index, else the full file.
+    """
+    kind = {"dense": "cloud", "mesh": "mesh"}.get(view)
+    level = pick_level(load_index(recon_dir), kind, budget) if kind else None
+    return level["path"] if level else path
+
+def voxel_subsample(points, budget, max_rounds=8):
+    """
+    Indices of one point per voxel, growing the voxel until at most
+    `budget` points remain. Unlike a plain stride this keeps density even.
+    """
+    n = len(points)
+    if n <= budget:
+        return np.arange(n)
+    lo = points.min(axis=0)
+    extent = float(np.linalg.norm(points.max(axis=0) - lo))
+    # Points on a surface: count grows with (extent / voxel)^2
+    voxel = extent / np.sqrt(budget)
+    for _ in range(max_rounds):
+        keys = np.floor((points - lo) / voxel).astype(np.int64)
+        dims = keys.max(axis=0) + 1
+        _, first = np.unique((keys[:, 0] * dims[1] + keys[:, 1]) * dims[2] + keys[:, 2], return_index=True)
+        if len(first) <= budget:
+            return np.sort(first)
+        voxel *= 1.05 * np.sqrt(len(first) / budget)
+    return np.sort(first[:budget])
+
+def palette(levels=PALETTE_LEVELS):
+    """
+    Plotly colorscale for palette indices 0 .. levels^3 - 1.
+    """
+    steps = np.round(np.linspace(0, 255, levels)).astype(int)
+    count = levels ** 3
+    scale = []
+    for i in range(count):
+        r, g, b = steps[i // (levels * levels)], steps[(i // levels) % levels], steps[i % levels]
+        scale.append([i / max(count - 1, 1), f"rgb({r},{g},{b})"])
+    return scale
+
+def palette_dtype(levels=PALETTE_LEVELS):
+    return np.uint8 if levels ** 3 <= 256 else np.uint16
+
+def palette_indices(colors, levels=PALETTE_LEVELS):
+    """
+    Palette index per RGB color (uint8 input); uint8 up to 6 levels, else uint16.
+    """
+    dtype = palette_dtype(levels)
+    q = np.round(np.asarray(colors, dtype=np.float32) * (levels - 1) / 255.0).astype(dtype)
+    return (q[:, 0] * levels + q[:, 1]) * levels + q[:, 2]
+
+def load_cloud_view(path, budget, levels=PALETTE_LEVELS):
+    """
+    float32 positions and palette colors for at most `budget` points.
+    The payload records its palette `levels` for palette(levels).
+    """
+    cloud = load_point_cloud(path)
+    points = np.asarray(cloud.points)
+    keep = voxel_subsample(points, budget)
+    out = {"points": np.ascontiguousarray(points[keep], dtype=np.float32), "total": len(points), "levels": levels}
+    if cloud.colors is not None:
+        out["colors"] = palette_indices(np.asarray(cloud.colors)[keep], levels)
+    return out
+
+def load_mesh_view(path):
+    """
+    float32 vertices, int32 faces and uint8 RGB vertex colors of a mesh.
+    Plotly interpolates Mesh3d intensities across faces, so mesh colors are
+    not palette indices: a face between indices 3 and 200 would be painted
+    with every palette color in between.
+    """
+    import open3d as o3d
+    mesh = o3d.io.read_triangle_mesh(str(path))
+    out = {
+        "vertices": np.asarray(mesh.vertices, dtype=np.float32),
+        "faces": np.asarray(mesh.triangles, dtype=np.int32),
+    }
+    if mesh.has_vertex_colors():
+        out["colors"] = np.round(np.asarray(mesh.vertex_colors) * 255.0).astype(np.uint8)
+    return out
@@ -1,92 +1,173 @@
-import open3d as o3d
 import numpy as np
-import pycolmap
 import argparse
 from pathlib import Path
 
-def draw_camera(start, end, color=[1, 0, 0], width=0.1):
-    # Simple line
-    return [start, end]
-
-def visualize_results(model_path, ply_path):
-    print(f"[*] Loading reconstruction from {model_path}")
-    recon = pycolmap.Reconstruction(model_path)
-    
-    print(f"[*] Loading Point Cloud from {ply_path}")
-    pcd = o3d.io.read_point_cloud(str(ply_path))
-    
-    # Create visualizer elements for cameras
-    cam_geometries = []
-    
+from lod import load_index, pick_level
+from pointcache import PointCloudArrays, load_point_cloud, to_open3d
+from view3d import voxel_subsample
+
+# Points shown by default; bigger clouds are loaded from an LOD level or voxel-thinned
+MAX_POINTS = 3000000
+# Frustum corners in camera coordinates (COLMAP: +Z is the optical axis), before scaling
+FRUSTUM_CORNERS = np.array([
+    [0, 0, 0],
+    [1.0, 0.75, 1],
+    [1.0, -0.75, 1],
+    [-1.0, -0.75, 1],
+    [-1.0, 0.75, 1],
+])
+FRUSTUM_LINES = np.array([
+    [0, 1], [0, 2], [0, 3], [0, 4], # Ray to corners
+    [1, 2], [2, 3], [3, 4], [4, 1]  # Image plane rectangle
+])
+
+def camera_poses(model):
+    """
+    Rotations (N, 3, 3) and translations (N, 3) of the registered images
+    in trajectory (file name) order, as world-to-camera transforms. Images
+    without a pose (e.g. left unregistered by a chunk merge) are skipped.
+    """
+    images = sorted((image for image in model.images.values() if image.has_pose), key=lambda image: image.name)
+    if not images:
+        return np.zeros((0, 3, 3)), np.zeros((0, 3))
+    poses = [image.cam_from_world() for image in images]
+    R = np.stack([pose.rotation.matrix() for pose in poses])
+    t = np.stack([np.asarray(pose.translation) for pose in poses])
+    return R, t
+
+def select_cameras(count, step=1, max_cameras=0):
+    """
+    Indices of every `step`-th camera along the trajectory, thinned further
+    so at most max_cameras remain (0 for no limit).
+    """
+    step = max(step, 1)
+    if max_cameras and count > max_cameras * step:
+        step = int(np.ceil(count / max_cameras))
+    return np.arange(0, count, step)
+
+def frustum_lines(R, t, scale=0.2):
+    """
+    Points and line indices of all camera frustums, for a single LineSet.
+    X_cam = R X_world + t, so X_world = R^T (X_cam - t).
+    """
+    R = np.asarray(R, dtype=np.float64).reshape(-1, 3, 3)
+    t = np.asarray(t, dtype=np.float64).reshape(-1, 3)
+    centers = -np.einsum("nji,nj->ni", R, t)
+    points = np.einsum("nji,kj->nki", R, FRUSTUM_CORNERS * scale) + centers[:, None, :]
+    offsets = np.arange(len(R)) * len(FRUSTUM_CORNERS)
+    lines = FRUSTUM_LINES[None, :, :] + offsets[:, None, None]
+    return points.reshape(-1, 3), lines.reshape(-1, 2)
+
+def lod_cloud_path(ply_path, budget):
+    """
+    The finest LOD level of ply_path within the point budget, when an LOD
+    index built from that file sits next to it; else ply_path itself.
+    """
+    ply_path = Path(ply_path).resolve()
+    for recon_dir in (ply_path.parent, ply_path.parent.parent):
+        index = load_index(recon_dir)
+        if index and any(e["kind"] == "cloud" and e["level"] == 0 and Path(e["path"]) == ply_path
+                         for e in index["levels"]):
+            return Path(pick_level(index, "cloud", budget)["path"])
+    return ply_path
+
+def viewer_cloud(ply_path, max_points=MAX_POINTS, cloud=None):
+    """
+    The cloud to show, with at most max_points points (0 for all). Files
+    over the budget are read from their LOD level when there is one, and
+    whatever is still too big is voxel-subsampled from the memory map.
+    """
+    if cloud is None:
+        path = lod_cloud_path(ply_path, max_points) if max_points else Path(ply_path)
+        if max_points and path != Path(ply_path).resolve():
+            print(f"[*] Using LOD level {path.name}")
+        print(f"[*] Loading Point Cloud from {path}")
+        cloud = load_point_cloud(path)
+
+    total = len(cloud.points)
+    if not max_points or total <= max_points:
+        return cloud
+    keep = voxel_subsample(np.asarray(cloud.points), max_points)
+    print(f"[*] Showing {len(keep)} of {total} points")
+    return PointCloudArrays(*(None if a is None else np.asarray(a)[keep] for a in cloud))
+
+def render_to_image(geometries, image_path, focus=None, width=1280, height=960):
+    """
+    Renders the geometries off-screen into an image file (no window needed;
+    Open3D falls back to EGL when there is no display). `focus` points, if
+    given, are framed instead of the full bounds, which stray points inflate.
+    """
+    import open3d as o3d
+
+    vis = o3d.visualization.Visualizer()
+    if not vis.create_window(width=width, height=height, visible=False):
+        raise RuntimeError("Could not create an off-screen Open3D context")
+    try:
+        for geometry in geometries:
+            vis.add_geometry(geometry)
+        vis.get_render_option().point_size = 2.0
+        if focus is not None and len(focus):
+            lo, hi = np.percentile(focus, [2, 98], axis=0)
+            bounds = np.vstack([np.asarray(g.get_max_bound()) - np.asarray(g.get_min_bound()) for g in geometries])
+            view = vis.get_view_control()
+            view.set_lookat((lo + hi) / 2)
+            view.set_zoom(float(np.clip(np.linalg.norm(hi - lo) / np.linalg.norm(bounds.max(axis=0)), 0.02, 1.0)))
+        vis.poll_events()
+        vis.update_renderer()
+        Path(image_path).parent.mkdir(parents=True, exist_ok=True)
+        vis.capture_screen_image(str(image_path), do_render=True)
+    finally:
+        vis.destroy_window()
+    print(f"[*] Rendered view to {image_path}")
+
+def visualize_results(model_path, ply_path, model=None, cloud=None, max_points=MAX_POINTS,
+                      camera_step=1, max_cameras=0, frustum_scale=0.2, screenshot=None):
+    """
+    Shows the cloud with the camera frustums, or renders them to the
+    `screenshot` image. An already loaded model (pycolmap.Reconstruction)
+    and cloud (PointCloudArrays) skip the reads.
+    """
+    import open3d as o3d
+    import pycolmap
+
+    if model is None:
+        print(f"[*] Loading reconstruction from {model_path}")
+        model = pycolmap.Reconstruction(model_path)
+
+    pcd = to_open3d(viewer_cloud(ply_path, max_points, cloud))
+
+    R, t = camera_poses(model)
+    keep = select_cameras(len(R), camera_step, max_cameras)
+    print(f"[*] Found {len(R)} cameras, drawing {len(keep)}.")
+
+    # All frustums go into one LineSet; one geometry per camera makes the viewer crawl
+    points, lines = frustum_lines(R[keep], t[keep], frustum_scale)
+    frustums = o3d.geometry.LineSet(
+        points=o3d.utility.Vector3dVector(points),
+        lines=o3d.utility.Vector2iVector(lines.astype(np.int32)),
+    )
+    frustums.paint_uniform_color([1, 0, 0])
+
     # 0,0,0 coordinate frame
     axis = o3d.geometry.TriangleMesh.create_coordinate_frame(size=1.0, origin=[0, 0, 0])
-    cam_geometries.append(axis)
-
-    print(f"[*] Found {len(recon.images)} cameras.")
-    
-    # Frustum size
-    scale = 0.2
-    
-    for image_id, image in recon.images.items():
-        # Get camera position and rotation
-        # COLMAP Common: T_world_to_cam (R, t)
-        # We need T_cam_to_world (inverse)
-        
-        # rotation matrix
-        R = image.cam_from_world.rotation.matrix()
-        t = image.cam_from_world.translation
-        
-        # Camera center in world coordinates = -R^T * t
-        center = -R.T @ t
-        
-        # Viewing direction (Z-axis of camera is usually forward in COLMAP? No, +Z is forward in Open3D/GL, COLMAP might be different)
-        # COLMAP: +Z is optical axis?
-        # We can just draw a small pyramid representing the camera.
-        
-        # Create a small mesh or lines for the camera
-        # Simpler: Create a LineSet for the frustum
-        
-        # Points in camera coordinates
-        # 0: Center
-        # 1-4: Corners of the image plane at distance 'scale'
-        w, h = 1.0, 0.75 # Aspect ratio approx
-        points = [
-            [0, 0, 0],
-            [w, h, 1],
-            [w, -h, 1],
-            [-w, -h, 1],
-            [-w, h, 1]
-        ]
-        points = np.array(points) * scale
-        
-        # Transform to world
-        # X_world = R^T * (X_cam - t)  <-- Check math
-        # Actually: X_cam = R * X_world + t
-        # X_world = R^T * (X_cam - t) = R^T * X_cam - R^T * t = R^T * X_cam + Center
-        
-        points_world = (R.T @ points.T).T + center
-        
-        lines = [
-            [0, 1], [0, 2], [0, 3], [0, 4], # Ray to corners
-            [1, 2], [2, 3], [3, 4], [4, 1]  # Image plane rectangle
-        ]
-        
-        colors = [[1, 0, 0] for _ in range(len(lines))]
-        
-        line_set = o3d.geometry.LineSet(
-            points=o3d.utility.Vector3dVector(points_world),
-            lines=o3d.utility.Vector2iVector(lines),
-        )
-        line_set.colors = o3d.utility.Vector3dVector(colors)
-        cam_geometries.append(line_set)
+    geometries = [pcd, axis, frustums]
 
+    if screenshot:
+        render_to_image(geometries, screenshot, focus=np.vstack([np.asarray(pcd.points), points]))
+        return
     print("[*] Visualizing... (Close window to exit)")
-    o3d.visualization.draw_geometries([pcd] + cam_geometries)
+    o3d.visualization.draw_geometries(geometries)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--model", required=True, help="Path to COLMAP sparse folder (e.g., output/sparse)")
     parser.add_argument("--ply", required=True, help="Path to fused.ply")
+    parser.add_argument("--max_points", type=int, default=MAX_POINTS, help=f"Point budget; larger clouds use an LOD level or voxel subsampling, 0 for all (default: {MAX_POINTS})")
+    parser.add_argument("--camera_step", type=int, default=1, help="Draw every Nth camera along the trajectory (default: 1)")
+    parser.add_argument("--max_cameras", type=int, default=0, help="Most cameras to draw, 0 for no limit (default: 0)")
+    parser.add_argument("--frustum_scale", type=float, default=0.2, help="Frustum size in scene units (default: 0.2)")
+    parser.add_argument("--screenshot", help="Render off-screen to this image file instead of opening a window")
     args = parser.parse_args()
-    
-    visualize_results(args.model, args.ply)
+
+    visualize_results(args.model, args.ply, max_points=args.max_points, camera_step=args.camera_step,
+                      max_cameras=args.max_cameras, frustum_scale=args.frustum_scale, screenshot=args.screenshot)